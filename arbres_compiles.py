@@ -0,0 +1,270 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Forêt compilée : les arbres d'un RandomForest/ExtraTrees scikit-learn sont
+# mis à plat dans quelques tableaux NumPy (feature, seuil, fils gauche/droit,
+# valeur), écrits en .npy et relus par memory-map. La prédiction parcourt
+# tous les arbres pour tout un bloc de lignes à la fois, sans boucle Python
+# par arbre. Comme scikit-learn, les entrées sont comparées en float32 : des
+# seuils float32 arrondis vers le bas donnent exactement les mêmes décisions
+# (--seuils-float64 garde les seuils d'origine, nœuds de 20 octets).
+# Les feuilles peuvent être quantifiées sur 16 bits (erreur <= pas / 2). Le
+# manifeste garde l'empreinte du pickle compilé : une forêt compilée depuis un
+# autre modèle est refusée, puis recompilée par obtenir_foret.
+# Usage : python arbres_compiles.py [--quantifier-feuilles] [--seuils-float64]  (compile le modèle et le compare à sklearn)
+
+import argparse
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from cache_tables import empreinte_fichier, source_a_jour
+
+# === PARAMÈTRES ===
+VERSION_FORET = 2
+CHEMIN_MODELE = "resultats\\random_forest_att_model.pkl"
+DOSSIER_FORET = "resultats\\random_forest_att_model_compile"
+TAILLE_BLOC = 4096  # lignes évaluées ensemble (mémoire ~ n_arbres x TAILLE_BLOC)
+TABLEAUX = ["noeuds", "nan_gauche", "valeurs", "racines"]
+
+# Un nœud = 16 octets lus en un seul accès ; une feuille pointe sur elle-même
+DTYPE_NOEUD_64 = np.dtype([("feature", "<i4"), ("gauche", "<i4"), ("droite", "<i4"), ("seuil", "<f8")])
+DTYPE_NOEUD_32 = np.dtype([("feature", "<i4"), ("gauche", "<i4"), ("droite", "<i4"), ("seuil", "<f4")])
+
+
+@dataclass
+class ForetCompilee:
+    noeuds: np.ndarray      # (n_noeuds,) DTYPE_NOEUD_32/64, fils en indices globaux
+    nan_gauche: np.ndarray  # (n_noeuds,) bool, branche des valeurs manquantes
+    valeurs: np.ndarray     # (n_noeuds,) float64, ou uint16 si quantifiées
+    racines: np.ndarray     # (n_arbres,) int32
+    profondeur: int
+    feature_names_in_: np.ndarray
+    decalage: float = 0.0   # valeur = decalage + pas * code (feuilles quantifiées)
+    pas: float = 1.0
+    modalites_type_: np.ndarray = None  # TYPE vus à l'entraînement (trainRandomForest.sauver_modele)
+
+    def _matrice(self, X):
+        if hasattr(X, "columns"):
+            X = X[list(self.feature_names_in_)]
+        return np.ascontiguousarray(X, dtype=np.float32)
+
+    def predict(self, X, taille_bloc=TAILLE_BLOC):
+        X = self._matrice(X)
+        n_arbres, n_features = len(self.racines), X.shape[1]
+        sortie = np.empty(len(X))
+        for debut in range(0, len(X), taille_bloc):
+            bloc = X[debut:debut + taille_bloc]
+            plat = bloc.ravel()
+            avec_nan = np.isnan(plat).any()
+            # Un parcours par couple (arbre, ligne), qui descend d'un niveau à
+            # chaque itération ; une feuille pointe sur elle-même. Les parcours
+            # terminés ne sont retirés que lorsqu'ils dépassent le quart des
+            # parcours actifs (la compaction coûte plus qu'une itération).
+            n = np.repeat(self.racines, len(bloc))
+            positions = np.arange(len(n))
+            decalages_lignes = np.tile(np.arange(len(bloc), dtype=np.int64) * n_features, n_arbres)
+            courants = np.empty(len(n), dtype=np.int32)
+            while len(n):
+                noeud = self.noeuds[n]
+                termines = noeud["gauche"] == n
+                n_termines = np.count_nonzero(termines)
+                if n_termines == len(n):
+                    courants[positions] = n
+                    break
+                if 4 * n_termines > len(n):
+                    courants[positions[termines]] = n[termines]
+                    internes = ~termines
+                    n, positions, decalages_lignes = n[internes], positions[internes], decalages_lignes[internes]
+                    noeud = noeud[internes]
+                x = plat[decalages_lignes + noeud["feature"]]
+                gauche = x <= noeud["seuil"]
+                if avec_nan:
+                    gauche |= np.isnan(x) & self.nan_gauche[n]
+                n = np.where(gauche, noeud["gauche"], noeud["droite"])
+            somme = self.valeurs[courants].reshape(n_arbres, len(bloc)).sum(axis=0, dtype=np.float64)
+            sortie[debut:debut + len(bloc)] = self.decalage + self.pas * somme / n_arbres
+        return sortie
+
+
+# === COMPILATION ===
+def _float32_par_defaut(seuils):
+    # Plus grand float32 <= seuil : x32 <= s32 équivaut alors à x32 <= seuil
+    s32 = seuils.astype(np.float32)
+    trop_grands = s32.astype(np.float64) > seuils
+    s32[trop_grands] = np.nextafter(s32[trop_grands], np.float32(-np.inf))
+    return s32
+
+
+def compiler_foret(model, seuils_float32=True, quantifier_feuilles=False):
+    if not hasattr(model, "estimators_") or not hasattr(model.estimators_[0], "tree_"):
+        raise TypeError(f"{type(model).__name__} : seuls les RandomForest/ExtraTrees sont compilables.")
+
+    arbres = [estimateur.tree_ for estimateur in model.estimators_]
+    tailles = np.array([arbre.node_count for arbre in arbres])
+    decalages = np.concatenate([[0], np.cumsum(tailles)[:-1]])
+    if tailles.sum() >= 2**31:
+        raise ValueError("Forêt trop grande pour des indices int32.")
+
+    noeuds = np.empty(tailles.sum(), dtype=DTYPE_NOEUD_32 if seuils_float32 else DTYPE_NOEUD_64)
+    nan_gauche = np.zeros(tailles.sum(), dtype=bool)
+    for arbre, decalage in zip(arbres, decalages):
+        tranche = slice(decalage, decalage + arbre.node_count)
+        feuilles = arbre.children_left < 0
+        propres = np.arange(arbre.node_count) + decalage
+        noeuds["feature"][tranche] = np.where(feuilles, 0, arbre.feature)
+        noeuds["gauche"][tranche] = np.where(feuilles, propres, arbre.children_left + decalage)
+        noeuds["droite"][tranche] = np.where(feuilles, propres, arbre.children_right + decalage)
+        seuils = np.where(feuilles, np.inf, arbre.threshold)
+        noeuds["seuil"][tranche] = _float32_par_defaut(seuils) if seuils_float32 else seuils
+        manquants = getattr(arbre, "missing_go_to_left", None)
+        if manquants is not None:
+            nan_gauche[tranche] = manquants.astype(bool)
+
+    valeurs = np.concatenate([arbre.value[:, 0, 0] for arbre in arbres])
+    decalage_valeurs, pas = 0.0, 1.0
+    if quantifier_feuilles:
+        decalage_valeurs = float(valeurs.min())
+        pas = float(valeurs.max() - decalage_valeurs) / 65535 or 1.0
+        valeurs = np.round((valeurs - decalage_valeurs) / pas).astype(np.uint16)
+
+    return ForetCompilee(
+        noeuds=noeuds,
+        nan_gauche=nan_gauche,
+        valeurs=valeurs,
+        racines=decalages.astype(np.int32),
+        profondeur=max(arbre.max_depth for arbre in arbres),
+        feature_names_in_=np.asarray(model.feature_names_in_, dtype=object),
+        decalage=decalage_valeurs,
+        pas=pas,
+        modalites_type_=getattr(model, "modalites_type_", None),
+    )
+
+
+# === ÉCRITURE / LECTURE ===
+def sauver_foret(foret, dossier=DOSSIER_FORET, source=CHEMIN_MODELE):
+    tmp = dossier + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for nom in TABLEAUX:
+        np.save(os.path.join(tmp, nom + ".npy"), getattr(foret, nom))
+    with open(os.path.join(tmp, "manifeste.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": VERSION_FORET, "profondeur": foret.profondeur, "decalage": foret.decalage,
+            "pas": foret.pas, "feature_names_in_": list(foret.feature_names_in_),
+            "modalites_type_": None if foret.modalites_type_ is None else list(foret.modalites_type_),
+            "quantifiee": foret.valeurs.dtype == np.uint16,
+            "seuils_float32": foret.noeuds.dtype == DTYPE_NOEUD_32, "source": empreinte_fichier(source),
+        }, f, indent=2)
+    shutil.rmtree(dossier, ignore_errors=True)
+    os.replace(tmp, dossier)
+
+
+def _lire_manifeste(dossier):
+    with open(os.path.join(dossier, "manifeste.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def charger_foret(dossier=DOSSIER_FORET, source=CHEMIN_MODELE):
+    manifeste = _lire_manifeste(dossier)
+    if manifeste["version"] != VERSION_FORET:
+        raise ValueError(f"Forêt compilée en version {manifeste['version']}, attendu {VERSION_FORET}.")
+    if not source_a_jour(source, manifeste["source"]):
+        raise ValueError(f"Forêt compilée depuis un autre modèle que {source} (relancer arbres_compiles.py).")
+    return ForetCompilee(
+        **{nom: np.load(os.path.join(dossier, nom + ".npy"), mmap_mode="r") for nom in TABLEAUX},
+        profondeur=manifeste["profondeur"],
+        feature_names_in_=np.asarray(manifeste["feature_names_in_"], dtype=object),
+        decalage=manifeste["decalage"],
+        pas=manifeste["pas"],
+        modalites_type_=None if manifeste.get("modalites_type_") is None
+        else np.asarray(manifeste["modalites_type_"], dtype=object),
+    )
+
+
+def obtenir_foret(dossier=DOSSIER_FORET, source=CHEMIN_MODELE, quantifier_feuilles=None, seuils_float32=None):
+    # Forêt à jour du pickle source, recompilée si absente, d'une autre
+    # version, d'un autre modèle ou d'autres options ; une option à None
+    # garde le choix de la forêt précédente
+    try:
+        precedente = _lire_manifeste(dossier)
+    except (OSError, ValueError):
+        precedente = {}
+    if quantifier_feuilles is None:
+        quantifier_feuilles = bool(precedente.get("quantifiee", False))
+    if seuils_float32 is None:
+        seuils_float32 = bool(precedente.get("seuils_float32", True))
+    if (precedente.get("quantifiee"), precedente.get("seuils_float32", True)) == (quantifier_feuilles, seuils_float32):
+        try:
+            return charger_foret(dossier, source)
+        except (FileNotFoundError, KeyError, ValueError):
+            pass
+    import joblib
+    print(f"Compilation de la forêt : {source} -> {dossier}")
+    foret = compiler_foret(joblib.load(source), seuils_float32=seuils_float32, quantifier_feuilles=quantifier_feuilles)
+    sauver_foret(foret, dossier, source)
+    return charger_foret(dossier, source)
+
+
+if __name__ == "__main__":
+    import joblib
+    from features import obtenir_features, jeu_modele
+
+    parser = argparse.ArgumentParser(description="Compilation de la forêt aléatoire.")
+    parser.add_argument("--quantifier-feuilles", action="store_true", help="valeurs des feuilles sur 16 bits")
+    parser.add_argument("--seuils-float64", action="store_true", help="seuils d'origine au lieu de float32")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    model = joblib.load(CHEMIN_MODELE)
+    t_joblib = time.perf_counter() - t0
+
+    foret = compiler_foret(model, seuils_float32=not args.seuils_float64, quantifier_feuilles=args.quantifier_feuilles)
+    sauver_foret(foret)
+    t0 = time.perf_counter()
+    foret = charger_foret()
+    t_mmap = time.perf_counter() - t0
+    taille = sum(os.path.getsize(os.path.join(DOSSIER_FORET, nom + ".npy")) for nom in TABLEAUX)
+    print(f"✅ Forêt compilée : {DOSSIER_FORET} ({len(foret.racines)} arbres, {len(foret.noeuds)} nœuds, "
+          f"{taille / 1e6:.1f} Mo, profondeur {foret.profondeur})")
+    print(f"Chargement : joblib {t_joblib * 1000:.0f} ms, memory-map {t_mmap * 1000:.1f} ms")
+
+    # === CONTRÔLE CONTRE SKLEARN (tolérances vérifiées par tests/test_arbres_compiles.py) ===
+    X = jeu_modele(obtenir_features(), test=True)[list(model.feature_names_in_)]
+    ecart = np.abs(foret.predict(X) - model.predict(X)).max()
+    tolerance = foret.pas / 2 if args.quantifier_feuilles else 0.0
+    print(f"Écart maximal à sklearn : {ecart:.2e} (attendu <= {tolerance:.2e})")
+
+    for n in [1, 100, 10_000]:
+        lot = X.iloc[:n]
+        t0 = time.perf_counter()
+        model.predict(lot)
+        t_sk = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        foret.predict(lot)
+        t_compile = time.perf_counter() - t0
+        print(f"{n:>6} lignes : sklearn {t_sk * 1000:8.1f} ms, compilée {t_compile * 1000:8.1f} ms")
@@ -0,0 +1,207 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+import polars as pl
+from tqdm import tqdm
+
+from geo import cap_initial, ecart_angulaire
+
+# === PARAMÈTRES ===
+TAILLE_BLOC = 200_000  # mesures traitées par passe NumPy (borne la mémoire)
+
+
+# === INDEX CSR DES ANTENNES ===
+# Les antennes de chaque station sont rangées à plat : les antennes de
+# stations[k] occupent azimuts[offsets[k]:offsets[k + 1]], dans l'ordre du
+# fichier ANTENNE (même départage des ex-aequo que l'ancienne boucle).
+@dataclass
+class IndexAntennes:
+    stations: np.ndarray    # STA_NM_ANFR triés
+    offsets: np.ndarray     # int64, len(stations) + 1
+    azimuts: np.ndarray     # float64
+    aer_ids: np.ndarray     # AER_ID
+    puissances: np.ndarray  # EMR_NB_PUISSANCE du couple (station, antenne)
+
+    def codes_stations(self, sta_nm):
+        # Position de chaque STA_NM_ANFR dans l'index, -1 si la station n'a pas d'antenne
+        sta_nm = np.asarray(sta_nm, dtype=str)
+        if len(self.stations) == 0:
+            return np.full(len(sta_nm), -1, dtype=np.int64)
+        pos = np.searchsorted(self.stations, sta_nm)
+        pos = np.minimum(pos, len(self.stations) - 1)
+        return np.where(self.stations[pos] == sta_nm, pos, -1).astype(np.int64)
+
+    @cached_property
+    def series_antennes(self):
+        # STA_NM_ANFR et AER_ID de chaque antenne, convertis une fois par
+        # index : les lignes associées sont obtenues par indexation sur le
+        # numéro d'antenne, sans tableau de chaînes intermédiaire
+        stations = np.repeat(self.stations, np.diff(self.offsets))
+        return pl.Series(stations, dtype=pl.Utf8), pl.Series(self.aer_ids, dtype=pl.Utf8)
+
+
+def construire_index_antennes(sta_nm, aer_ids, azimuts, puissances=None):
+    sta_nm = np.asarray(sta_nm, dtype=str)
+    aer_ids = np.asarray(aer_ids, dtype=str)
+    azimuts = np.asarray(azimuts, dtype=np.float64)
+    if puissances is None:
+        puissances = np.full(len(azimuts), np.nan)
+    puissances = np.asarray(puissances, dtype=np.float64)
+
+    # Les antennes sans azimut ne peuvent jamais être choisies
+    garder = ~np.isnan(azimuts)
+    sta_nm, aer_ids = sta_nm[garder], aer_ids[garder]
+    azimuts, puissances = azimuts[garder], puissances[garder]
+
+    ordre = np.argsort(sta_nm, kind="stable")
+    stations, comptes = np.unique(sta_nm[ordre], return_counts=True)
+    offsets = np.zeros(len(stations) + 1, dtype=np.int64)
+    np.cumsum(comptes, out=offsets[1:])
+
+    return IndexAntennes(
+        stations=stations,
+        offsets=offsets,
+        azimuts=azimuts[ordre],
+        aer_ids=aer_ids[ordre],
+        puissances=puissances[ordre],
+    )
+
+
+# === ARGMIN SEGMENTÉ ===
+def _meilleures_antennes(debuts, comptes, angles, azimuts):
+    # Une ligne par couple (mesure, antenne candidate), puis argmin par segment
+    fins_segments = np.cumsum(comptes)
+    debuts_segments = fins_segments - comptes
+    segment = np.repeat(np.arange(len(comptes)), comptes)
+    pos = np.arange(fins_segments[-1]) - debuts_segments[segment] + debuts[segment]
+
+    angle_diffs = ecart_angulaire(azimuts[pos], angles[segment])
+    minima = np.minimum.reduceat(angle_diffs, debuts_segments)
+
+    # Premier minimum de chaque segment, comme np.argmin
+    candidats = np.flatnonzero(angle_diffs == minima[segment])
+    premiers = np.ones(len(candidats), dtype=bool)
+    premiers[1:] = segment[candidats[1:]] != segment[candidats[:-1]]
+    return pos[candidats[premiers]]
+
+
+# === ASSOCIATION ===
+# idx_support et distances_km sont ceux renvoyés par IndexSpherique.plus_proches.
+# Renvoie les mesures gardées, l'antenne retenue (position dans l'index),
+# l'angle et la distance de chacune.
+def associer_indices(lat, lon, idx_support, distances_km, sup_lat, sup_lon, sup_codes, index,
+                     taille_bloc=TAILLE_BLOC, progression=True):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    idx_support = np.asarray(idx_support)
+
+    codes = sup_codes[idx_support]
+    comptes = np.zeros(len(codes), dtype=np.int64)
+    connus = codes >= 0
+    comptes[connus] = index.offsets[codes[connus] + 1] - index.offsets[codes[connus]]
+    positions = np.flatnonzero(comptes > 0)
+
+    antennes = np.empty(len(positions), dtype=np.int64)
+    angles = np.empty(len(positions))
+
+    for debut in tqdm(range(0, len(positions), taille_bloc), desc="Association", disable=not progression):
+        bloc = slice(debut, debut + taille_bloc)
+        p = positions[bloc]
+        s = idx_support[p]
+        # Cap initial du support vers la mesure, comparable aux azimuts ANFR
+        angles[bloc] = cap_initial(sup_lat[s], sup_lon[s], lat[p], lon[p])
+        antennes[bloc] = _meilleures_antennes(index.offsets[codes[p]], comptes[p], angles[bloc], index.azimuts)
+
+    return positions, antennes, angles, np.asarray(distances_km)[positions]
+
+
+def champs_association(index, antennes, angles, distances):
+    stations, aer_ids = index.series_antennes
+    return {
+        "STA_NM_ANFR": stations.gather(antennes),
+        "AER_ID": aer_ids.gather(antennes),
+        "AER_NB_AZIMUT": index.azimuts[antennes],
+        "angle_vers_antenne": angles,
+        "distance_to_support_km": np.round(distances, 3),
+        "EMR_NB_PUISSANCE": index.puissances[antennes],
+    }
+
+
+def associer_antennes(lat, lon, idx_support, distances_km, sup_lat, sup_lon, sup_codes, index,
+                      taille_bloc=TAILLE_BLOC):
+    positions, antennes, angles, distances = associer_indices(
+        lat, lon, idx_support, distances_km, sup_lat, sup_lon, sup_codes, index, taille_bloc
+    )
+    return {"positions": positions, **champs_association(index, antennes, angles, distances)}
+
+
+def lignes_associees(df_mesures, positions, champs):
+    return df_mesures[positions].with_columns([
+        pl.Series(nom, valeurs, nan_to_null=True) for nom, valeurs in champs.items()
+    ])
+
+
+def associer_mesures(df_mesures, support_index, support_coords, support_codes, index):
+    # df_mesures : colonnes de ingestion.scanner_mesures ; renvoie les lignes associées
+    lat = df_mesures["latitude"].to_numpy()
+    lon = df_mesures["longitude"].to_numpy()
+    distances, indices = support_index.plus_proches(lat, lon)
+    association = associer_antennes(
+        lat, lon, indices, distances,
+        support_coords[:, 0], support_coords[:, 1], support_codes,
+        index
+    )
+    positions = association.pop("positions")
+    return lignes_associees(df_mesures, positions, association)
+
+
+# === CORRECTION : STATION MAJORITAIRE PAR tm_cid ===
+def compter_stations(df_result):
+    return df_result.filter(pl.col("tm_cid").is_not_null()).group_by(
+        ["tm_cid", "STA_NM_ANFR"]
+    ).agg(pl.len().alias("count"))
+
+
+def cumuler_comptes(comptes, nouveaux):
+    if comptes is None:
+        return nouveaux
+    return pl.concat([comptes, nouveaux]).group_by(["tm_cid", "STA_NM_ANFR"]).agg(pl.col("count").sum())
+
+
+def stations_dominantes(comptes):
+    # Station la plus fréquente par tm_cid ; à égalité, le plus petit STA_NM_ANFR
+    return comptes.sort(
+        ["tm_cid", "count", "STA_NM_ANFR"], descending=[False, True, False]
+    ).unique("tm_cid", keep="first", maintain_order=True).select(["tm_cid", "STA_NM_ANFR"])
+
+
+def corriger_stations(df_result, dominantes):
+    # Accepte un DataFrame ou un LazyFrame, l'ordre des lignes est conservé
+    colonnes = df_result.collect_schema().names()
+    return df_result.drop("STA_NM_ANFR").join(
+        dominantes, on="tm_cid", how="left", maintain_order="left"
+    ).select(colonnes)
@@ -0,0 +1,219 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Association incrémentale : un nouveau fichier de drive-test est associé seul
+# puis ajouté au magasin resultats/associations/ :
+#   parts/<lot>_<chunk>.parquet  lignes associées (STA_NM_ANFR déjà corrigé)
+#   comptes.parquet              (tm_cid, STA_NM_ANFR, count) sur tous les lots
+#   dominantes.parquet           station majoritaire de chaque tm_cid
+#   localisation.parquet         (tm_cid, part) pour retrouver les lignes d'un tm_cid
+#   manifeste.json               fichiers déjà ingérés, prochain measurement_id,
+#                                empreinte du bundle de référence utilisé
+# Seules les parts contenant un tm_cid dont la station majoritaire a changé
+# sont réécrites. Un lot est écrit entièrement sous des noms temporaires
+# (.nouveau) puis validé par l'écriture du manifeste, qui liste les fichiers
+# à mettre en place : après un arrêt, la réouverture du magasin termine un
+# lot validé ou efface un lot inachevé. Tous les lots doivent être associés
+# avec le même bundle de référence (bundle_reference.py).
+# Le CSV pci_associes_infos_corriges.csv est ensuite régénéré en streaming à
+# partir des parts, sans nouvelle association. Chaque lot numérote ses mesures
+# à la suite des lots précédents : measurement_id reste unique sur tout le
+# magasin. pci et band_table sont stockés en Categorical dans les parts
+# (dictionnaire Parquet).
+# Usage : python association_incrementale.py nouveau_fichier.csv [...]
+
+import argparse
+import json
+import os
+
+import polars as pl
+
+from association import associer_mesures, compter_stations, cumuler_comptes, stations_dominantes
+from bundle_reference import obtenir_bundle
+from cache_tables import hash_fichier
+from ingestion import scanner_mesures, iterer_chunks, TAILLE_CHUNK
+
+# === PARAMÈTRES ===
+DOSSIER_MAGASIN = os.path.join("resultats", "associations")
+CHEMIN_CSV = "resultats\\pci_associes_infos_corriges.csv"
+VERSION_MAGASIN = 3  # à incrémenter si le format des parts ou des tables change
+TABLES = ["comptes", "dominantes", "localisation"]
+
+
+# === MAGASIN ===
+class Magasin:
+    def __init__(self, dossier=DOSSIER_MAGASIN):
+        self.dossier = dossier
+        self.dossier_parts = os.path.join(dossier, "parts")
+        os.makedirs(self.dossier_parts, exist_ok=True)
+
+        chemin_manifeste = os.path.join(dossier, "manifeste.json")
+        if os.path.exists(chemin_manifeste):
+            with open(chemin_manifeste, encoding="utf-8") as f:
+                self.manifeste = json.load(f)
+        else:
+            self.manifeste = {"version": VERSION_MAGASIN, "lots": [], "id_suivant": 0, "reference": None}
+        if self.manifeste.get("version") != VERSION_MAGASIN:
+            raise ValueError(f"Magasin {dossier} d'un format antérieur : le supprimer et réingérer les lots.")
+        self._reprendre()
+
+        self.comptes = self._lire("comptes", {"tm_cid": pl.Utf8, "STA_NM_ANFR": pl.Utf8, "count": pl.UInt32})
+        self.dominantes = self._lire("dominantes", {"tm_cid": pl.Utf8, "STA_NM_ANFR": pl.Utf8})
+        self.localisation = self._lire("localisation", {"tm_cid": pl.Utf8, "part": pl.Utf8})
+
+    def _lire(self, nom, schema):
+        chemin = os.path.join(self.dossier, nom + ".parquet")
+        return pl.read_parquet(chemin) if os.path.exists(chemin) else pl.DataFrame(schema=schema)
+
+    def _ecrire_manifeste(self):
+        chemin = os.path.join(self.dossier, "manifeste.json")
+        with open(chemin + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.manifeste, f, indent=2)
+        os.replace(chemin + ".tmp", chemin)
+
+    def _reprendre(self):
+        # Fichiers listés par un manifeste validé : mis en place. Tout autre
+        # fichier temporaire vient d'un lot inachevé : effacé.
+        en_attente = self.manifeste.pop("en_attente", [])
+        for nom in en_attente:
+            chemin = os.path.join(self.dossier, nom)
+            if os.path.exists(chemin + ".nouveau"):
+                os.replace(chemin + ".nouveau", chemin)
+        for dossier in [self.dossier, self.dossier_parts]:
+            for nom in os.listdir(dossier):
+                if nom.endswith((".nouveau", ".brut", ".tmp")):
+                    os.remove(os.path.join(dossier, nom))
+        if en_attente:
+            self._ecrire_manifeste()
+
+    def preparer(self, df, nom):
+        # nom relatif au magasin ("comptes.parquet", "parts/...") ; mis en place par valider()
+        df.write_parquet(os.path.join(self.dossier, nom) + ".nouveau")
+
+    def valider(self, fichiers):
+        # Point de validation : le manifeste écrit, le lot est acquis
+        for nom in TABLES:
+            self.preparer(getattr(self, nom), nom + ".parquet")
+        self.manifeste["en_attente"] = [nom + ".parquet" for nom in TABLES] + fichiers
+        self._ecrire_manifeste()
+        self._reprendre()
+
+    def parts(self):
+        return sorted(p for p in os.listdir(self.dossier_parts) if p.endswith(".parquet"))
+
+
+# === AJOUT D'UN LOT ===
+def ajouter_lot(magasin, chemin_mesures, reference, taille_chunk=TAILLE_CHUNK):
+    empreinte = hash_fichier(chemin_mesures)
+    if any(lot["hash"] == empreinte for lot in magasin.manifeste["lots"]):
+        print(f"{chemin_mesures} déjà ingéré, ignoré.")
+        return 0
+    if reference.empreinte is None:
+        raise ValueError("Bundle de référence sans empreinte : utiliser bundle_reference.obtenir_bundle().")
+    if magasin.manifeste["lots"] and magasin.manifeste["reference"] != reference.empreinte:
+        raise ValueError(f"Magasin {magasin.dossier} associé avec un autre bundle de référence : "
+                         "le supprimer et réingérer les lots.")
+
+    # 1. Association du seul nouveau fichier, parts écrites avec la station brute
+    numero = len(magasin.manifeste["lots"])
+    premier_id = magasin.manifeste["id_suivant"]
+    nouvelles_parts, comptes_lot, n_lignes, n_mesures = [], None, 0, 0
+    for n, chunk in enumerate(iterer_chunks(scanner_mesures(chemin_mesures, premier_id), taille_chunk)):
+        n_mesures += chunk.height
+        df_chunk = associer_mesures(
+            chunk, reference.support_index, reference.support_coords,
+            reference.support_codes, reference.index_antennes
+        )
+        part = f"{numero:06d}_{n:04d}.parquet"
+        df_chunk.write_parquet(os.path.join(magasin.dossier_parts, part + ".brut"))
+        nouvelles_parts.append(part)
+        comptes_lot = cumuler_comptes(comptes_lot, compter_stations(df_chunk))
+        n_lignes += df_chunk.height
+        magasin.localisation = pl.concat([
+            magasin.localisation,
+            df_chunk.select("tm_cid").drop_nulls().unique().with_columns(pl.lit(part).alias("part"))
+        ])
+
+    # 2. Mise à jour du vote majoritaire, limitée aux tm_cid du lot
+    if comptes_lot is not None:
+        magasin.comptes = cumuler_comptes(magasin.comptes, comptes_lot)
+    touches = comptes_lot.select("tm_cid") if comptes_lot is not None else pl.DataFrame(schema={"tm_cid": pl.Utf8})
+    nouvelles = stations_dominantes(magasin.comptes.join(touches, on="tm_cid", how="semi"))
+    changees = nouvelles.join(magasin.dominantes, on=["tm_cid", "STA_NM_ANFR"], how="anti")
+    magasin.dominantes = pl.concat([
+        magasin.dominantes.join(touches, on="tm_cid", how="anti"), nouvelles
+    ])
+
+    # 3. Réécriture des seules parts existantes touchées par un changement
+    parts_a_corriger = magasin.localisation.join(changees, on="tm_cid", how="semi")["part"].unique().to_list()
+    parts_a_corriger = [p for p in parts_a_corriger if p not in nouvelles_parts]
+    for part in parts_a_corriger:
+        chemin = os.path.join(magasin.dossier_parts, part)
+        magasin.preparer(_appliquer(pl.read_parquet(chemin), changees), os.path.join("parts", part))
+
+    # 4. Correction complète des nouvelles parts (tous leurs tm_cid sont dans "nouvelles")
+    for part in nouvelles_parts:
+        chemin = os.path.join(magasin.dossier_parts, part)
+        magasin.preparer(_appliquer(pl.read_parquet(chemin + ".brut"), nouvelles, tout=True), os.path.join("parts", part))
+        os.remove(chemin + ".brut")
+
+    # 5. Validation : manifeste, puis mise en place des parts et des tables
+    magasin.manifeste["lots"].append({
+        "fichier": chemin_mesures, "hash": empreinte, "lignes": n_lignes, "premier_id": premier_id
+    })
+    magasin.manifeste["id_suivant"] = premier_id + n_mesures
+    magasin.manifeste["reference"] = reference.empreinte
+    magasin.valider([os.path.join("parts", part) for part in parts_a_corriger + nouvelles_parts])
+    print(f"Lot {numero} : {n_lignes} lignes, {changees.height} tm_cid changent de station, "
+          f"{len(parts_a_corriger)} part(s) réécrite(s).")
+    return n_lignes
+
+
+def _appliquer(df, dominantes, tout=False):
+    # tout=True : tm_cid absent -> station nulle, comme la correction complète de testPolars.py
+    df = df.join(
+        dominantes.rename({"STA_NM_ANFR": "STA_corrigee"}), on="tm_cid", how="left", maintain_order="left"
+    )
+    station = pl.col("STA_corrigee") if tout else pl.coalesce(["STA_corrigee", "STA_NM_ANFR"])
+    return df.with_columns(station.alias("STA_NM_ANFR")).drop("STA_corrigee")
+
+
+def exporter_csv(magasin, chemin=CHEMIN_CSV):
+    parts = [os.path.join(magasin.dossier_parts, p) for p in magasin.parts()]
+    pl.scan_parquet(parts).sink_csv(chemin)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Association incrémentale de nouveaux fichiers de mesures.")
+    parser.add_argument("fichiers", nargs="+", help="fichiers de mesures au format Mesures_clean.csv")
+    parser.add_argument("--taille-chunk", type=int, default=TAILLE_CHUNK)
+    parser.add_argument("--sans-csv", action="store_true", help="ne pas régénérer le CSV d'export")
+    args = parser.parse_args()
+
+    reference = obtenir_bundle()
+    magasin = Magasin()
+    for fichier in args.fichiers:
+        ajouter_lot(magasin, fichier, reference, args.taille_chunk)
+    if not args.sans_csv and magasin.parts():
+        exporter_csv(magasin)
+        print("✅ Export terminé : pci_associes_infos_corriges.csv")
@@ -0,0 +1,235 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Association multi-cœurs : les mesures sont découpées en tuiles spatiales
+# traitées par un pool de processus. Les tableaux du bundle de référence sont
+# placés une seule fois en mémoire partagée ; chaque worker s'y attache au
+# démarrage au lieu d'en recevoir une copie. Le résultat est identique au
+# chemin série de testPolars.py.
+# Usage : python association_parallele.py --workers 8
+#         python association_parallele.py --bench 1,2,4,8,16,32
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from association import (
+    IndexAntennes, associer_indices, champs_association, lignes_associees, associer_mesures,
+    compter_stations, stations_dominantes, corriger_stations
+)
+from bundle_reference import BundleReference, TABLEAUX, _tableaux, obtenir_bundle
+from index_spatial import IndexSpherique
+from ingestion import scanner_mesures
+
+# === PARAMÈTRES ===
+TAILLE_TUILE_DEG = 0.5     # côté des tuiles spatiales
+LIGNES_PAR_TACHE = 100_000  # tuiles voisines regroupées jusqu'à cette taille
+
+
+# === MÉMOIRE PARTAGÉE ===
+def _attacher(nom):
+    try:
+        return shared_memory.SharedMemory(name=nom, track=False)
+    except TypeError:
+        # Python < 3.13 : pas de paramètre track, le segment reste suivi par le
+        # resource_tracker mais c'est le processus principal qui le libère
+        return shared_memory.SharedMemory(name=nom)
+
+
+class ReferencePartagee:
+    def __init__(self, reference):
+        self.segments = []
+        self.descripteurs = {}
+        for nom, tableau in _tableaux(reference).items():
+            tableau = np.ascontiguousarray(tableau)
+            shm = shared_memory.SharedMemory(create=True, size=max(tableau.nbytes, 1))
+            np.ndarray(tableau.shape, dtype=tableau.dtype, buffer=shm.buf)[...] = tableau
+            self.segments.append(shm)
+            self.descripteurs[nom] = (shm.name, tableau.shape, tableau.dtype.str)
+
+    def liberer(self):
+        for shm in self.segments:
+            shm.close()
+            shm.unlink()
+        self.segments = []
+
+
+# === WORKER ===
+_segments = []
+_reference = None
+
+
+def _init_worker(descripteurs):
+    global _reference
+    t = {}
+    for nom in TABLEAUX:
+        nom_shm, forme, dtype = descripteurs[nom]
+        shm = _attacher(nom_shm)
+        _segments.append(shm)
+        t[nom] = np.ndarray(forme, dtype=np.dtype(dtype), buffer=shm.buf)
+
+    # L'arbre est reconstruit localement sur les vecteurs partagés (quelques
+    # dizaines de ms, une fois par worker)
+    _reference = BundleReference(
+        support_coords=t["support_coords"],
+        support_sta=t["support_sta"],
+        support_codes=t["support_codes"],
+        support_index=IndexSpherique.depuis_arbre(t["support_vecteurs"], cKDTree(t["support_vecteurs"], leafsize=16)),
+        index_antennes=IndexAntennes(
+            stations=t["antennes_stations"],
+            offsets=t["antennes_offsets"],
+            azimuts=t["antennes_azimuts"],
+            aer_ids=t["antennes_aer_ids"],
+            puissances=t["antennes_puissances"],
+        ),
+    )
+
+
+def _associer_tache(lat, lon):
+    r = _reference
+    distances, indices = r.support_index.plus_proches(lat, lon, workers=1)
+    return associer_indices(
+        lat, lon, indices, distances,
+        r.support_coords[:, 0], r.support_coords[:, 1], r.support_codes, r.index_antennes,
+        progression=False
+    )
+
+
+# === DÉCOUPAGE EN TUILES ===
+def decouper_en_taches(lat, lon, taille_tuile=TAILLE_TUILE_DEG, lignes_par_tache=LIGNES_PAR_TACHE):
+    # Tri stable par tuile, puis regroupement glouton de tuiles entières en
+    # tâches d'au plus lignes_par_tache lignes (une tuile trop grosse est coupée)
+    tuile_lat = np.floor(lat / taille_tuile).astype(np.int64)
+    tuile_lon = np.floor(lon / taille_tuile).astype(np.int64)
+    ordre = np.lexsort((tuile_lon, tuile_lat))
+    changements = (np.diff(tuile_lat[ordre]) != 0) | (np.diff(tuile_lon[ordre]) != 0)
+    fins_tuiles = list(np.flatnonzero(changements) + 1) + [len(ordre)]
+
+    taches, debut, precedente = [], 0, 0
+    for fin in fins_tuiles:
+        if fin - debut > lignes_par_tache and precedente > debut:
+            taches.append(ordre[debut:precedente])
+            debut = precedente
+        while fin - debut > lignes_par_tache:
+            taches.append(ordre[debut:debut + lignes_par_tache])
+            debut += lignes_par_tache
+        precedente = fin
+    if debut < len(ordre):
+        taches.append(ordre[debut:])
+    return taches
+
+
+# === ASSOCIATION PARALLÈLE ===
+class AssociateurParallele:
+    def __init__(self, reference, n_workers):
+        self.reference = reference
+        self.partage = ReferencePartagee(reference)
+        # spawn : le lecteur Polars tourne déjà sur des threads, un fork les figerait
+        self.pool = ProcessPoolExecutor(
+            max_workers=n_workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker, initargs=(self.partage.descripteurs,)
+        )
+
+    def associer(self, df_mesures):
+        lat = df_mesures["latitude"].to_numpy()
+        lon = df_mesures["longitude"].to_numpy()
+        taches = decouper_en_taches(lat, lon)
+        futures = [self.pool.submit(_associer_tache, lat[t], lon[t]) for t in taches]
+
+        # Fusion : positions locales -> positions d'origine, puis remise dans l'ordre
+        positions, antennes, angles, distances = [], [], [], []
+        for tache, future in zip(taches, futures):
+            p, a, ang, d = future.result()
+            positions.append(tache[p])
+            antennes.append(a)
+            angles.append(ang)
+            distances.append(d)
+        if not taches:
+            vide = np.empty(0, dtype=np.int64)
+            return lignes_associees(df_mesures, vide, champs_association(
+                self.reference.index_antennes, vide, np.empty(0), np.empty(0)
+            ))
+        positions = np.concatenate(positions)
+        ordre = np.argsort(positions, kind="stable")
+        champs = champs_association(
+            self.reference.index_antennes,
+            np.concatenate(antennes)[ordre], np.concatenate(angles)[ordre], np.concatenate(distances)[ordre]
+        )
+        return lignes_associees(df_mesures, positions[ordre], champs)
+
+    def fermer(self):
+        self.pool.shutdown()
+        self.partage.liberer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+
+# === BANC D'ESSAI ===
+def comparer_workers(reference, df_mesures, liste_workers):
+    t0 = time.perf_counter()
+    serie = associer_mesures(df_mesures, reference.support_index, reference.support_coords,
+                             reference.support_codes, reference.index_antennes)
+    t_serie = time.perf_counter() - t0
+    print(f"Série         : {t_serie:6.2f} s")
+
+    for n in liste_workers:
+        t0 = time.perf_counter()
+        with AssociateurParallele(reference, n) as associateur:
+            t_demarrage = time.perf_counter() - t0
+            t1 = time.perf_counter()
+            parallele = associateur.associer(df_mesures)
+            t_association = time.perf_counter() - t1
+        identique = parallele.equals(serie)
+        print(f"{n:3d} worker(s) : {t_association:6.2f} s (+{t_demarrage:.2f} s démarrage), "
+              f"accélération x{t_serie / t_association:.1f}, identique : {identique}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Association parallèle des mesures (même sortie que testPolars.py).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--bench", help="liste de nombres de workers à comparer au chemin série, ex. 1,2,4,8")
+    parser.add_argument("--mesures", default="ressources\\Mesures_clean.csv")
+    args = parser.parse_args()
+
+    reference = obtenir_bundle()
+    df_mesures = scanner_mesures(args.mesures).collect()
+
+    if args.bench:
+        comparer_workers(reference, df_mesures, [int(n) for n in args.bench.split(",")])
+    else:
+        print(f"Association en cours sur {args.workers} workers...")
+        with AssociateurParallele(reference, args.workers) as associateur:
+            df_result = associateur.associer(df_mesures)
+        df_result = corriger_stations(df_result, stations_dominantes(compter_stations(df_result)))
+        df_result.write_csv("resultats\\pci_associes_infos_corriges.csv")
+        print("✅ Export terminé : pci_associes_infos_corriges.csv")
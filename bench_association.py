@@ -0,0 +1,142 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Banc d'essai : ancienne boucle iterrows de testPolars.py contre le moteur CSR.
+# Usage : python bench_association.py [n_mesures]
+
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from association import construire_index_antennes, associer_antennes
+from geo import cap_initial_reference, haversine_reference
+from index_spatial import IndexSpherique
+
+# === PARAMÈTRES ===
+N_SUPPORTS = 5_000
+N_MESURES = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+rng = np.random.default_rng(42)
+
+
+# === ANCIENNE IMPLÉMENTATION (référence) ===
+# L'angle plan atan2(dlat, dlon) est remplacé par le cap initial scalaire, la
+# définition désormais utilisée par association.py.
+def boucle_iterrows(mesures_pd, support_matched, antennes_pd, emetteurs_pd):
+    antenne_map = defaultdict(list)
+    for _, row in antennes_pd.iterrows():
+        antenne_map[row["STA_NM_ANFR"]].append(row)
+    emetteur_lookup = emetteurs_pd.set_index(["STA_NM_ANFR", "AER_ID"])["EMR_NB_PUISSANCE"].to_dict()
+
+    results = []
+    for i, row in tqdm(mesures_pd.iterrows(), total=len(mesures_pd)):
+        lat, lon = row["latitude"], row["longitude"]
+        support = support_matched.iloc[i]
+        sta_nm = support["STA_NM_ANFR"]
+        antennes = antenne_map.get(sta_nm, [])
+        if not antennes:
+            continue
+        angle = cap_initial_reference(support["LAT"], support["LON"], lat, lon)
+        distance = haversine_reference(lat, lon, support["LAT"], support["LON"])
+        azimuts = [a["AER_NB_AZIMUT"] for a in antennes if not pd.isna(a["AER_NB_AZIMUT"])]
+        if not azimuts:
+            continue
+        angle_diffs = np.abs((np.array(azimuts) - angle + 180) % 360 - 180)
+        best_antenne = antennes[np.argmin(angle_diffs)]
+        aer_id = best_antenne["AER_ID"]
+        results.append({
+            "latitude": lat,
+            "longitude": lon,
+            "STA_NM_ANFR": sta_nm,
+            "AER_ID": aer_id,
+            "AER_NB_AZIMUT": best_antenne["AER_NB_AZIMUT"],
+            "angle_vers_antenne": angle,
+            "distance_to_support_km": round(distance, 3),
+            "EMR_NB_PUISSANCE": emetteur_lookup.get((sta_nm, aer_id), np.nan),
+        })
+    return pd.DataFrame(results)
+
+
+# === DONNÉES SYNTHÉTIQUES ===
+# Un support sur dix n'a pas d'antenne ; les azimuts sont tous renseignés, cas
+# où l'ancienne boucle est correcte (avec des azimuts vides elle indexait la
+# liste non filtrée).
+sup_lat = rng.uniform(42, 52, N_SUPPORTS)
+sup_lon = rng.uniform(-5, 9, N_SUPPORTS)
+sup_nm = np.array([f"{i:07d}" for i in range(N_SUPPORTS)])
+support_labels = pd.DataFrame({"STA_NM_ANFR": sup_nm, "LAT": sup_lat, "LON": sup_lon})
+
+n_ant = rng.integers(0, 7, N_SUPPORTS) * (rng.random(N_SUPPORTS) > 0.1)
+ant_sta = np.repeat(sup_nm, n_ant)
+antennes_pd = pd.DataFrame({
+    "STA_NM_ANFR": ant_sta,
+    "AER_ID": [str(i) for i in range(len(ant_sta))],
+    "AER_NB_AZIMUT": rng.choice([0.0, 90.0, 120.0, 180.0, 240.0, 270.0], len(ant_sta)),
+}).sample(frac=1, random_state=0).reset_index(drop=True)
+emetteurs_pd = antennes_pd[["STA_NM_ANFR", "AER_ID"]].assign(
+    EMR_NB_PUISSANCE=rng.uniform(10, 40, len(antennes_pd))
+).sample(frac=0.9, random_state=1)
+
+mes_lat = rng.uniform(42, 52, N_MESURES)
+mes_lon = rng.uniform(-5, 9, N_MESURES)
+support_index = IndexSpherique(sup_lat, sup_lon)
+mesures_pd = pd.DataFrame({"latitude": mes_lat, "longitude": mes_lon})
+
+# === MESURES ===
+# L'ancienne boucle reçoit les mêmes supports que le moteur pour comparer l'association seule
+distances, indices = support_index.plus_proches(mes_lat, mes_lon)
+support_matched = support_labels.iloc[indices].reset_index(drop=True)
+t0 = time.perf_counter()
+ref = boucle_iterrows(mesures_pd, support_matched, antennes_pd, emetteurs_pd)
+t_boucle = time.perf_counter() - t0
+
+t0 = time.perf_counter()
+distances, indices = support_index.plus_proches(mes_lat, mes_lon)
+puissances = antennes_pd.merge(emetteurs_pd, on=["STA_NM_ANFR", "AER_ID"], how="left")["EMR_NB_PUISSANCE"]
+index = construire_index_antennes(
+    antennes_pd["STA_NM_ANFR"], antennes_pd["AER_ID"], antennes_pd["AER_NB_AZIMUT"], puissances
+)
+association = associer_antennes(
+    mes_lat, mes_lon, indices, distances, sup_lat, sup_lon, index.codes_stations(sup_nm), index
+)
+t_vecto = time.perf_counter() - t0
+
+# === VÉRIFICATION ===
+positions = association.pop("positions")
+vecto = pd.DataFrame({"latitude": mes_lat[positions], "longitude": mes_lon[positions], **association})
+assert len(vecto) == len(ref), (len(vecto), len(ref))
+for col in ["STA_NM_ANFR", "AER_ID"]:
+    assert (vecto[col].values == ref[col].values).all(), col
+for col in ["latitude", "longitude", "AER_NB_AZIMUT", "angle_vers_antenne", "EMR_NB_PUISSANCE"]:
+    np.testing.assert_allclose(vecto[col].values, ref[col].values.astype(float), rtol=0, atol=1e-9, err_msg=col)
+# Distance par la corde 3D contre haversine scalaire : seul l'arrondi au mètre peut basculer
+np.testing.assert_allclose(vecto["distance_to_support_km"].values, ref["distance_to_support_km"].values,
+                           rtol=0, atol=1e-3 + 1e-9, err_msg="distance_to_support_km")
+
+print(f"{N_MESURES} mesures, {len(ref)} associées")
+print(f"Boucle iterrows : {t_boucle:.2f} s ({N_MESURES / t_boucle:,.0f} mesures/s)")
+print(f"Moteur CSR      : {t_vecto:.2f} s ({N_MESURES / t_vecto:,.0f} mesures/s)")
+print(f"Accélération    : x{t_boucle / t_vecto:.0f}")
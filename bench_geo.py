@@ -0,0 +1,104 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Banc d'essai des noyaux de geo.py : écart aux références scalaires (math)
+# en float64 et float32, puis débit des noyaux vectorisés. Les seuils de
+# précision sont vérifiés par tests/test_geo.py.
+# Usage : python bench_geo.py [n_points]
+
+import sys
+import time
+
+import numpy as np
+
+from geo import (
+    haversine, cap_initial, ecart_angulaire, point_destination,
+    haversine_reference, cap_initial_reference, ecart_angulaire_reference, point_destination_reference
+)
+
+# === PARAMÈTRES ===
+N_POINTS = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+N_REFERENCE = 20_000  # points évalués par la boucle scalaire
+rng = np.random.default_rng(0)
+
+# Mesures autour de supports situés en France métropolitaine (distances < 30 km)
+lat1 = rng.uniform(42, 52, N_POINTS)
+lon1 = rng.uniform(-5, 9, N_POINTS)
+caps = rng.uniform(0, 360, N_POINTS)
+portees = rng.uniform(0.001, 30, N_POINTS)
+lat2, lon2 = point_destination(lat1, lon1, caps, portees)
+azimuts = rng.uniform(0, 360, N_POINTS)
+
+
+def ecart_cap(a, b):
+    return np.abs((a - b + 180) % 360 - 180)
+
+
+# === PRÉCISION ===
+r = slice(0, N_REFERENCE)
+ref_dist = np.array([haversine_reference(*p) for p in zip(lat1[r], lon1[r], lat2[r], lon2[r])])
+ref_cap = np.array([cap_initial_reference(*p) for p in zip(lat1[r], lon1[r], lat2[r], lon2[r])])
+ref_ecart = np.array([ecart_angulaire_reference(*p) for p in zip(azimuts[r], caps[r])])
+ref_dest = np.array([point_destination_reference(*p) for p in zip(lat1[r], lon1[r], caps[r], portees[r])])
+
+print("Écart maximal aux références scalaires :")
+for dtype in [np.float64, np.float32]:
+    nom = np.dtype(dtype).name
+    e_dist = np.abs(haversine(lat1[r], lon1[r], lat2[r], lon2[r], dtype=dtype) - ref_dist).max()
+    e_cap = ecart_cap(cap_initial(lat1[r], lon1[r], lat2[r], lon2[r], dtype=dtype), ref_cap).max()
+    e_ecart = np.abs(ecart_angulaire(azimuts[r], caps[r], dtype=dtype) - ref_ecart).max()
+    dest_lat, dest_lon = point_destination(lat1[r], lon1[r], caps[r], portees[r], dtype=dtype)
+    e_dest = max(np.abs(dest_lat - ref_dest[:, 0]).max(), np.abs(dest_lon - ref_dest[:, 1]).max())
+    print(f"  {nom:7s} distance {e_dist:.2e} km, cap {e_cap:.2e}°, écart {e_ecart:.2e}°, destination {e_dest:.2e}°")
+
+
+# === DÉBIT ===
+def chronometrer(fonction, *args, **kwargs):
+    fonction(*args, **kwargs)  # échauffement
+    t0 = time.perf_counter()
+    fonction(*args, **kwargs)
+    return time.perf_counter() - t0
+
+
+t0 = time.perf_counter()
+for p in zip(lat1[r], lon1[r], lat2[r], lon2[r]):
+    cap_initial_reference(*p)
+t_scalaire = (time.perf_counter() - t0) / N_REFERENCE * N_POINTS
+
+print(f"\nDébit sur {N_POINTS:,} points (cap scalaire extrapolé : {N_POINTS / t_scalaire:,.0f} points/s) :")
+for dtype in [np.float64, np.float32]:
+    args = [a.astype(dtype) for a in (lat1, lon1, lat2, lon2)]
+    for nom, fonction, entrees in [
+        ("haversine", haversine, args),
+        ("cap_initial", cap_initial, args),
+        ("ecart_angulaire", ecart_angulaire, [azimuts.astype(dtype), caps.astype(dtype)]),
+        ("point_destination", point_destination, [args[0], args[1], caps.astype(dtype), portees.astype(dtype)]),
+    ]:
+        t = chronometrer(fonction, *entrees, dtype=dtype)
+        print(f"  {np.dtype(dtype).name:7s} {nom:17s} {N_POINTS / t:14,.0f} points/s")
+
+# Effet de la taille de bloc sur le noyau le plus utilisé
+print("\ncap_initial float64 selon la taille de bloc :")
+for taille_bloc in [1 << 12, 1 << 16, 1 << 20, N_POINTS]:
+    t = chronometrer(cap_initial, lat1, lon1, lat2, lon2, taille_bloc=taille_bloc)
+    print(f"  bloc {taille_bloc:>10,} : {N_POINTS / t:14,.0f} points/s")
@@ -0,0 +1,162 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Banc d'essai du pipeline complet sur données synthétiques
+# (donnees_synthetiques.py) : chaque étape est lancée comme script séparé,
+# dans l'ordre du pipeline, avec son temps et son pic mémoire (RSS maximal du
+# processus). Les résultats sont écrits en JSON avec la version du code pour
+# comparer deux versions (--comparer). Le banc est une suite pytest
+# (tests/test_bench_pipeline.py, paramétrée par taille et par étape) ; ce
+# script n'en est que le lanceur.
+# Usage : python bench_pipeline.py --tailles 10000,100000,1000000
+#         python bench_pipeline.py --tailles 100000 --comparer benchmarks\bench_ancien.json
+#         python -m pytest tests/test_bench_pipeline.py --bench-tailles 10000 -s
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# === PARAMÈTRES ===
+DOSSIER_REPO = os.path.dirname(os.path.abspath(__file__))
+DOSSIER_DONNEES = "bench_donnees"
+DOSSIER_RESULTATS = "benchmarks"
+SEUIL_REGRESSION = 1.2  # +20 % de temps ou de mémoire
+
+# (nom, script et arguments), dans l'ordre du pipeline
+ETAPES = [
+    ("detect_type", ["detect_type.py"]),
+    ("association", ["testPolars.py"]),
+    ("features", ["features.py"]),
+    ("entrainement", ["trainRandomForest.py"]),
+    ("prediction", ["predict.py"]),
+    ("prediction_lots", ["predict.py", "--entree", "resultats\\pci_associes_infos_corriges.csv"]),
+    ("resultatsPL", ["resultatsPL.py"]),
+    ("graph1", ["graph1_pmes_vs_distance.py"]),
+    ("graph2", ["graph2_lowess.py"]),
+    ("graph3", ["graph3_geoplot.py"]),
+    ("graph4", ["graph4_freq_vs_distance.py"]),
+    ("graph5", ["graph5_heatmap.py"]),
+]
+
+
+def version_code():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=DOSSIER_REPO,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "inconnue"
+
+
+def preparer_donnees(n_mesures, dossier=DOSSIER_DONNEES):
+    # Un dossier par taille, généré une fois (graine fixe). La génération
+    # tourne dans un processus à part : le pic mémoire d'un fils part de la
+    # mémoire du parent au moment du fork, qui doit rester minimale.
+    dossier = os.path.abspath(os.path.join(dossier, str(n_mesures)))
+    marqueur = os.path.join(dossier, "donnees_synthetiques.ok")
+    if not os.path.exists(marqueur):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(DOSSIER_REPO, "donnees_synthetiques.py"),
+                        "--mesures", str(n_mesures), "--dossier", dossier], check=True)
+        open(marqueur, "w").close()
+        print(f"  données générées en {time.perf_counter() - t0:.1f} s")
+    # "resultats\\..." est un dossier sous Windows ; les graphes écrivent dans visualisations/
+    for sous_dossier in ["resultats", "visualisations"]:
+        os.makedirs(os.path.join(dossier, sous_dossier), exist_ok=True)
+    return dossier
+
+
+def lancer_etape(nom, commande, dossier):
+    # Pic mémoire : ru_maxrss du processus fils (Ko sous Linux, octets sous macOS),
+    # indisponible sous Windows
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [DOSSIER_REPO, os.environ.get("PYTHONPATH")])),
+               MPLBACKEND="Agg")
+    with open(os.path.join(dossier, f"bench_{nom}.log"), "w", encoding="utf-8") as journal:
+        t0 = time.perf_counter()
+        processus = subprocess.Popen([sys.executable, os.path.join(DOSSIER_REPO, commande[0])] + commande[1:],
+                                     cwd=dossier, env=env, stdout=journal, stderr=subprocess.STDOUT)
+        if hasattr(os, "wait4"):
+            _, statut, usage = os.wait4(processus.pid, 0)
+            processus.returncode = os.waitstatus_to_exitcode(statut)
+            pic_mo = usage.ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024)
+        else:
+            processus.wait()
+            pic_mo = None
+        duree = time.perf_counter() - t0
+    return {"duree_s": round(duree, 3), "pic_memoire_mo": pic_mo and round(pic_mo, 1), "code_retour": processus.returncode}
+
+
+def nouveaux_resultats():
+    return {
+        "version": version_code(), "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(), "plateforme": platform.platform(), "n_cpu": os.cpu_count(),
+        "tailles": {},
+    }
+
+
+def afficher_etape(nom, r):
+    etat = "" if r["code_retour"] == 0 else f"  ÉCHEC (code {r['code_retour']}, voir bench_{nom}.log)"
+    memoire = f"{r['pic_memoire_mo']:8.0f} Mo" if r["pic_memoire_mo"] is not None else "       ? Mo"
+    print(f"  {nom:<16s} {r['duree_s']:8.2f} s {memoire}{etat}")
+
+
+def ecrire_resultats(resultats, dossier=DOSSIER_RESULTATS):
+    os.makedirs(dossier, exist_ok=True)
+    chemin = os.path.join(dossier, f"bench_{resultats['version']}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(chemin, "w", encoding="utf-8") as f:
+        json.dump(resultats, f, indent=2)
+    return chemin
+
+
+def comparer(actuel, ancien):
+    print(f"\nComparaison avec {ancien['version']} ({ancien['date']}) :")
+    for taille, etapes in actuel["tailles"].items():
+        for nom, r in etapes.items():
+            a = ancien["tailles"].get(taille, {}).get(nom)
+            if a is None or r["code_retour"] or a["code_retour"]:
+                continue
+            ratio_t = r["duree_s"] / max(a["duree_s"], 1e-9)
+            ratio_m = (r["pic_memoire_mo"] or 0) / max(a["pic_memoire_mo"] or 0, 1e-9) if a["pic_memoire_mo"] else 1.0
+            alerte = "  ⚠ régression" if max(ratio_t, ratio_m) > SEUIL_REGRESSION else ""
+            print(f"  {taille:>9s} {nom:<16s} temps x{ratio_t:5.2f}  mémoire x{ratio_m:5.2f}{alerte}")
+
+
+if __name__ == "__main__":
+    import pytest
+
+    parser = argparse.ArgumentParser(description="Banc d'essai du pipeline sur données synthétiques.")
+    parser.add_argument("--tailles", default="10000,100000", help="nombres de mesures, ex. 10000,100000,1000000")
+    parser.add_argument("--etapes", default=",".join(nom for nom, _ in ETAPES))
+    parser.add_argument("--dossier-donnees", default=DOSSIER_DONNEES)
+    parser.add_argument("--comparer", help="JSON d'un banc précédent")
+    args = parser.parse_args()
+
+    options = ["--bench-tailles", args.tailles, "--bench-etapes", args.etapes,
+               "--bench-donnees", args.dossier_donnees]
+    if args.comparer:
+        options += ["--bench-comparer", args.comparer]
+    sys.exit(pytest.main([os.path.join(DOSSIER_REPO, "tests", "test_bench_pipeline.py"), "-s", "-q",
+                          "-p", "no:cacheprovider", "--rootdir", DOSSIER_REPO] + options))
@@ -0,0 +1,192 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Bundle de référence sur disque : tout ce qu'il faut pour associer une mesure
+# (coordonnées et arbre des supports, index CSR des antennes, puissances)
+# en fichiers .npy relus par memory-map. Le manifeste garde l'empreinte des
+# fichiers ANFR d'origine ; un bundle périmé est refusé au chargement.
+# Usage : python bundle_reference.py  (reconstruit le bundle)
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from dataclasses import dataclass
+
+import numpy as np
+import polars as pl
+
+from association import IndexAntennes, construire_index_antennes
+from cache_tables import empreinte_fichier, source_a_jour
+from index_spatial import IndexSpherique
+from tables_reference import (
+    CHEMIN_SUPPORTS, CHEMIN_ANTENNES, CHEMIN_EMETTEURS,
+    charger_supports, charger_antennes, charger_emetteurs
+)
+
+# === PARAMÈTRES ===
+VERSION_BUNDLE = 1  # à incrémenter si le contenu ou le format change
+DOSSIER_BUNDLE = os.path.join("cache", "bundle_reference")
+SOURCES = [CHEMIN_SUPPORTS, CHEMIN_ANTENNES, CHEMIN_EMETTEURS]
+
+
+@dataclass
+class BundleReference:
+    support_coords: np.ndarray  # (n, 2) LAT, LON
+    support_sta: np.ndarray     # STA_NM_ANFR de chaque support
+    support_codes: np.ndarray   # position de la station dans index_antennes, -1 sinon
+    support_index: IndexSpherique
+    index_antennes: IndexAntennes
+    empreinte: str = None       # version + contenu des sources ANFR (bundle sur disque)
+
+
+def empreinte_bundle(sources):
+    # Ne dépend que de la version et du hash des sources, pas de leurs dates
+    description = json.dumps([VERSION_BUNDLE] + sorted((chemin, e["hash"]) for chemin, e in sources.items()))
+    return hashlib.blake2b(description.encode(), digest_size=16).hexdigest()
+
+
+# === CONSTRUCTION EN MÉMOIRE ===
+def construire_reference(df_support, df_antennes, df_emetteur):
+    support_coords = df_support.select(["LAT", "LON"]).to_numpy()
+    support_sta = df_support["STA_NM_ANFR"].fill_null("").to_numpy().astype(str)
+
+    # En cas de doublon (STA_NM_ANFR, AER_ID) dans EMETTEUR, la dernière ligne l'emporte
+    df_antennes = df_antennes.filter(pl.col("STA_NM_ANFR").is_not_null()).with_row_index("rang").join(
+        df_emetteur.unique(["STA_NM_ANFR", "AER_ID"], keep="last"),
+        on=["STA_NM_ANFR", "AER_ID"],
+        how="left"
+    ).sort("rang")
+    index_antennes = construire_index_antennes(
+        df_antennes["STA_NM_ANFR"].to_numpy(),
+        df_antennes["AER_ID"].fill_null("").to_numpy(),
+        df_antennes["AER_NB_AZIMUT"].to_numpy(),
+        df_antennes["EMR_NB_PUISSANCE"].to_numpy()
+    )
+
+    return BundleReference(
+        support_coords=support_coords,
+        support_sta=support_sta,
+        support_codes=index_antennes.codes_stations(support_sta),
+        support_index=IndexSpherique(support_coords[:, 0], support_coords[:, 1]),
+        index_antennes=index_antennes,
+    )
+
+
+# === ÉCRITURE / LECTURE ===
+TABLEAUX = [
+    "support_coords", "support_sta", "support_codes", "support_vecteurs",
+    "antennes_stations", "antennes_offsets", "antennes_azimuts", "antennes_aer_ids", "antennes_puissances",
+]
+
+
+def _tableaux(bundle):
+    return {
+        "support_coords": bundle.support_coords,
+        "support_sta": bundle.support_sta,
+        "support_codes": bundle.support_codes,
+        "support_vecteurs": bundle.support_index.vecteurs,
+        "antennes_stations": bundle.index_antennes.stations,
+        "antennes_offsets": bundle.index_antennes.offsets,
+        "antennes_azimuts": bundle.index_antennes.azimuts,
+        "antennes_aer_ids": bundle.index_antennes.aer_ids,
+        "antennes_puissances": bundle.index_antennes.puissances,
+    }
+
+
+def construire_bundle(dossier=DOSSIER_BUNDLE):
+    # Empreintes prises avant la lecture : une source modifiée pendant la
+    # construction rendra le bundle périmé plutôt que faussement à jour
+    sources = {chemin: empreinte_fichier(chemin) for chemin in SOURCES}
+    bundle = construire_reference(charger_supports(), charger_antennes(), charger_emetteurs())
+
+    tmp = dossier + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for nom, tableau in _tableaux(bundle).items():
+        np.save(os.path.join(tmp, nom + ".npy"), np.ascontiguousarray(tableau))
+    with open(os.path.join(tmp, "arbre.pkl"), "wb") as f:
+        pickle.dump(bundle.support_index.arbre, f, protocol=pickle.HIGHEST_PROTOCOL)
+    with open(os.path.join(tmp, "manifeste.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": VERSION_BUNDLE, "sources": sources}, f, indent=2)
+
+    shutil.rmtree(dossier, ignore_errors=True)
+    os.replace(tmp, dossier)
+    bundle.empreinte = empreinte_bundle(sources)
+    return bundle
+
+
+def charger_bundle(dossier=DOSSIER_BUNDLE):
+    chemin_manifeste = os.path.join(dossier, "manifeste.json")
+    if not os.path.exists(chemin_manifeste):
+        raise ValueError(f"Bundle absent : {dossier}")
+    with open(chemin_manifeste, encoding="utf-8") as f:
+        manifeste = json.load(f)
+    if manifeste["version"] != VERSION_BUNDLE:
+        raise ValueError(f"Bundle en version {manifeste['version']}, attendu {VERSION_BUNDLE}.")
+    if set(manifeste["sources"]) != set(SOURCES):
+        raise ValueError("Bundle construit à partir d'autres fichiers de référence.")
+    mtimes = {chemin: empreinte["mtime_ns"] for chemin, empreinte in manifeste["sources"].items()}
+    for chemin, empreinte in manifeste["sources"].items():
+        if not os.path.exists(chemin) or not source_a_jour(chemin, empreinte):
+            raise ValueError(f"Bundle périmé : {chemin} a changé depuis sa construction.")
+    if any(empreinte["mtime_ns"] != mtimes[chemin] for chemin, empreinte in manifeste["sources"].items()):
+        # Sources touchées mais contenu identique : on mémorise les nouvelles dates
+        with open(chemin_manifeste, "w", encoding="utf-8") as f:
+            json.dump(manifeste, f, indent=2)
+
+    t = {nom: np.load(os.path.join(dossier, nom + ".npy"), mmap_mode="r") for nom in TABLEAUX}
+    with open(os.path.join(dossier, "arbre.pkl"), "rb") as f:
+        arbre = pickle.load(f)
+
+    return BundleReference(
+        support_coords=t["support_coords"],
+        support_sta=t["support_sta"],
+        support_codes=t["support_codes"],
+        support_index=IndexSpherique.depuis_arbre(t["support_vecteurs"], arbre),
+        index_antennes=IndexAntennes(
+            stations=t["antennes_stations"],
+            offsets=t["antennes_offsets"],
+            azimuts=t["antennes_azimuts"],
+            aer_ids=t["antennes_aer_ids"],
+            puissances=t["antennes_puissances"],
+        ),
+        empreinte=empreinte_bundle(manifeste["sources"]),
+    )
+
+
+def obtenir_bundle(dossier=DOSSIER_BUNDLE):
+    # Bundle sur disque s'il est à jour, sinon reconstruction. Un bundle
+    # abîmé (.npy absent ou tronqué, manifeste ou arbre illisible) est
+    # reconstruit aussi ; JSONDecodeError est une ValueError.
+    try:
+        return charger_bundle(dossier)
+    except (OSError, ValueError, KeyError, EOFError, pickle.UnpicklingError) as e:
+        print(f"{e} Reconstruction du bundle de référence...")
+        return construire_bundle(dossier)
+
+
+if __name__ == "__main__":
+    construire_bundle()
+    print(f"✅ Bundle de référence écrit : {DOSSIER_BUNDLE}")
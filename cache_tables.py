@@ -0,0 +1,108 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Cache binaire des tables nettoyées : chaque table est écrite une fois en
+# Arrow IPC non compressé (Polars le relit par memory-map) à côté d'un JSON qui
+# décrit le fichier source. Modifier une source ne reconstruit que sa table.
+
+import hashlib
+import json
+import os
+import re
+
+import pandas as pd
+import polars as pl
+
+# === PARAMÈTRES ===
+DOSSIER_CACHE = "cache"
+TAILLE_BLOC_HASH = 8 * 1024 * 1024
+
+
+# === EMPREINTE DES SOURCES ===
+def hash_fichier(chemin):
+    h = hashlib.blake2b(digest_size=16)
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(TAILLE_BLOC_HASH), b""):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+def empreinte_fichier(chemin):
+    stat = os.stat(chemin)
+    return {"taille": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": hash_fichier(chemin)}
+
+
+def source_a_jour(chemin, empreinte):
+    # Taille + date identiques : pas besoin de relire le fichier. Sinon on
+    # compare le hash (un simple touch ou une copie ne périment pas le cache).
+    stat = os.stat(chemin)
+    if stat.st_size != empreinte["taille"]:
+        return False
+    if stat.st_mtime_ns == empreinte["mtime_ns"]:
+        return True
+    if hash_fichier(chemin) != empreinte["hash"]:
+        return False
+    empreinte["mtime_ns"] = stat.st_mtime_ns
+    return True
+
+
+# === CACHE ===
+def _nom_cache(chemin_source):
+    # "ressources\\Gain.csv" -> "ressources_Gain"
+    base = os.path.splitext(chemin_source)[0]
+    return re.sub(r"[^\w-]+", "_", base).strip("_")
+
+
+def charger_table(chemin_source, lecteur, version="1", dossier=DOSSIER_CACHE):
+    # lecteur(chemin_source) -> pl.DataFrame nettoyé et typé ; version est à
+    # incrémenter quand le lecteur change pour invalider les caches existants
+    nom = _nom_cache(chemin_source)
+    chemin_ipc = os.path.join(dossier, nom + ".arrow")
+    chemin_meta = os.path.join(dossier, nom + ".json")
+
+    if os.path.exists(chemin_ipc) and os.path.exists(chemin_meta):
+        with open(chemin_meta, encoding="utf-8") as f:
+            meta = json.load(f)
+        mtime_ns = meta["source"]["mtime_ns"]
+        if meta["version"] == version and source_a_jour(chemin_source, meta["source"]):
+            if meta["source"]["mtime_ns"] != mtime_ns:
+                with open(chemin_meta, "w", encoding="utf-8") as f:
+                    json.dump(meta, f, indent=2)
+            return pl.read_ipc(chemin_ipc)
+
+    empreinte = empreinte_fichier(chemin_source)
+    df = lecteur(chemin_source)
+    os.makedirs(dossier, exist_ok=True)
+    df.write_ipc(chemin_ipc + ".tmp", compression="uncompressed")
+    os.replace(chemin_ipc + ".tmp", chemin_ipc)
+    with open(chemin_meta, "w", encoding="utf-8") as f:
+        json.dump({"source": empreinte, "version": version, "chemin": chemin_source}, f, indent=2)
+    return pl.read_ipc(chemin_ipc)
+
+
+def charger_csv_pandas(chemin_source, **options_read_csv):
+    # Même typage que pd.read_csv (les scripts pandas fusionnent sur ces types),
+    # mais le parsing n'a lieu qu'une fois
+    version = "pandas-" + json.dumps(options_read_csv, sort_keys=True)
+    df = charger_table(chemin_source, lambda chemin: pl.from_pandas(pd.read_csv(chemin, **options_read_csv)), version)
+    return df.to_pandas()
@@ -0,0 +1,144 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Carte Voronoi sans fenêtre : chaque pixel de l'emprise est rattaché au
+# support le plus proche (même index sphérique que l'association), les
+# frontières entre cellules et la densité de mesures sont rendues avec
+# datashader dans un PNG. Les mesures sont lues par chunks et agrégées par
+# cellule (nombre, tm_dbm moyen, tm_cid majoritaire) avec np.bincount, sans
+# dessiner de point.
+
+import numpy as np
+import pandas as pd
+import polars as pl
+import xarray as xr
+import datashader as ds
+import datashader.transfer_functions as tf
+import colorcet
+
+from ingestion import iterer_chunks, TAILLE_CHUNK, LAT_MIN, LAT_MAX, LON_MIN, LON_MAX
+
+# === PARAMÈTRES ===
+LARGEUR_PX = 2000
+HAUTEUR_PX = 2000
+LIGNES_PAR_REQUETE = 200  # lignes de pixels rattachées par requête à l'index
+
+
+# === CELLULES ===
+def etiquettes_pixels(support_index, longitudes, latitudes):
+    # Support le plus proche du centre de chaque pixel, tableau (hauteur, largeur)
+    etiquettes = np.empty((len(latitudes), len(longitudes)), dtype=np.int64)
+    for debut in range(0, len(latitudes), LIGNES_PAR_REQUETE):
+        lat, lon = np.meshgrid(latitudes[debut:debut + LIGNES_PAR_REQUETE], longitudes, indexing="ij")
+        _, indices = support_index.plus_proches(lat.ravel(), lon.ravel())
+        etiquettes[debut:debut + LIGNES_PAR_REQUETE] = indices.reshape(lat.shape)
+    return etiquettes
+
+
+def frontieres(etiquettes):
+    # Pixel de frontière : son voisin de droite ou du dessous est dans une autre cellule
+    bords = np.zeros(etiquettes.shape, dtype=bool)
+    bords[:, 1:] |= etiquettes[:, 1:] != etiquettes[:, :-1]
+    bords[1:, :] |= etiquettes[1:, :] != etiquettes[:-1, :]
+    return bords
+
+
+class AgregatsCellules:
+    def __init__(self, n_supports):
+        self.n_mesures = np.zeros(n_supports, dtype=np.int64)
+        self.n_dbm = np.zeros(n_supports, dtype=np.int64)
+        self.somme_dbm = np.zeros(n_supports)
+        self.comptes_cid = None
+
+    def ajouter(self, cellules, df_chunk):
+        n = len(self.n_mesures)
+        dbm = df_chunk["tm_dbm"].to_numpy()
+        valides = ~np.isnan(dbm)
+        self.n_mesures += np.bincount(cellules, minlength=n)
+        self.n_dbm += np.bincount(cellules[valides], minlength=n)
+        self.somme_dbm += np.bincount(cellules[valides], weights=dbm[valides], minlength=n)
+
+        comptes = pl.DataFrame({
+            "cellule": cellules, "tm_cid": df_chunk["tm_cid"]
+        }).drop_nulls().group_by(["cellule", "tm_cid"]).agg(pl.len().alias("count"))
+        if self.comptes_cid is not None:
+            comptes = pl.concat([self.comptes_cid, comptes]).group_by(["cellule", "tm_cid"]).agg(pl.col("count").sum())
+        self.comptes_cid = comptes
+
+    def table(self, support_sta, support_coords):
+        # Une ligne par cellule contenant au moins une mesure ; tm_cid
+        # majoritaire à égalité : le plus petit, comme stations_dominantes
+        cellules = np.flatnonzero(self.n_mesures)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            moyennes = self.somme_dbm[cellules] / self.n_dbm[cellules]
+        df = pl.DataFrame({
+            "cellule": cellules,
+            "STA_NM_ANFR": np.asarray(support_sta)[cellules],
+            "LAT": np.asarray(support_coords[:, 0])[cellules],
+            "LON": np.asarray(support_coords[:, 1])[cellules],
+            "n_mesures": self.n_mesures[cellules],
+            "tm_dbm_moyen": pl.Series(moyennes, nan_to_null=True),
+        })
+        if self.comptes_cid is None:
+            return df.with_columns(pl.lit(None, dtype=pl.Utf8).alias("tm_cid_dominant"))
+        dominants = self.comptes_cid.sort(
+            ["cellule", "count", "tm_cid"], descending=[False, True, False]
+        ).unique("cellule", keep="first").select(["cellule", pl.col("tm_cid").alias("tm_cid_dominant")])
+        return df.join(dominants, on="cellule", how="left", maintain_order="left")
+
+
+# === CARTE ===
+def carte_voronoi(reference, mesures, chemin_png, chemin_table, taille_chunk=TAILLE_CHUNK,
+                  largeur=LARGEUR_PX, hauteur=HAUTEUR_PX):
+    # mesures : LazyFrame de ingestion.scanner_mesures, relu par chunks
+    cvs = ds.Canvas(plot_width=largeur, plot_height=hauteur, x_range=(LON_MIN, LON_MAX), y_range=(LAT_MIN, LAT_MAX))
+    agregats = AgregatsCellules(len(reference.support_coords))
+    densite = None
+    for chunk in iterer_chunks(mesures, taille_chunk):
+        _, cellules = reference.support_index.plus_proches(chunk["latitude"].to_numpy(), chunk["longitude"].to_numpy())
+        agregats.ajouter(cellules, chunk)
+        agg = cvs.points(chunk.select(["longitude", "latitude"]).to_pandas(), "longitude", "latitude", ds.count())
+        densite = agg if densite is None else densite + agg
+    if densite is None:
+        raise ValueError("Aucune mesure dans l'emprise France.")
+
+    agregats.table(reference.support_sta, reference.support_coords).write_csv(chemin_table)
+
+    # Frontières calculées sur les centres de pixels de l'agrégat datashader
+    etiquettes = etiquettes_pixels(
+        reference.support_index, densite.coords["longitude"].values, densite.coords["latitude"].values
+    )
+    bords = xr.DataArray(
+        np.where(frontieres(etiquettes), 1.0, np.nan), coords=densite.coords, dims=densite.dims
+    )
+    supports = cvs.points(
+        pd.DataFrame({"longitude": reference.support_coords[:, 1], "latitude": reference.support_coords[:, 0]}),
+        "longitude", "latitude", ds.count()
+    )
+
+    img = tf.stack(
+        tf.shade(densite.where(densite > 0), cmap=colorcet.fire, how="eq_hist"),
+        tf.shade(bords, cmap="black", how="linear", span=[0, 1]),
+        tf.spread(tf.shade(supports.where(supports > 0), cmap="red", how="linear"), px=1),
+    )
+    tf.set_background(img, "white").to_pil().save(chemin_png)
@@ -21,29 +21,148 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+# Type de milieu (TYPE) de chaque support par jointure spatiale avec les
+# communes. La couche communes reprojetée est mise en cache en GeoParquet et
+# ne sera relue depuis le shapefile que si celui-ci change ; les points sont
+# créés en bloc et classés par chunks en parallèle (STRtree + polygones
+# préparés, shapely libère le GIL).
+
+import csv
+import glob
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
+import polars as pl
 import geopandas as gpd
-from shapely.geometry import Point
+import shapely
+
+from cache_tables import DOSSIER_CACHE, empreinte_fichier, source_a_jour
+
+# === PARAMÈTRES ===
+CHEMIN_SUPPORTS = "ressources\\SUP_SUPPORT.csv"
+CHEMIN_COMMUNES = "ressources\\corr_cont_communes_types.shp"
+CHEMIN_SORTIE = "resultats\\type_de_milieu_par_point.csv"
+CACHE_COMMUNES = os.path.join(DOSSIER_CACHE, "communes_types.parquet")
+TAILLE_CHUNK_POINTS = 100_000
+N_THREADS = os.cpu_count()
+
+
+class Chrono:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+
+    def etape(self, nom):
+        t = time.perf_counter()
+        print(f"  {nom:<28s} {t - self.t0:6.2f} s")
+        self.t0 = t
+
+
+# === COUCHE COMMUNES (cache GeoParquet) ===
+def _fichiers_shapefile(chemin):
+    # .shp, .dbf, .shx, .prj... : toute modification invalide le cache
+    return sorted(glob.glob(os.path.splitext(chemin)[0] + ".*"))
+
+
+def charger_communes(chemin=CHEMIN_COMMUNES, cache=CACHE_COMMUNES):
+    chemin_meta = cache + ".json"
+    if os.path.exists(cache) and os.path.exists(chemin_meta):
+        with open(chemin_meta, encoding="utf-8") as f:
+            meta = json.load(f)
+        mtimes = {fichier: e["mtime_ns"] for fichier, e in meta["sources"].items()}
+        if set(meta["sources"]) == set(_fichiers_shapefile(chemin)) and all(
+            source_a_jour(fichier, e) for fichier, e in meta["sources"].items()
+        ):
+            if any(e["mtime_ns"] != mtimes[fichier] for fichier, e in meta["sources"].items()):
+                with open(chemin_meta, "w", encoding="utf-8") as f:
+                    json.dump(meta, f, indent=2)
+            return gpd.read_parquet(cache)
+
+    sources = {fichier: empreinte_fichier(fichier) for fichier in _fichiers_shapefile(chemin)}
+    communes = gpd.read_file(chemin, columns=["TYPE"])
+    # S’assurer que les deux couches sont dans le même CRS
+    if communes.crs != "EPSG:4326":
+        communes = communes.to_crs("EPSG:4326")
+    communes = communes[["TYPE", "geometry"]].reset_index(drop=True)
+
+    os.makedirs(os.path.dirname(cache), exist_ok=True)
+    communes.to_parquet(cache + ".tmp")
+    os.replace(cache + ".tmp", cache)
+    with open(chemin_meta, "w", encoding="utf-8") as f:
+        json.dump({"sources": sources}, f, indent=2)
+    return communes
+
+
+# === JOINTURE SPATIALE ===
+def _classer_chunk(arbre, polygones, points):
+    # Candidats par boîte englobante, puis test exact sur les polygones
+    # préparés. Un point sur deux communes garde la première (ordre du shapefile).
+    idx_points, idx_communes = arbre.query(points)
+    dedans = shapely.contains(polygones[idx_communes], points[idx_points])
+    idx_points, idx_communes = idx_points[dedans], idx_communes[dedans]
+    ordre = np.lexsort((idx_communes, idx_points))
+    idx_points, premiers = np.unique(idx_points[ordre], return_index=True)
+    commune = np.full(len(points), -1, dtype=np.int64)
+    commune[idx_points] = idx_communes[ordre][premiers]
+    return commune
+
+
+def classer_points(communes, points, taille_chunk=TAILLE_CHUNK_POINTS, n_threads=N_THREADS):
+    # points : géométries Point (gpd.points_from_xy) ; renvoie l'indice de la
+    # commune contenant chaque point, -1 hors communes
+    polygones = np.asarray(communes.geometry.values)
+    shapely.prepare(polygones)
+    # STRtree reconstruit à chaque exécution : quelques ms pour ~35 000
+    # communes, alors qu'un STRtree picklé est resérialisé en WKB et reconstruit
+    # au chargement (x20 plus lent). Le cache GeoParquet suffit.
+    arbre = communes.sindex
+    points = np.asarray(points)
+    with ThreadPoolExecutor(n_threads) as pool:
+        morceaux = list(pool.map(
+            lambda debut: _classer_chunk(arbre, polygones, points[debut:debut + taille_chunk]),
+            range(0, len(points), taille_chunk)
+        ))
+    return np.concatenate(morceaux) if morceaux else np.empty(0, dtype=np.int64)
+
+
+def types_milieu(communes, points, **kwargs):
+    commune = classer_points(communes, points, **kwargs)
+    types = communes["TYPE"].to_numpy()[np.maximum(commune, 0)]
+    return np.where(commune >= 0, types, None)
 
-# 1. Charger le fichier CSV avec les coordonnées en DMS
-df = pd.read_csv("ressources\\SUP_SUPPORT.csv",sep=None, engine="python")  # ← Ton fichier source
 
-df = df.rename(columns={"LAT_DECIMAL": "LAT", "LONG_DECIMAL": "LON"})
+if __name__ == "__main__":
+    chrono = Chrono()
+    print("Détection du type de milieu :")
 
-# 3. Créer des objets géographiques
-geometry = [Point(xy) for xy in zip(df["LON"], df["LAT"])]
-gdf_points = gpd.GeoDataFrame(df, geometry=geometry, crs="EPSG:4326")
+    # 1. Charger le fichier CSV avec les coordonnées en DMS (séparateur détecté sur l'en-tête)
+    with open(CHEMIN_SUPPORTS, encoding="utf-8", errors="replace") as f:
+        separateur = csv.Sniffer().sniff(f.readline()).delimiter
+    # STA_NM_ANFR en texte : zéros de tête conservés, comme dans le fichier
+    # d'association auquel la table des TYPE est jointe (features.py)
+    df = pd.read_csv(CHEMIN_SUPPORTS, sep=separateur, dtype={"STA_NM_ANFR": str})
+    df = df.rename(columns={"LAT_DECIMAL": "LAT", "LONG_DECIMAL": "LON"})
+    chrono.etape("lecture supports")
 
-# 4. Charger le shapefile complet (avec géométrie)
-communes = gpd.read_file("ressources\\corr_cont_communes_types.shp")
+    # 2. Charger la couche communes (GeoParquet en cache)
+    communes = charger_communes()
+    chrono.etape("couche communes")
 
-# S’assurer que les deux couches sont dans le même CRS
-if communes.crs != "EPSG:4326":
-    communes = communes.to_crs("EPSG:4326")
+    # 3. Créer les points en bloc
+    gdf_points = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df["LON"], df["LAT"]), crs="EPSG:4326")
+    chrono.etape("points")
 
-# 5. Jointure spatiale pour récupérer uniquement le type de milieu
-result = gpd.sjoin(gdf_points, communes[["TYPE", "geometry"]], how="left", predicate="within")
+    # 4. Jointure spatiale pour récupérer uniquement le type de milieu
+    communes.sindex
+    chrono.etape("index STRtree")
+    gdf_points["TYPE"] = types_milieu(communes, gdf_points.geometry.values)
+    chrono.etape(f"jointure ({len(df)} supports)")
 
-# 6. Exporter uniquement les résultats utiles
-final = result[["STA_NM_ANFR", "LAT", "LON", "TYPE"]]
-final.to_csv("resultats\\type_de_milieu_par_point.csv", sep=";", index=False)
+    # 5. Exporter uniquement les résultats utiles
+    final = pl.from_pandas(pd.DataFrame(gdf_points[["STA_NM_ANFR", "LAT", "LON", "TYPE"]]))
+    final.write_csv(CHEMIN_SORTIE, separator=";")
+    chrono.etape("export")
+    print("✅ Export terminé : type_de_milieu_par_point.csv")
@@ -0,0 +1,209 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Jeu de données synthétique au format des extraits ANFR : SUPPORT, ANTENNE,
+# EMETTEUR et Mesures (point-virgule, décimales à virgule), Gain.csv,
+# SUP_SUPPORT.csv et la couche communes pour detect_type.py. Les supports
+# sont regroupés autour de villes, les mesures suivent des trajets autour des
+# supports, servies par l'antenne orientée vers elles, et tm_dbm suit un affaiblissement en log(distance) : le pipeline
+# complet tourne et le modèle a quelque chose à apprendre. Les fichiers sont
+# écrits sous les mêmes chemins que ceux lus par les scripts.
+# Usage : python donnees_synthetiques.py --mesures 1000000 [--dossier bench_donnees]
+
+import argparse
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import polars as pl
+
+from features import CHEMIN_GAIN
+from tables_reference import CHEMIN_ANTENNES, CHEMIN_EMETTEURS, CHEMIN_SUPPORTS
+
+# === PARAMÈTRES ===
+CHEMIN_MESURES = "ressources\\Mesures_clean.csv"
+LAT_MIN, LAT_MAX = 43.0, 50.5  # intérieur de l'emprise France de ingestion.py
+LON_MIN, LON_MAX = -1.5, 7.5
+PART_HORS_EMPRISE = 0.01       # mesures hors France, filtrées à l'ingestion
+TAILLE_CHUNK = 1_000_000       # mesures écrites par chunk
+PAS_COMMUNES_DEG = 0.1
+BANDES = {"LTE 700": 700, "LTE 800": 800, "GSM 900": 900, "LTE 1800": 1800,
+          "LTE 2100": 2100, "LTE 2600": 2600, "NR 3500": 3500}
+GAINS = {700: 12.5, 800: 13.0, 900: 13.5, 1800: 16.0, 2100: 16.5, 2600: 17.0, 3500: 18.0}
+TYPES = {"Urbain": 0.05, "Periurbain": 0.2}  # distance max (deg) à un centre-ville, Rural au-delà
+PERTE_TYPE = {"Urbain": 12.0, "Periurbain": 6.0, "Rural": 0.0}
+
+
+def _chemin(dossier, chemin):
+    chemin = os.path.join(dossier, chemin)
+    os.makedirs(os.path.dirname(chemin) or ".", exist_ok=True)
+    return chemin
+
+
+def _type_milieu(lat, lon, villes):
+    # Distance (deg) au centre-ville le plus proche -> TYPE
+    from scipy.spatial import cKDTree
+    distance, _ = cKDTree(villes).query(np.column_stack([lat, lon]))
+    return np.select([distance <= TYPES["Urbain"], distance <= TYPES["Periurbain"]],
+                     ["Urbain", "Periurbain"], "Rural")
+
+
+# === RÉFÉRENCE ANFR ===
+def generer_reference(rng, n_supports, dossier):
+    n_villes = max(5, n_supports // 500)
+    villes = np.column_stack([rng.uniform(LAT_MIN + 0.5, LAT_MAX - 0.5, n_villes),
+                              rng.uniform(LON_MIN + 0.5, LON_MAX - 0.5, n_villes)])
+    # 70 % des supports en ville (densité décroissante avec la distance au centre), le reste dispersé
+    en_ville = rng.random(n_supports) < 0.7
+    centres = villes[rng.integers(0, n_villes, n_supports)]
+    lat = np.where(en_ville, centres[:, 0] + rng.normal(0, 0.06, n_supports), rng.uniform(LAT_MIN, LAT_MAX, n_supports))
+    lon = np.where(en_ville, centres[:, 1] + rng.normal(0, 0.08, n_supports), rng.uniform(LON_MIN, LON_MAX, n_supports))
+    lat, lon = np.clip(lat, LAT_MIN, LAT_MAX), np.clip(lon, LON_MIN, LON_MAX)
+    # Identifiants à 10 chiffres comme ceux de l'ANFR ("0802290015") : environ
+    # la moitié avec un zéro de tête, qui doit survivre à toutes les lectures
+    sta = np.char.zfill(rng.choice(2_000_000_000, n_supports, replace=False).astype(str), 10)
+
+    pl.DataFrame({"STA_NM_ANFR": sta, "LAT_DECIMAL": lat, "LON_DECIMAL": lon}).write_csv(
+        _chemin(dossier, CHEMIN_SUPPORTS), separator=";", decimal_comma=True
+    )
+
+    # 1 à 6 antennes par support, secteurs régulièrement espacés ; quelques azimuts manquants
+    n_antennes = rng.integers(1, 7, n_supports)
+    idx_support = np.repeat(np.arange(n_supports), n_antennes)
+    rang = np.arange(len(idx_support)) - np.repeat(np.cumsum(n_antennes) - n_antennes, n_antennes)
+    azimut = (rng.uniform(0, 360, n_supports)[idx_support] + rang * 360 / n_antennes[idx_support]) % 360
+    azimut = np.where(rng.random(len(azimut)) < 0.02, np.nan, np.round(azimut, 1))
+    aer_id = np.arange(len(idx_support)) + 100_000
+    antennes = pl.DataFrame({"STA_NM_ANFR": sta[idx_support], "AER_ID": aer_id.astype(str), "AER_NB_AZIMUT": azimut})
+    antennes.write_csv(_chemin(dossier, CHEMIN_ANTENNES), separator=";", decimal_comma=True, null_value="")
+
+    # Un émetteur par antenne, un second pour 10 % d'entre elles (doublons réels)
+    doublons = np.flatnonzero(rng.random(len(aer_id)) < 0.1)
+    idx_emetteur = np.concatenate([np.arange(len(aer_id)), doublons])
+    puissance = np.round(rng.uniform(15, 45, len(idx_emetteur)), 2)
+    pl.DataFrame({
+        "STA_NM_ANFR": sta[idx_support][idx_emetteur], "AER_ID": aer_id[idx_emetteur].astype(str),
+        "EMR_NB_PUISSANCE": puissance,
+    }).write_csv(_chemin(dossier, CHEMIN_EMETTEURS), separator=";", decimal_comma=True)
+
+    pl.DataFrame({"Frequence": list(GAINS), "Gain": list(GAINS.values())}).write_csv(
+        _chemin(dossier, CHEMIN_GAIN), separator=";"
+    )
+    puissance_antenne = puissance[:len(aer_id)]
+    return villes, lat, lon, sta, idx_support, azimut, puissance_antenne
+
+
+def generer_communes(villes, lat_s, lon_s, sta, dossier):
+    # Entrées de detect_type.py : supports (décimales à point) et grille de
+    # communes carrées, TYPE selon la distance à la ville la plus proche
+    import geopandas as gpd
+    import shapely
+    from detect_type import CHEMIN_COMMUNES, CHEMIN_SUPPORTS as CHEMIN_SUP_SUPPORT
+
+    pl.DataFrame({"STA_NM_ANFR": sta, "LAT_DECIMAL": lat_s, "LONG_DECIMAL": lon_s}).write_csv(
+        _chemin(dossier, CHEMIN_SUP_SUPPORT), separator=";"
+    )
+
+    lats = np.arange(LAT_MIN - 1, LAT_MAX + 1, PAS_COMMUNES_DEG)
+    lons = np.arange(LON_MIN - 1, LON_MAX + 1, PAS_COMMUNES_DEG)
+    lat, lon = [g.ravel() for g in np.meshgrid(lats, lons, indexing="ij")]
+    carres = shapely.box(lon, lat, lon + PAS_COMMUNES_DEG, lat + PAS_COMMUNES_DEG)
+    types = _type_milieu(lat + PAS_COMMUNES_DEG / 2, lon + PAS_COMMUNES_DEG / 2, villes)
+    # GDAL interprète les "\\" du chemin : écriture à part, puis chaque
+    # fichier du shapefile est déplacé sous le nom lu par detect_type.py
+    cible = os.path.splitext(_chemin(dossier, CHEMIN_COMMUNES))[0]
+    with tempfile.TemporaryDirectory() as tmp:
+        gpd.GeoDataFrame({"TYPE": types}, geometry=carres, crs="EPSG:4326").to_file(os.path.join(tmp, "communes.shp"))
+        for nom in os.listdir(tmp):
+            shutil.move(os.path.join(tmp, nom), cible + os.path.splitext(nom)[1])
+
+
+# === MESURES ===
+def generer_mesures(rng, n_mesures, reference, dossier, taille_chunk=TAILLE_CHUNK):
+    villes, lat_s, lon_s, sta, idx_support, azimut, puissance = reference
+    n_supports = len(sta)
+    n_antennes = np.bincount(idx_support, minlength=n_supports)
+    premiere_antenne = np.cumsum(n_antennes) - n_antennes
+    bandes = np.array(list(BANDES))
+    gains = np.array([GAINS[BANDES[b]] for b in bandes])
+    perte_type = np.vectorize(PERTE_TYPE.get)(_type_milieu(lat_s, lon_s, villes))
+
+    with open(_chemin(dossier, CHEMIN_MESURES), "wb") as f:
+        for debut in range(0, n_mesures, taille_chunk):
+            n = min(taille_chunk, n_mesures - debut)
+            # Trajets : chaque mesure est tirée autour d'un support, à une
+            # distance log-normale (quelques centaines de mètres à quelques km)
+            s = rng.integers(0, n_supports, n)
+            distance_km = np.clip(rng.lognormal(np.log(0.8), 0.8, n), 0.02, 15)
+            cap = rng.uniform(0, 360, n)
+            lat = lat_s[s] + distance_km / 111.2 * np.cos(np.radians(cap))
+            lon = lon_s[s] + distance_km / (111.2 * np.cos(np.radians(lat_s[s]))) * np.sin(np.radians(cap))
+            hors = rng.random(n) < PART_HORS_EMPRISE
+            lat[hors] += rng.choice([-15, 15], hors.sum())
+
+            # Secteur = antenne d'azimut le plus proche du cap support -> mesure
+            ecarts = np.full((n, n_antennes.max()), np.inf)
+            for k in range(n_antennes.max()):
+                valide = k < n_antennes[s]
+                ecart = np.abs((azimut[premiere_antenne[s] + np.where(valide, k, 0)] - cap + 180) % 360 - 180)
+                ecarts[:, k] = np.where(valide, np.nan_to_num(ecart, nan=np.inf), np.inf)
+            secteur = premiere_antenne[s] + ecarts.argmin(axis=1)
+            bande = rng.integers(0, len(bandes), n)
+            att = 95 + 30 * np.log10(distance_km) + 20 * np.log10(np.array([BANDES[b] for b in bandes])[bande] / 900) \
+                + perte_type[s] + rng.normal(0, 6, n)
+            tm_dbm = np.clip(puissance[secteur] + gains[bande] - att, -140, -40)
+
+            pl.DataFrame({
+                "latitude": lat, "longitude": lon,
+                "tm_cid": np.char.add(sta[s], (secteur - premiere_antenne[s]).astype(str)),
+                "tm_dbm": np.round(tm_dbm, 1),
+                "pci": (secteur % 504).astype(str),
+                "band_table": bandes[bande],
+            }).write_csv(f, separator=";", decimal_comma=True, include_header=debut == 0)
+
+
+def generer(n_mesures, dossier=".", n_supports=None, graine=42, communes=True):
+    # Nombre de supports proportionnel aux mesures, borné par l'ordre de grandeur français
+    if n_supports is None:
+        n_supports = int(np.clip(n_mesures // 50, 200, 100_000))
+    rng = np.random.default_rng(graine)
+    reference = generer_reference(rng, n_supports, dossier)
+    if communes:
+        villes, lat_s, lon_s, sta = reference[:4]
+        generer_communes(villes, lat_s, lon_s, sta, dossier)
+    generer_mesures(rng, n_mesures, reference, dossier)
+    return n_supports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère un jeu de données synthétique au format ANFR.")
+    parser.add_argument("--mesures", type=int, default=100_000, help="nombre de mesures (1e4 à 1e7)")
+    parser.add_argument("--supports", type=int, default=None)
+    parser.add_argument("--dossier", default=".")
+    parser.add_argument("--graine", type=int, default=42)
+    parser.add_argument("--sans-communes", action="store_true", help="pas de shapefile (sans geopandas)")
+    args = parser.parse_args()
+
+    n_supports = generer(args.mesures, args.dossier, args.supports, args.graine, not args.sans_communes)
+    print(f"✅ Données synthétiques écrites dans {args.dossier} : {n_supports} supports, {args.mesures} mesures")
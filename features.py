@@ -0,0 +1,242 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Table de features partagée : fréquence, gain Gr, TYPE de milieu,
+# ATT_estimee, indicatrices TYPE_* et découpage entraînement/test sont
+# calculés une seule fois à partir de l'association et écrits en Parquet
+# typé. L'entraînement, la prédiction, les graphes et le calcul de PL lisent
+# cette table au lieu de refaire chacun la préparation. Le manifeste JSON
+# garde la version, le hash du schéma et l'empreinte des sources ; une table
+# périmée est reconstruite. pci, band_table et TYPE restent en Categorical,
+# stockés en dictionnaire dans le Parquet.
+# Usage : python features.py  (reconstruit la table)
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import polars as pl
+
+from cache_tables import empreinte_fichier, source_a_jour
+from ingestion import COLONNES_CATEGORIELLES
+
+# === PARAMÈTRES ===
+VERSION_FEATURES = 3  # à incrémenter si le calcul d'une colonne change
+CHEMIN_FEATURES = "resultats\\features.parquet"
+CHEMIN_ASSOCIATION = "resultats\\pci_associes_infos_corriges.csv"
+CHEMIN_GAIN = "ressources\\Gain.csv"
+CHEMIN_TYPES = "resultats\\type_de_milieu_par_point.csv"
+SOURCE_TYPE = "support"  # "support" : TYPE du support (detect_type.py), "raster" : TYPE au point de mesure (raster_type.py)
+PART_TEST = 0.2
+GRAINE_SPLIT = 42
+
+BASE_FEATURES = [
+    "distance_to_support_km",
+    "frequence",
+    "EMR_NB_PUISSANCE",
+    "Gr",
+    "angle_vers_antenne",
+]
+SCHEMA_ASSOCIATION = {
+    "measurement_id": pl.Int64, "tm_cid": pl.Utf8, "pci": pl.Utf8, "band_table": pl.Utf8, "STA_NM_ANFR": pl.Utf8, "AER_ID": pl.Utf8
+}
+COLONNES_REQUISES = [
+    "tm_dbm", "EMR_NB_PUISSANCE", "Gr", "TYPE",
+    "distance_to_support_km", "angle_vers_antenne", "latitude", "longitude"
+]
+
+
+def features_modele(colonnes):
+    # Colonnes d'entrée du modèle, dans l'ordre de l'entraînement
+    return BASE_FEATURES + [c for c in colonnes if c.startswith("TYPE_")]
+
+
+def modalites_type(df):
+    # Modalités de TYPE des lignes exploitables, triées (DataFrame ou LazyFrame)
+    types = df.lazy().filter("exploitable").select(pl.col("TYPE").cast(pl.Utf8).unique()).collect()
+    return sorted(types["TYPE"].drop_nulls().to_list())
+
+
+# === SOURCES ===
+def _sources(source_type):
+    sources = [CHEMIN_ASSOCIATION, CHEMIN_GAIN]
+    if source_type == "raster":
+        from raster_type import DOSSIER_RASTER
+        sources.append(os.path.join(DOSSIER_RASTER, "manifeste.json"))
+    else:
+        sources.append(CHEMIN_TYPES)
+    return sources
+
+
+def hash_schema(schema):
+    description = json.dumps([[nom, str(dtype)] for nom, dtype in schema.items()])
+    return hashlib.blake2b(description.encode(), digest_size=16).hexdigest()
+
+
+# === CONSTRUCTION ===
+def scanner_association(chemin=CHEMIN_ASSOCIATION):
+    # Fichier d'association (CSV de testPolars.py ou Parquet), en LazyFrame ;
+    # les colonnes catégorielles sont converties après lecture, plus vite
+    # qu'un parsing CSV directement en Categorical
+    if chemin.endswith(".parquet"):
+        lf = pl.scan_parquet(chemin)
+    else:
+        lf = pl.scan_csv(chemin, schema_overrides=SCHEMA_ASSOCIATION)
+    return lf.with_columns(pl.col(COLONNES_CATEGORIELLES).cast(pl.Categorical))
+
+
+def charger_gain():
+    return pl.read_csv(CHEMIN_GAIN, separator=";").rename(lambda c: c.strip())
+
+
+def charger_types():
+    return pl.read_csv(CHEMIN_TYPES, separator=";", schema_overrides={"STA_NM_ANFR": pl.Utf8, "TYPE": pl.Categorical})
+
+
+def enrichir_mesures(df, df_gain, source_type=SOURCE_TYPE, df_types=None):
+    # Colonnes calculées ligne à ligne (fréquence, Gr, TYPE, ATT_estimee,
+    # exploitable) : applicable chunk par chunk. df_types évite de relire la
+    # table des TYPE à chaque appel. Fréquence et Gr ne dépendent que de
+    # band_table : calculés une fois par bande distincte, puis rattachés aux
+    # lignes par jointure sur le code
+    bandes = df.select(pl.col("band_table").unique().drop_nulls()).with_columns(
+        pl.col("band_table").cast(pl.Utf8).str.extract(r"(\d+)").cast(pl.Int64).alias("frequence")
+    ).join(
+        df_gain.select(pl.col("Frequence").cast(pl.Int64).alias("frequence"), pl.col("Gain").cast(pl.Float64).alias("Gr")),
+        on="frequence", how="left"
+    )
+    df = df.join(bandes, on="band_table", how="left", maintain_order="left")
+
+    if source_type == "raster":
+        from raster_type import obtenir_raster
+        # Une chaîne par catégorie du raster, chaque ligne ne porte que son code
+        raster = obtenir_raster()
+        codes = raster.codes(df["latitude"].to_numpy(), df["longitude"].to_numpy())
+        df = df.with_columns(pl.Series("TYPE", [None] + list(raster.categories), dtype=pl.Categorical).gather(codes))
+    else:
+        if df_types is None:
+            df_types = charger_types()
+        df = df.join(df_types.select(["STA_NM_ANFR", "TYPE"]), on="STA_NM_ANFR", how="left", maintain_order="left")
+
+    return df.with_columns(
+        (pl.col("EMR_NB_PUISSANCE") + pl.col("Gr") - pl.col("tm_dbm")).alias("ATT_estimee"),
+        pl.all_horizontal([pl.col(c).is_not_null() & ~pl.col(c).is_nan() if df.schema[c].is_float()
+                           else pl.col(c).is_not_null() for c in COLONNES_REQUISES]).alias("exploitable"),
+    )
+
+
+def calculer_features(df, df_gain, source_type=SOURCE_TYPE):
+    # df : association (une ligne par mesure) ; toutes les lignes sont gardées,
+    # "exploitable" marque celles utilisables par le modèle
+    df = enrichir_mesures(df, df_gain, source_type)
+
+    # Indicatrices TYPE_* (première modalité retirée, comme get_dummies(drop_first=True))
+    modalites = modalites_type(df)
+    df = df.with_columns([(pl.col("TYPE") == m).fill_null(False).alias(f"TYPE_{m}") for m in modalites[1:]])
+
+    # Split 80/20 : même tirage que df.sample(frac=1, random_state=42) sur les
+    # lignes exploitables ; rang_melange garde l'ordre du mélange
+    exploitables = np.flatnonzero(df["exploitable"].to_numpy())
+    melange = np.random.RandomState(GRAINE_SPLIT).permutation(len(exploitables))
+    rang = np.full(df.height, -1, dtype=np.int64)
+    rang[exploitables[melange]] = np.arange(len(exploitables))
+    n_train = int((1 - PART_TEST) * len(exploitables))
+    return df.with_columns(
+        pl.Series("rang_melange", rang),
+        pl.Series("test", rang >= n_train),
+    )
+
+
+def construire_features(source_type=SOURCE_TYPE, chemin=CHEMIN_FEATURES):
+    sources = {s: empreinte_fichier(s) for s in _sources(source_type)}
+    df = scanner_association().collect()
+    if "measurement_id" not in df.columns:
+        raise ValueError(f"{CHEMIN_ASSOCIATION} sans measurement_id : relancer testPolars.py.")
+    df = calculer_features(df, charger_gain(), source_type)
+
+    df.write_parquet(chemin + ".tmp")
+    os.replace(chemin + ".tmp", chemin)
+    with open(chemin + ".json", "w", encoding="utf-8") as f:
+        json.dump({
+            "version": VERSION_FEATURES, "source_type": source_type,
+            "schema": hash_schema(df.schema), "sources": sources,
+        }, f, indent=2)
+    return df
+
+
+# === LECTURE ===
+def verifier_features(source_type=SOURCE_TYPE, chemin=CHEMIN_FEATURES):
+    # Contrôle du manifeste et du schéma sans lire les données
+    chemin_manifeste = chemin + ".json"
+    if not os.path.exists(chemin) or not os.path.exists(chemin_manifeste):
+        raise ValueError(f"Table de features absente : {chemin}")
+    with open(chemin_manifeste, encoding="utf-8") as f:
+        manifeste = json.load(f)
+    if manifeste["version"] != VERSION_FEATURES or manifeste["source_type"] != source_type:
+        raise ValueError("Table de features construite avec une autre version ou une autre source de TYPE.")
+    if set(manifeste["sources"]) != set(_sources(source_type)):
+        raise ValueError("Table de features construite à partir d'autres fichiers.")
+    mtimes = {s: empreinte["mtime_ns"] for s, empreinte in manifeste["sources"].items()}
+    for s, empreinte in manifeste["sources"].items():
+        if not os.path.exists(s) or not source_a_jour(s, empreinte):
+            raise ValueError(f"Table de features périmée : {s} a changé depuis sa construction.")
+    if any(empreinte["mtime_ns"] != mtimes[s] for s, empreinte in manifeste["sources"].items()):
+        with open(chemin_manifeste, "w", encoding="utf-8") as f:
+            json.dump(manifeste, f, indent=2)
+    if hash_schema(pl.read_parquet_schema(chemin)) != manifeste["schema"]:
+        raise ValueError("Schéma de la table de features différent de celui du manifeste.")
+
+
+def charger_features(source_type=SOURCE_TYPE, chemin=CHEMIN_FEATURES):
+    verifier_features(source_type, chemin)
+    return pl.read_parquet(chemin)
+
+
+def obtenir_features(source_type=SOURCE_TYPE, chemin=CHEMIN_FEATURES):
+    # Table sur disque si elle est à jour, sinon reconstruction
+    try:
+        return charger_features(source_type, chemin)
+    except ValueError as e:
+        print(f"{e} Reconstruction de la table de features...")
+        return construire_features(source_type, chemin)
+
+
+def scanner_features(source_type=SOURCE_TYPE, chemin=CHEMIN_FEATURES):
+    # LazyFrame sur la table à jour, pour la lire par chunks
+    try:
+        verifier_features(source_type, chemin)
+    except ValueError as e:
+        print(f"{e} Reconstruction de la table de features...")
+        construire_features(source_type, chemin)
+    return pl.scan_parquet(chemin)
+
+
+def jeu_modele(df, test):
+    # Lignes exploitables d'un côté du split, dans l'ordre du mélange, en pandas
+    return df.filter(pl.col("exploitable") & (pl.col("test") == test)).sort("rang_melange").to_pandas()
+
+
+if __name__ == "__main__":
+    df = construire_features()
+    print(f"✅ Table de features écrite : {CHEMIN_FEATURES} ({df.height} lignes, {df.filter('exploitable').height} exploitables)")
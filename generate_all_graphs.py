@@ -1,5 +1,4 @@
 
-
 # MIT License
 #
 # Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
@@ -22,23 +21,27 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import subprocess
-import sys
-from concurrent.futures import ProcessPoolExecutor
-from tqdm import tqdm
+# Génération de tous les graphes : une seule lecture de la table de test,
+# rendu parallèle par le moteur (moteur_graphes.py).
+# Usage : python generate_all_graphs.py [--mode spawn|thread] [--workers 5]
 
-scripts = [
-    "graph1_pmes_vs_distance.py",
-    "graph2_lowess.py",
-    "graph3_geoplot.py",
-    "graph4_freq_vs_distance.py",
-    "graph5_heatmap.py"
-]
+import argparse
+import sys
+import time
 
-def run_script(script):
-    subprocess.run([sys.executable, f"{script}"], check=True)
+from moteur_graphes import generer
 
 if __name__ == "__main__":
-    with ProcessPoolExecutor(max_workers=5) as executor:
-        list(tqdm(executor.map(run_script, scripts), total=len(scripts), desc="Génération des graphes"))
-    print("Tous les graphes ont été générés.")
+    parser = argparse.ArgumentParser(description="Génère tous les graphes enregistrés.")
+    parser.add_argument("--mode", choices=["spawn", "thread"], default="spawn")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    images, erreurs = generer(n_workers=args.workers, mode=args.mode)
+    for image in images:
+        print(f"  {image}")
+    if erreurs:
+        print(f"{len(erreurs)} graphe(s) en échec : {', '.join(erreurs)}")
+        sys.exit(1)
+    print(f"Tous les graphes ont été générés ({time.perf_counter() - t0:.1f} s).")
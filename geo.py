@@ -0,0 +1,145 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Noyaux géographiques vectorisés partagés par les scripts : distance
+# orthodromique, cap initial, écart angulaire et point de destination, sur la
+# sphère de rayon R_TERRE_KM. Les tableaux sont traités par blocs pour que les
+# temporaires restent en cache ; dtype=np.float32 divise la mémoire par deux.
+# Les angles sont en degrés, les caps comptés depuis le nord dans le sens
+# horaire (comme AER_NB_AZIMUT).
+
+from math import asin, atan2, cos, degrees, radians, sin, sqrt
+
+import numpy as np
+import polars as pl
+
+# === PARAMÈTRES ===
+R_TERRE_KM = 6371.0
+TAILLE_BLOC = 1 << 16  # éléments par bloc
+
+
+# === PARCOURS PAR BLOCS ===
+def _par_blocs(noyau, entrees, dtype, taille_bloc):
+    entrees = np.broadcast_arrays(*[np.atleast_1d(np.asarray(e, dtype=dtype)) for e in entrees])
+    if entrees[0].ndim != 1:
+        raise ValueError("Les noyaux géographiques attendent des tableaux 1D (ou des scalaires).")
+    n = len(entrees[0])
+    sorties = None
+    # Au moins un bloc : une entrée vide donne autant de sorties vides que le noyau
+    for debut in range(0, max(n, 1), taille_bloc):
+        bloc = slice(debut, debut + taille_bloc)
+        resultat = noyau(*[e[bloc] for e in entrees])
+        if not isinstance(resultat, tuple):
+            resultat = (resultat,)
+        if sorties is None:
+            sorties = tuple(np.empty(n, dtype=dtype) for _ in resultat)
+        for sortie, valeurs in zip(sorties, resultat):
+            sortie[bloc] = valeurs
+    return sorties if len(sorties) > 1 else sorties[0]
+
+
+# === NOYAUX ===
+def _haversine(lat1, lon1, lat2, lon2):
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lon2 - lon1) / 2) ** 2
+    return 2 * R_TERRE_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def _cap_initial(lat1, lon1, lat2, lon2):
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dlon = np.radians(lon2 - lon1)
+    y = np.sin(dlon) * np.cos(phi2)
+    x = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(dlon)
+    return (np.degrees(np.arctan2(y, x)) + 360) % 360
+
+
+def _ecart_angulaire(angle1, angle2):
+    return np.abs((angle1 - angle2 + 180) % 360 - 180)
+
+
+def _point_destination(lat, lon, cap, distance_km):
+    phi1, theta = np.radians(lat), np.radians(cap)
+    delta = distance_km / R_TERRE_KM
+    sin_phi2 = np.sin(phi1) * np.cos(delta) + np.cos(phi1) * np.sin(delta) * np.cos(theta)
+    phi2 = np.arcsin(np.clip(sin_phi2, -1, 1))
+    dlon = np.arctan2(np.sin(theta) * np.sin(delta) * np.cos(phi1), np.cos(delta) - np.sin(phi1) * sin_phi2)
+    return np.degrees(phi2), (np.degrees(np.radians(lon) + dlon) + 540) % 360 - 180
+
+
+def haversine(lat1, lon1, lat2, lon2, dtype=np.float64, taille_bloc=TAILLE_BLOC):
+    # Distance orthodromique en km
+    return _par_blocs(_haversine, (lat1, lon1, lat2, lon2), dtype, taille_bloc)
+
+
+def cap_initial(lat1, lon1, lat2, lon2, dtype=np.float64, taille_bloc=TAILLE_BLOC):
+    # Cap initial du point 1 vers le point 2, dans [0, 360)
+    return _par_blocs(_cap_initial, (lat1, lon1, lat2, lon2), dtype, taille_bloc)
+
+
+def ecart_angulaire(angle1, angle2, dtype=np.float64, taille_bloc=TAILLE_BLOC):
+    # Plus petit écart entre deux directions, dans [0, 180]
+    return _par_blocs(_ecart_angulaire, (angle1, angle2), dtype, taille_bloc)
+
+
+def point_destination(lat, lon, cap, distance_km, dtype=np.float64, taille_bloc=TAILLE_BLOC):
+    # Point atteint en partant de (lat, lon) au cap donné ; renvoie (lat, lon)
+    return _par_blocs(_point_destination, (lat, lon, cap, distance_km), dtype, taille_bloc)
+
+
+# === EXPRESSIONS POLARS (mêmes formules, pour les plans LazyFrame) ===
+def expr_cap_initial(lat1, lon1, lat2, lon2):
+    phi1, phi2 = pl.col(lat1).radians(), pl.col(lat2).radians()
+    dlon = (pl.col(lon2) - pl.col(lon1)).radians()
+    y = dlon.sin() * phi2.cos()
+    x = phi1.cos() * phi2.sin() - phi1.sin() * phi2.cos() * dlon.cos()
+    return (pl.arctan2(y, x).degrees() + 360) % 360
+
+
+def expr_ecart_angulaire(angle1, angle2):
+    return ((pl.col(angle1) - pl.col(angle2) + 180) % 360 - 180).abs()
+
+
+# === RÉFÉRENCES SCALAIRES (math), pour vérifier les noyaux ===
+def haversine_reference(lat1, lon1, lat2, lon2):
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    return R_TERRE_KM * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+def cap_initial_reference(lat1, lon1, lat2, lon2):
+    phi1, phi2, dlon = radians(lat1), radians(lat2), radians(lon2 - lon1)
+    y = sin(dlon) * cos(phi2)
+    x = cos(phi1) * sin(phi2) - sin(phi1) * cos(phi2) * cos(dlon)
+    return (degrees(atan2(y, x)) + 360) % 360
+
+
+def ecart_angulaire_reference(angle1, angle2):
+    return abs((angle1 - angle2 + 180) % 360 - 180)
+
+
+def point_destination_reference(lat, lon, cap, distance_km):
+    phi1, theta, delta = radians(lat), radians(cap), distance_km / R_TERRE_KM
+    phi2 = asin(sin(phi1) * cos(delta) + cos(phi1) * sin(delta) * cos(theta))
+    dlon = atan2(sin(theta) * sin(delta) * cos(phi1), cos(delta) - sin(phi1) * sin(phi2))
+    return degrees(phi2), (degrees(radians(lon) + dlon) + 540) % 360 - 180
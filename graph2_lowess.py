@@ -21,46 +21,186 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+# Tendance de la Pmes selon la distance, par TYPE, sans LOWESS point par
+# point : les mesures sont d'abord rangées dans un histogramme (TYPE, classe
+# de distance, classe de Pmes) en une seule passe np.bincount. Médiane et
+# quantiles 10/90 %, régression locale pondérée (noyau tricube, comme LOWESS)
+# et densité de fond se lisent ensuite sur l'histogramme : le coût est
+# linéaire en nombre de mesures, le reste ne dépend que du nombre de classes.
+
+from dataclasses import dataclass
+
+import numpy as np
 import pandas as pd
 import seaborn as sns
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import re
-def extract_max_freq(text):
-    if pd.isna(text):
-        return None
-    numbers = re.findall(r"\d+", str(text))
-    return max(map(int, numbers)) if numbers else None
-df_test = pd.read_csv("resultats/attenuation_estimee_testset.csv")
-df_base = pd.read_csv("resultats/pci_associes_infos_corriges.csv", low_memory=False)
-df_type = pd.read_csv("resultats/type_de_milieu_par_point.csv", sep=";")
-
-df_base = df_base.rename(columns={"latitude": "Latitude", "longitude": "Longitude"})
-df = pd.merge(df_test, df_base, on=["Latitude", "Longitude"], how="left")
-df = pd.merge(df, df_type[["STA_NM_ANFR", "TYPE"]], on="STA_NM_ANFR", how="left")
-
-df = df.dropna(subset=["Latitude", "Longitude", "tm_dbm", "distance_to_support_km"])
-
-df["frequence"] = df["band_table"].apply(extract_max_freq)
-df["frequence"] = pd.to_numeric(df["frequence"], errors="coerce")
-
-sns.set(style="whitegrid")
-g = sns.lmplot(
-    data=df,
-    x="distance_to_support_km",
-    y="tm_dbm",
-    hue="TYPE",
-    lowess=True,
-    height=6,
-    aspect=1.5,
-    scatter_kws={'alpha': 0.4, 's': 10, 'rasterized': True}
-)
-plt.ylim(-120, -30)
-plt.title("Tendance de la Pmes selon la distance")
-plt.xlabel("Distance (km)")
-plt.ylabel("Pmes (dBm)")
-plt.grid(True)
-plt.tight_layout()
-plt.savefig("visualisations/graph2_lowess_pmes_vs_distance.png")
-plt.close()
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+
+from moteur_graphes import graphe, generer
+
+# === PARAMÈTRES ===
+N_CLASSES_DISTANCE = 200  # au plus ; moins de classes si peu de mesures
+MESURES_PAR_CLASSE = 100  # effectif moyen visé par classe de distance
+N_CLASSES_PMES = 400
+REGROUPEMENT_DENSITE = 4  # classes de Pmes fusionnées pour l'image de fond
+QUANTILES = (0.1, 0.5, 0.9)
+FRACTION_LOCALE = 0.3    # part des mesures du TYPE dans chaque fenêtre (frac de LOWESS)
+MIN_MESURES_CLASSE = 20  # en dessous, pas de quantiles pour la classe
+BORNE_QUANTILE = 0.001   # mesures extrêmes rangées dans les classes de bord
+
+
+@dataclass
+class Tendance:
+    centres: np.ndarray      # (n_classes_distance,) centre des classes de distance
+    bords_x: np.ndarray      # (n_classes_distance + 1,)
+    bords_y: np.ndarray      # (n_classes_pmes + 1,)
+    histogramme: np.ndarray  # (n_types, n_classes_distance, n_classes_pmes) effectifs
+    quantiles: np.ndarray    # (len(QUANTILES), n_types, n_classes_distance), NaN si classe trop petite
+    lissee: np.ndarray       # (n_types, n_classes_distance) régression locale, NaN hors support
+
+
+# === HISTOGRAMME ===
+def _classes(valeurs, debut, fin, n_classes):
+    # Classes régulières ; les valeurs hors [debut, fin] vont dans la classe de bord
+    pas = (fin - debut) / n_classes or 1.0
+    return np.clip(np.floor((valeurs - debut) / pas), 0, n_classes - 1).astype(np.int64)
+
+
+def quantiles_histogramme(histogramme, bords_y, quantiles):
+    # Quantile par interpolation linéaire dans la classe qui le contient
+    cumul = histogramme.cumsum(axis=-1)
+    total = cumul[..., -1]
+    pas = bords_y[1] - bords_y[0]
+    resultats = []
+    for q in quantiles:
+        cible = q * total
+        k = (cumul >= cible[..., None]).argmax(axis=-1)[..., None]
+        dans = np.take_along_axis(histogramme, k, axis=-1)[..., 0]
+        avant = np.take_along_axis(cumul, k, axis=-1)[..., 0] - dans
+        with np.errstate(invalid="ignore", divide="ignore"):
+            resultats.append(bords_y[0] + pas * (k[..., 0] + (cible - avant) / dans))
+    return np.array(resultats)
+
+
+# === RÉGRESSION LOCALE SUR LES CLASSES ===
+def regression_locale(centres, comptes, moyennes, fraction=FRACTION_LOCALE):
+    # Régression linéaire locale pondérée, évaluée au centre de chaque classe :
+    # chaque classe compte pour ses effectifs, la fenêtre couvre `fraction` des
+    # mesures (plus proches classes d'abord) et le noyau est tricube.
+    # comptes, moyennes : (n_types, n_classes)
+    ecarts = centres[None, :] - centres[:, None]             # (evaluation, classe)
+    distances = np.abs(ecarts)
+    ordre = np.argsort(distances, axis=1, kind="stable")
+    distances_triees = np.take_along_axis(distances, ordre, axis=1)
+    pas = centres[1] - centres[0] if len(centres) > 1 else 1.0
+
+    lissee = np.full(comptes.shape, np.nan)
+    for t in range(comptes.shape[0]):
+        n = comptes[t]
+        if n.sum() == 0:
+            continue
+        cumul = np.cumsum(n[ordre], axis=1)
+        k = (cumul >= fraction * n.sum()).argmax(axis=1)
+        largeur = np.maximum(distances_triees[np.arange(len(centres)), k], pas) * (1 + 1e-9)
+        u = np.minimum(distances / largeur[:, None], 1.0)
+        w = n[None, :] * (1 - u ** 3) ** 3
+        y = np.where(n > 0, moyennes[t], 0.0)[None, :]
+        s0, s1, s2 = w.sum(1), (w * ecarts).sum(1), (w * ecarts ** 2).sum(1)
+        t0, t1 = (w * y).sum(1), (w * ecarts * y).sum(1)
+        det = s0 * s2 - s1 ** 2
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # Une seule classe dans la fenêtre : pas de pente, moyenne pondérée
+            locale = np.where(det > 1e-12 * s0 * s2, (s2 * t0 - s1 * t1) / det, t0 / s0)
+        # Pas d'extrapolation au-delà des classes extrêmes du TYPE
+        occupees = np.flatnonzero(n)
+        lissee[t, occupees[0]:occupees[-1] + 1] = locale[occupees[0]:occupees[-1] + 1]
+    return lissee
+
+
+def calculer_tendance(distance, pmes, groupes, n_groupes,
+                      n_classes_distance=N_CLASSES_DISTANCE, n_classes_pmes=N_CLASSES_PMES):
+    # groupes : code du TYPE de chaque mesure (0..n_groupes-1, -1 = inconnu)
+    distance = np.asarray(distance, dtype=np.float64)
+    pmes = np.asarray(pmes, dtype=np.float64)
+    groupes = np.asarray(groupes, dtype=np.int64)
+    valides = np.isfinite(distance) & np.isfinite(pmes) & (groupes >= 0)
+    distance, pmes, groupes = distance[valides], pmes[valides], groupes[valides]
+    if len(distance) == 0:
+        raise ValueError("Aucune mesure avec distance, Pmes et TYPE renseignés.")
+
+    # Distances au-delà du quantile haut écartées (elles fausseraient la
+    # dernière classe) ; les Pmes extrêmes restent, dans les classes de bord
+    x_min, x_max = distance.min(), np.quantile(distance, 1 - BORNE_QUANTILE)
+    retenues = distance <= x_max
+    distance, pmes, groupes = distance[retenues], pmes[retenues], groupes[retenues]
+    y_min, y_max = np.quantile(pmes, [BORNE_QUANTILE, 1 - BORNE_QUANTILE])
+    n_classes_distance = int(np.clip(len(distance) // MESURES_PAR_CLASSE, 10, n_classes_distance))
+    if x_max <= x_min:
+        # Distances toutes égales : une seule classe, centrée sur cette distance
+        n_classes_distance, x_min, x_max = 1, x_min - 0.5, x_max + 0.5
+    if y_max <= y_min:
+        y_min, y_max = y_min - 0.5, y_max + 0.5
+    bords_x = np.linspace(x_min, x_max, n_classes_distance + 1)
+    bords_y = np.linspace(y_min, y_max, n_classes_pmes + 1)
+
+    # Une passe sur les mesures : effectifs par (TYPE, distance, Pmes) et
+    # somme des Pmes par (TYPE, distance) pour les moyennes exactes
+    ix = _classes(distance, x_min, x_max, n_classes_distance)
+    iy = _classes(pmes, y_min, y_max, n_classes_pmes)
+    cellule = groupes * n_classes_distance + ix
+    histogramme = np.bincount(
+        cellule * n_classes_pmes + iy, minlength=n_groupes * n_classes_distance * n_classes_pmes
+    ).reshape(n_groupes, n_classes_distance, n_classes_pmes)
+    sommes = np.bincount(cellule, weights=pmes, minlength=n_groupes * n_classes_distance)
+    sommes = sommes.reshape(n_groupes, n_classes_distance)
+
+    comptes = histogramme.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        moyennes = sommes / comptes
+    quantiles = quantiles_histogramme(histogramme, bords_y, QUANTILES)
+    quantiles[:, comptes < MIN_MESURES_CLASSE] = np.nan
+
+    centres = (bords_x[:-1] + bords_x[1:]) / 2
+    return Tendance(
+        centres=centres,
+        bords_x=bords_x,
+        bords_y=bords_y,
+        histogramme=histogramme,
+        quantiles=quantiles,
+        lissee=regression_locale(centres, comptes, moyennes),
+    )
+
+
+# === GRAPHE ===
+@graphe("graph2_lowess_pmes_vs_distance.png")
+def graph2_lowess(df, chemin):
+    groupes, types = pd.factorize(df["TYPE"], sort=True)
+    tendance = calculer_tendance(df["distance_to_support_km"].to_numpy(), df["tm_dbm"].to_numpy(), groupes, len(types))
+
+    fig = Figure(figsize=(9, 6))
+    ax = fig.subplots()
+    # Densité de toutes les mesures en fond : une image, pas un point par mesure
+    densite = tendance.histogramme.sum(axis=0)
+    densite = densite.reshape(len(tendance.centres), -1, REGROUPEMENT_DENSITE).sum(axis=-1).T
+    ax.imshow(
+        np.ma.masked_equal(densite, 0), origin="lower", aspect="auto", interpolation="nearest",
+        extent=[tendance.bords_x[0], tendance.bords_x[-1], tendance.bords_y[0], tendance.bords_y[-1]],
+        cmap="Greys", norm=LogNorm(vmin=0.3, vmax=max(densite.max(), 1)), alpha=0.6, rasterized=True
+    )
+    q10, mediane, q90 = tendance.quantiles
+    for t, (type_milieu, couleur) in enumerate(zip(types, sns.color_palette(n_colors=len(types)))):
+        ax.fill_between(tendance.centres, q10[t], q90[t], color=couleur, alpha=0.15, linewidth=0)
+        ax.plot(tendance.centres, mediane[t], color=couleur, linestyle="--", linewidth=1)
+        ax.plot(tendance.centres, tendance.lissee[t], color=couleur, linewidth=2, label=str(type_milieu))
+    ax.set_ylim(-120, -30)
+    ax.set_title("Tendance de la Pmes selon la distance\n(trait : régression locale, tirets : médiane, bande : 10-90 %)")
+    ax.set_xlabel("Distance (km)")
+    ax.set_ylabel("Pmes (dBm)")
+    ax.legend(title="TYPE")
+    ax.grid(True)
+    fig.tight_layout()
+    fig.savefig(chemin)
+
+
+if __name__ == "__main__":
+    generer(["graph2_lowess"])
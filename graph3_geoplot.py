@@ -1,3 +1,4 @@
+
 # MIT License
 #
 # Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
@@ -20,34 +21,34 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+
+from moteur_graphes import graphe, generer
+
+
+@graphe("graph3_carte_geographique_pmes.png")
+def graph3_geoplot(df, chemin):
+    fig = Figure(figsize=(10, 8))
+    ax = fig.subplots()
+    sc = ax.scatter(
+        df["longitude"],
+        df["latitude"],
+        c=df["tm_dbm"],
+        cmap="viridis",
+        s=10,
+        alpha=0.7,
+        rasterized=True,
+        vmin=-120,
+        vmax=-30
+    )
+    fig.colorbar(sc, ax=ax, label="Pmes (dBm)")
+    ax.set_title("Carte géographique de la Pmes")
+    ax.set_xlabel("Longitude")
+    ax.set_ylabel("Latitude")
+    ax.grid(True)
+    fig.tight_layout()
+    fig.savefig(chemin)
 
-df_test = pd.read_csv("resultats/attenuation_estimee_testset.csv")
-df_base = pd.read_csv("resultats/pci_associes_infos_corriges.csv", low_memory=False)
-df_base = df_base.rename(columns={"latitude": "Latitude", "longitude": "Longitude"})
-df = pd.merge(df_test, df_base, on=["Latitude", "Longitude"], how="left")
-df = df.dropna(subset=["Latitude", "Longitude", "tm_dbm"])
 
-plt.figure(figsize=(10, 8))
-sc = plt.scatter(
-    df["Longitude"],
-    df["Latitude"],
-    c=df["tm_dbm"],
-    cmap="viridis",
-    s=10,
-    alpha=0.7,
-    rasterized=True,
-    vmin=-120,
-    vmax=-30
-)
-plt.colorbar(sc, label="Pmes (dBm)")
-plt.title("Carte géographique de la Pmes")
-plt.xlabel("Longitude")
-plt.ylabel("Latitude")
-plt.grid(True)
-plt.tight_layout()
-plt.savefig("visualisations/graph3_carte_geographique_pmes.png")
-plt.close()
+if __name__ == "__main__":
+    generer(["graph3_geoplot"])
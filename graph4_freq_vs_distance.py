@@ -21,42 +21,33 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import pandas as pd
 import seaborn as sns
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import re
-def extract_max_freq(text):
-    if pd.isna(text):
-        return None
-    numbers = re.findall(r"\d+", str(text))
-    return max(map(int, numbers)) if numbers else None
-df_test = pd.read_csv("resultats/attenuation_estimee_testset.csv")
-df_base = pd.read_csv("resultats/pci_associes_infos_corriges.csv", low_memory=False)
-df_type = pd.read_csv("resultats/type_de_milieu_par_point.csv", sep=";")
+from matplotlib.figure import Figure
 
-df_base = df_base.rename(columns={"latitude": "Latitude", "longitude": "Longitude"})
-df = pd.merge(df_test, df_base, on=["Latitude", "Longitude"], how="left")
-df = pd.merge(df, df_type[["STA_NM_ANFR", "TYPE"]], on="STA_NM_ANFR", how="left")
+from moteur_graphes import graphe, generer
 
-df["frequence"] = df["band_table"].apply(extract_max_freq)
-df["frequence"] = pd.to_numeric(df["frequence"], errors="coerce")
 
-plt.figure(figsize=(10, 6))
-sns.scatterplot(
-    data=df[df["frequence"].notna()],
-    x="frequence",
-    y="distance_to_support_km",
-    hue="TYPE",
-    alpha=0.6,
-    rasterized=True
-)
-plt.title("Distance vs Fréquence")
-plt.xlabel("Fréquence (MHz)")
-plt.ylabel("Distance (km)")
-plt.legend(loc="upper right")
-plt.grid(True)
-plt.tight_layout()
-plt.savefig("visualisations/graph4_distance_vs_frequence.png")
-plt.close()
+@graphe("graph4_distance_vs_frequence.png")
+def graph4_freq_vs_distance(df, chemin):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    sns.scatterplot(
+        data=df[df["frequence"].notna()],
+        x="frequence",
+        y="distance_to_support_km",
+        hue="TYPE",
+        alpha=0.6,
+        rasterized=True,
+        ax=ax
+    )
+    ax.set_title("Distance vs Fréquence")
+    ax.set_xlabel("Fréquence (MHz)")
+    ax.set_ylabel("Distance (km)")
+    ax.legend(loc="upper right")
+    ax.grid(True)
+    fig.tight_layout()
+    fig.savefig(chemin)
+
+
+if __name__ == "__main__":
+    generer(["graph4_freq_vs_distance"])
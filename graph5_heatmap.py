@@ -21,23 +21,25 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import pandas as pd
-import datashader as ds
-import datashader.transfer_functions as tf
-import colorcet
+from moteur_graphes import graphe, generer
 
-df_test = pd.read_csv("resultats/attenuation_estimee_testset.csv")
-df_base = pd.read_csv("resultats/pci_associes_infos_corriges.csv", low_memory=False)
-df_base = df_base.rename(columns={"latitude": "Latitude", "longitude": "Longitude"})
-df = pd.merge(df_test, df_base, on=["Latitude", "Longitude"], how="left")
-df = df.dropna(subset=["Latitude", "Longitude", "tm_dbm"])
 
-cvs = ds.Canvas(
-    plot_width=1000,
-    plot_height=1000,
-    x_range=(df["Longitude"].min(), df["Longitude"].max()),
-    y_range=(df["Latitude"].min(), df["Latitude"].max())
-)
-agg = cvs.points(df, 'Longitude', 'Latitude', ds.mean('tm_dbm'))
-img = tf.shade(agg, cmap=colorcet.fire, how='eq_hist')
-img.to_pil().save("visualisations/graph5_heatmap_datashader_pmes.png")
+@graphe("graph5_heatmap_datashader_pmes.png")
+def graph5_heatmap(df, chemin):
+    import datashader as ds
+    import datashader.transfer_functions as tf
+    import colorcet
+
+    cvs = ds.Canvas(
+        plot_width=1000,
+        plot_height=1000,
+        x_range=(df["longitude"].min(), df["longitude"].max()),
+        y_range=(df["latitude"].min(), df["latitude"].max())
+    )
+    agg = cvs.points(df, 'longitude', 'latitude', ds.mean('tm_dbm'))
+    img = tf.shade(agg, cmap=colorcet.fire, how='eq_hist')
+    img.to_pil().save(chemin)
+
+
+if __name__ == "__main__":
+    generer(["graph5_heatmap"])
@@ -0,0 +1,96 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from geo import R_TERRE_KM
+
+# === PARAMÈTRES ===
+TAILLE_BLOC = 500_000  # mesures par requête de rayon (borne la mémoire des paires)
+
+
+# === CONVERSIONS SPHÈRE <-> R³ ===
+# Sur la sphère unité, la corde est une fonction croissante de l'arc : le plus
+# proche voisin euclidien en 3D est donc le plus proche au sens géodésique.
+def vecteurs_unitaires(lat, lon):
+    lat = np.radians(np.atleast_1d(np.asarray(lat, dtype=np.float64)))
+    lon = np.radians(np.atleast_1d(np.asarray(lon, dtype=np.float64)))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def corde_vers_km(cordes):
+    cordes = np.asarray(cordes, dtype=np.float64)
+    arcs = 2 * R_TERRE_KM * np.arcsin(np.minimum(cordes / 2, 1))
+    return np.where(np.isfinite(cordes), arcs, np.inf)
+
+
+def km_vers_corde(distances_km):
+    return 2 * np.sin(np.minimum(np.asarray(distances_km, dtype=np.float64) / (2 * R_TERRE_KM), np.pi / 2))
+
+
+# === INDEX ===
+class IndexSpherique:
+    def __init__(self, lat, lon, leafsize=16):
+        self.vecteurs = vecteurs_unitaires(lat, lon)
+        self.arbre = cKDTree(self.vecteurs, leafsize=leafsize)
+
+    @classmethod
+    def depuis_arbre(cls, vecteurs, arbre):
+        # Reprend un arbre déjà construit (bundle sur disque) sans le recalculer
+        index = cls.__new__(cls)
+        index.vecteurs = vecteurs
+        index.arbre = arbre
+        return index
+
+    def __len__(self):
+        return len(self.vecteurs)
+
+    def plus_proches(self, lat, lon, k=1, workers=-1):
+        # Distances orthodromiques en km et indices des k supports les plus proches
+        # (tableaux 1D si k == 1, sinon de forme (n, k))
+        cordes, indices = self.arbre.query(vecteurs_unitaires(lat, lon), k=k, workers=workers)
+        return corde_vers_km(cordes), indices
+
+    def dans_rayon(self, lat, lon, rayon_km, taille_bloc=TAILLE_BLOC):
+        # Résultat au format CSR : les voisins de la mesure i sont
+        # indices[offsets[i]:offsets[i + 1]], triés par distance croissante
+        vecteurs = vecteurs_unitaires(lat, lon)
+        corde_max = float(km_vers_corde(rayon_km))
+        comptes = np.zeros(len(vecteurs), dtype=np.int64)
+        indices, cordes = [], []
+
+        for debut in range(0, len(vecteurs), taille_bloc):
+            requetes = cKDTree(vecteurs[debut:debut + taille_bloc])
+            paires = requetes.sparse_distance_matrix(self.arbre, corde_max, output_type="ndarray")
+            paires = paires[np.lexsort((paires["v"], paires["i"]))]
+            comptes[debut:debut + len(requetes.data)] = np.bincount(paires["i"], minlength=len(requetes.data))
+            indices.append(paires["j"].astype(np.int64))
+            cordes.append(paires["v"])
+
+        offsets = np.zeros(len(vecteurs) + 1, dtype=np.int64)
+        np.cumsum(comptes, out=offsets[1:])
+        indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+        distances = corde_vers_km(np.concatenate(cordes)) if cordes else np.empty(0)
+        return offsets, indices, distances
@@ -0,0 +1,75 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import polars as pl
+
+# === PARAMÈTRES ===
+TAILLE_CHUNK = 500_000  # lignes de mesures par chunk en mode streaming
+# Identifiants à peu de valeurs distinctes, gardés en Categorical jusqu'à
+# l'export : chaque valeur est stockée une fois, les lignes n'en portent que
+# le code. tm_cid, STA_NM_ANFR et AER_ID restent en texte (une valeur
+# distincte toutes les ~15 lignes, le dictionnaire coûterait plus qu'il ne
+# rapporte).
+COLONNES_CATEGORIELLES = ["pci", "band_table"]
+
+# Emprise France métropolitaine
+LAT_MIN, LAT_MAX = 42, 52
+LON_MIN, LON_MAX = -5, 9
+
+
+# === MESURES ===
+# Plan paresseux : rien n'est lu tant qu'on ne collecte pas. measurement_id
+# numérote les mesures retenues (premier_id, premier_id + 1, ...) et suit
+# chaque ligne jusqu'aux prédictions et au PL.
+def scanner_mesures(chemin, premier_id=0):
+    return pl.scan_csv(
+        chemin,
+        separator=";",
+        schema_overrides={
+            "latitude": pl.Utf8,
+            "longitude": pl.Utf8,
+            "tm_dbm": pl.Utf8,
+            "tm_cid": pl.Utf8,
+            "pci": pl.Utf8,
+            "band_table": pl.Utf8
+        }
+    ).select(
+        ["latitude", "longitude", "tm_cid", "tm_dbm", "pci", "band_table"]
+    ).with_columns([
+        pl.col("latitude").str.replace(",", ".").cast(pl.Float64),
+        pl.col("longitude").str.replace(",", ".").cast(pl.Float64),
+        pl.col("tm_dbm").str.replace(",", ".").cast(pl.Float64)
+    ]).filter(
+        (pl.col("latitude") >= LAT_MIN) & (pl.col("latitude") <= LAT_MAX) &
+        (pl.col("longitude") >= LON_MIN) & (pl.col("longitude") <= LON_MAX)
+    ).with_row_index("measurement_id", offset=premier_id).with_columns(
+        pl.col("measurement_id").cast(pl.Int64),
+        pl.col(COLONNES_CATEGORIELLES).cast(pl.Categorical)
+    )
+
+
+def iterer_chunks(lf, taille_chunk=TAILLE_CHUNK):
+    # Exécution en streaming : seul un chunk filtré est matérialisé à la fois
+    for chunk in lf.collect_batches(chunk_size=taille_chunk):
+        if chunk.height:
+            yield chunk
@@ -0,0 +1,120 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Moteur de rendu des graphes : la table de test est chargée une seule fois
+# (table de features, fréquence et TYPE déjà calculés), puis passée à chaque
+# graphe enregistré avec @graphe. Les graphes sont rendus en parallèle,
+# dans des processus spawn ou dans des threads. Pas de fork : le lecteur
+# Polars tourne déjà sur des threads, un fork les figerait. La table est
+# écrite une fois en Arrow IPC non compressé, que chaque processus relit par
+# memory-map. Les fonctions dessinent sur une Figure matplotlib explicite
+# (backend Agg), jamais via pyplot.
+# Ajouter un graphe : une fonction décorée dans un module de MODULES_GRAPHES.
+
+import importlib
+import multiprocessing
+import os
+import tempfile
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")
+
+# === PARAMÈTRES ===
+DOSSIER_VISUALISATIONS = "visualisations"
+MODULES_GRAPHES = [
+    "graph1_pmes_vs_distance",
+    "graph2_lowess",
+    "graph3_geoplot",
+    "graph4_freq_vs_distance",
+    "graph5_heatmap",
+]
+
+# nom -> (fonction(df, chemin), chemin de l'image)
+GRAPHES = {}
+_df = None
+
+
+def graphe(fichier):
+    def enregistrer(fonction):
+        GRAPHES[fonction.__name__] = (fonction, os.path.join(DOSSIER_VISUALISATIONS, fichier))
+        return fonction
+    return enregistrer
+
+
+def charger_graphes():
+    for module in MODULES_GRAPHES:
+        importlib.import_module(module)
+    return GRAPHES
+
+
+def charger_donnees():
+    # Lignes du jeu de test (features.py), en pandas
+    from features import jeu_modele, obtenir_features
+    return jeu_modele(obtenir_features(), test=True)
+
+
+# === RENDU ===
+def _init_worker(chemin_ipc):
+    # Processus spawn : graphes réenregistrés, table relue par memory-map
+    global _df
+    import polars as pl
+    charger_graphes()
+    _df = pl.read_ipc(chemin_ipc).to_pandas()
+
+
+def _rendre(nom, df=None):
+    fonction, chemin = GRAPHES[nom]
+    try:
+        fonction(_df if df is None else df, chemin)
+        return nom, None
+    except Exception:
+        return nom, traceback.format_exc()
+
+
+def generer(noms=None, df=None, n_workers=None, mode="spawn"):
+    # mode : "spawn" (processus) ou "thread"
+    charger_graphes()
+    noms = list(GRAPHES) if noms is None else noms
+    if df is None:
+        df = charger_donnees()
+    os.makedirs(DOSSIER_VISUALISATIONS, exist_ok=True)
+    n_workers = min(n_workers or os.cpu_count(), len(noms))
+
+    if mode == "spawn" and n_workers > 1:
+        import polars as pl
+        with tempfile.TemporaryDirectory() as dossier:
+            chemin_ipc = os.path.join(dossier, "table.arrow")
+            pl.from_pandas(df).write_ipc(chemin_ipc, compression="uncompressed")
+            with ProcessPoolExecutor(n_workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(chemin_ipc,)) as pool:
+                resultats = list(pool.map(_rendre, noms))
+    else:
+        with ThreadPoolExecutor(n_workers) as pool:
+            resultats = list(pool.map(_rendre, noms, [df] * len(noms)))
+
+    erreurs = {nom: erreur for nom, erreur in resultats if erreur is not None}
+    for nom, erreur in erreurs.items():
+        print(f"Échec du graphe {nom} :\n{erreur}")
+    return [GRAPHES[nom][1] for nom in noms if nom not in erreurs], erreurs
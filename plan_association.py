@@ -0,0 +1,104 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Association exprimée comme un seul plan Polars (LazyFrame) : support le plus
+# proche, jointures antennes/émetteurs, angle, choix de l'antenne par arg_min,
+# station majoritaire par fenêtre sur tm_cid, puis écriture par sink. Polars
+# optimise et parallélise le plan ; seule la recherche du plus proche support
+# passe par l'index sphérique (map_batches).
+
+import numpy as np
+import polars as pl
+
+from geo import expr_cap_initial, expr_ecart_angulaire
+
+COLONNES_SORTIE = [
+    "measurement_id", "latitude", "longitude", "tm_cid", "tm_dbm", "pci", "band_table",
+    "STA_NM_ANFR", "AER_ID", "AER_NB_AZIMUT", "angle_vers_antenne",
+    "distance_to_support_km", "EMR_NB_PUISSANCE",
+]
+
+
+def _expr_plus_proche(support_index):
+    def plus_proche(coords):
+        lat = coords.struct.field("latitude").to_numpy()
+        lon = coords.struct.field("longitude").to_numpy()
+        distances, indices = support_index.plus_proches(lat, lon)
+        return pl.DataFrame({
+            "idx_support": pl.Series(indices, dtype=pl.UInt32),
+            "distance_to_support_km": distances,
+        }).to_struct()
+
+    return pl.struct(["latitude", "longitude"]).map_batches(
+        plus_proche,
+        return_dtype=pl.Struct({"idx_support": pl.UInt32, "distance_to_support_km": pl.Float64}),
+        is_elementwise=True,
+    ).alias("support")
+
+
+def plan_association(mesures, support_coords, support_sta, support_index, df_antennes, df_emetteur):
+    # mesures : LazyFrame de ingestion.scanner_mesures
+    supports = pl.LazyFrame({
+        "idx_support": np.arange(len(support_sta), dtype=np.uint32),
+        "STA_NM_ANFR": np.asarray(support_sta),
+        "LAT": np.asarray(support_coords[:, 0]),
+        "LON": np.asarray(support_coords[:, 1]),
+    })
+
+    # En cas de doublon (STA_NM_ANFR, AER_ID) dans EMETTEUR, la dernière ligne
+    # l'emporte ; "rang" garde l'ordre du fichier ANTENNE pour les ex-aequo
+    antennes = df_antennes.lazy().filter(
+        pl.col("STA_NM_ANFR").is_not_null() & pl.col("AER_NB_AZIMUT").is_not_nan()
+    ).with_row_index("rang").join(
+        df_emetteur.lazy().unique(["STA_NM_ANFR", "AER_ID"], keep="last"),
+        on=["STA_NM_ANFR", "AER_ID"],
+        how="left"
+    )
+
+    candidats = mesures.with_columns(
+        _expr_plus_proche(support_index)
+    ).unnest("support").join(
+        supports, on="idx_support", how="left"
+    ).join(
+        antennes, on="STA_NM_ANFR", how="inner"
+    ).with_columns(
+        expr_cap_initial("LAT", "LON", "latitude", "longitude").alias("angle_vers_antenne")
+    ).with_columns(
+        expr_ecart_angulaire("AER_NB_AZIMUT", "angle_vers_antenne").alias("ecart")
+    )
+
+    # Une ligne par mesure : l'antenne d'écart minimal, la première dans
+    # l'ordre du fichier en cas d'égalité (comme np.argmin)
+    meilleures = candidats.sort(["measurement_id", "rang"]).group_by("measurement_id", maintain_order=True).agg(
+        pl.all().exclude("ecart").get(pl.col("ecart").arg_min())
+    ).with_columns(
+        pl.col("distance_to_support_km").round(3)
+    )
+
+    # Station majoritaire par tm_cid ; à égalité, le plus petit STA_NM_ANFR
+    dominante = pl.col("STA_NM_ANFR").sort_by(["n_paire", "STA_NM_ANFR"], descending=[True, False]).first()
+    return meilleures.with_columns(
+        pl.len().over(["tm_cid", "STA_NM_ANFR"]).alias("n_paire")
+    ).with_columns(
+        pl.when(pl.col("tm_cid").is_not_null()).then(dominante.over("tm_cid")).alias("STA_NM_ANFR")
+    ).select(COLONNES_SORTIE)
@@ -21,97 +21,158 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import pandas as pd
-import joblib
-
-# === CHARGEMENT DES DONNÉES ===
-
-df = pd.read_csv("resultats\\pci_associes_infos_kdtree_final.csv", sep=",", low_memory=False)
-df_gain = pd.read_csv("ressources\\Gain.csv", sep=";")
-df_milieu = pd.read_csv("resultats\\type_de_milieu_par_point.csv", sep=";")
-
-# === DÉTECTION DES COLONNES DE COORDONNÉES ===
-
-possible_lat_names = [col for col in df.columns if "lat" in col.lower()]
-possible_lon_names = [col for col in df.columns if "lon" in col.lower() or "lng" in col.lower()]
-
-if not possible_lat_names or not possible_lon_names:
-    raise ValueError("Impossible de détecter les colonnes Latitude/Longitude.")
-
-lat_col = possible_lat_names[0]
-lon_col = possible_lon_names[0]
-
-# === AJOUT FREQUENCE + GAIN ===
-
-df["frequence"] = df["band_table"].astype(str).str.extract(r"(\d+)")[0]
-df = df[df["frequence"].notna()]
-df["frequence"] = df["frequence"].astype(int)
-
-gain_dict = dict(zip(df_gain["Frequence"], df_gain["Gain"]))
-df["Gr"] = df["frequence"].map(gain_dict)
-
-# === AJOUT TYPE DE MILIEU ===
-
-df = df.merge(df_milieu[["STA_NM_ANFR", "TYPE"]], on="STA_NM_ANFR", how="left")
-
-# === NETTOYAGE ===
-
-df = df.dropna(subset=[
-    "tm_dbm", "EMR_NB_PUISSANCE", "Gr", "TYPE",
-    "distance_to_support_km", "angle_vers_antenne", lat_col, lon_col
-])
-
-# === CALCUL ATTENUATION ===
-
-df["ATT_estimee"] = df["EMR_NB_PUISSANCE"] + df["Gr"] - df["tm_dbm"]
-
-# === ENCODAGE TYPE ===
-
-df_encoded = pd.get_dummies(df, columns=["TYPE"], drop_first=True)
+# Prédiction de l'atténuation.
+# Sans argument : jeu de test de la table de features (features.py).
+# Avec --entree : scoring par lots de n'importe quel fichier d'association
+# (CSV de testPolars.py ou Parquet), lu par chunks et réparti sur un pool de
+# processus. Chaque worker charge le modèle une seule fois ; les prédictions
+# sont écrites au fil de l'eau, dans l'ordre du fichier.
+# Usage : python predict.py
+#         python predict.py --entree resultats\pci_associes_infos_corriges.csv --workers 8 [--compile]
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-# === SPLIT 80/20 ===
-
-df_encoded_shuffled = df_encoded.sample(frac=1, random_state=42).reset_index(drop=True)
-split_index = int(0.8 * len(df_encoded_shuffled))
-
-df_test = df_encoded_shuffled.iloc[split_index:]
-
-# === FEATURES COMME À L’ENTRAÎNEMENT ===
-
-base_features = [
-    "distance_to_support_km",
-    "frequence",
-    "EMR_NB_PUISSANCE",
-    "Gr",
-    "angle_vers_antenne",
-]
-
-type_features = [col for col in df_test.columns if col.startswith("TYPE_")]
-all_features = base_features + type_features
-
-# === CHARGEMENT DU MODÈLE ===
-
-model = joblib.load("resultats\\random_forest_att_model.pkl")
-
-# === PRÉPARATION DES DONNÉES TEST ===
-
-for col in model.feature_names_in_:
-    if col not in df_test.columns:
-        df_test[col] = 0
-
-X_test = df_test[model.feature_names_in_]
-
-# === COORDONNÉES DU TEST SET ===
-
-coords = df[[lat_col, lon_col]].reset_index(drop=True)
-df_test_coords = coords.iloc[df_test.index].reset_index(drop=True)
-
-# === PRÉDICTION ===
-
-df_test_coords["ATT_estimee"] = model.predict(X_test)
-
-# === EXPORT CSV ===
-
-df_test_coords.rename(columns={lat_col: "Latitude", lon_col: "Longitude"}, inplace=True)
-df_test_coords.to_csv("resultats\\attenuation_estimee_testset.csv", index=False)
-print("Résultats exportés : attenuation_estimee_testset.csv")
+import joblib
+import polars as pl
+
+from features import (
+    BASE_FEATURES, SOURCE_TYPE, charger_gain, charger_types, enrichir_mesures,
+    jeu_modele, obtenir_features, scanner_association
+)
+from ingestion import iterer_chunks
+
+# === PARAMÈTRES ===
+CHEMIN_MODELE = "resultats\\random_forest_att_model.pkl"
+CHEMIN_SORTIE_TEST = "resultats\\attenuation_estimee_testset.csv"
+CHEMIN_SORTIE_LOTS = "resultats\\attenuation_estimee.csv"
+TAILLE_CHUNK = 200_000
+CHUNKS_EN_VOL = 2  # chunks soumis d'avance par worker
+
+
+# === WORKERS ===
+_modele = None
+_expressions = None
+_modalites = None
+_tables = None
+
+
+def expressions_modele(feature_names_in_):
+    # Une expression par colonne du modèle, construite une seule fois :
+    # indicatrice TYPE_* recalculée, colonne inconnue remplie par 0
+    expressions = []
+    for nom in feature_names_in_:
+        if nom in BASE_FEATURES:
+            expressions.append(pl.col(nom).cast(pl.Float64))
+        elif nom.startswith("TYPE_"):
+            expressions.append((pl.col("TYPE") == nom[len("TYPE_"):]).fill_null(False).cast(pl.Float64).alias(nom))
+        else:
+            expressions.append(pl.lit(0.0).alias(nom))
+    return expressions
+
+
+def masque_valides(X, types, modalites):
+    # Lignes scorables : toutes les entrées du modèle présentes et un TYPE vu à
+    # l'entraînement (toutes les indicatrices à 0 désignent la modalité de
+    # référence, pas un TYPE nul ou inconnu). Modèle sans modalites_type_
+    # (entraîné avant leur enregistrement) : seul le TYPE nul est écarté.
+    valides = X.select(pl.all_horizontal(pl.all().is_not_null() & pl.all().is_not_nan())).to_series()
+    types = types.cast(pl.Utf8)
+    connus = types.is_not_null() if modalites is None else types.is_in(list(modalites))
+    return valides & connus.fill_null(False)
+
+
+def charger_modele(compile=False):
+    if compile:
+        from arbres_compiles import obtenir_foret
+        return obtenir_foret()
+    return joblib.load(CHEMIN_MODELE)
+
+
+def _init_worker(compile, source_type):
+    global _modele, _expressions, _modalites, _tables
+    _modele = charger_modele(compile)
+    _expressions = expressions_modele(_modele.feature_names_in_)
+    _modalites = getattr(_modele, "modalites_type_", None)
+    _tables = (charger_gain(), source_type, charger_types() if source_type == "support" else None)
+
+
+def _scorer_chunk(chunk):
+    df_gain, source_type, df_types = _tables
+    enrichi = enrichir_mesures(chunk, df_gain, source_type, df_types)
+    X = enrichi.select(_expressions)
+
+    # Lignes sans toutes les entrées du modèle ou de TYPE inconnu : ATT_estimee vide
+    valides = masque_valides(X, enrichi["TYPE"], _modalites)
+    att = pl.Series("ATT_estimee", [None] * X.height, dtype=pl.Float64)
+    if valides.any():
+        att = att.scatter(valides.arg_true(), _modele.predict(X.filter(valides).to_pandas()))
+    identifiant = ["measurement_id"] if "measurement_id" in chunk.columns else []
+    return chunk.select(
+        identifiant + [pl.col("latitude").alias("Latitude"), pl.col("longitude").alias("Longitude")]
+    ).with_columns(att)
+
+
+# === SCORING PAR LOTS ===
+def scorer_fichier(entree, sortie=CHEMIN_SORTIE_LOTS, workers=os.cpu_count(), taille_chunk=TAILLE_CHUNK,
+                   compile=False, source_type=SOURCE_TYPE):
+    n_lignes = 0
+    t0 = time.perf_counter()
+    chunks = iterer_chunks(scanner_association(entree), taille_chunk)
+    if compile:
+        # Recompilée ici si périmée, une seule fois : les workers la relisent
+        charger_modele(compile)
+    # spawn : le lecteur Polars tourne déjà sur des threads, un fork les figerait
+    contexte = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=contexte, initializer=_init_worker,
+                             initargs=(compile, source_type)) as pool, open(sortie + ".tmp", "wb") as f:
+        # Fenêtre glissante : au plus CHUNKS_EN_VOL chunks par worker en
+        # mémoire, écriture dans l'ordre de soumission
+        en_vol = []
+        for chunk in chunks:
+            en_vol.append(pool.submit(_scorer_chunk, chunk))
+            if len(en_vol) >= CHUNKS_EN_VOL * workers:
+                resultat = en_vol.pop(0).result()
+                resultat.write_csv(f, include_header=n_lignes == 0)
+                n_lignes += resultat.height
+        for future in en_vol:
+            resultat = future.result()
+            resultat.write_csv(f, include_header=n_lignes == 0)
+            n_lignes += resultat.height
+    os.replace(sortie + ".tmp", sortie)
+    duree = time.perf_counter() - t0
+    return n_lignes, duree
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prédiction de l'atténuation.")
+    parser.add_argument("--entree", help="fichier d'association à scorer par lots (CSV ou Parquet)")
+    parser.add_argument("--sortie", default=CHEMIN_SORTIE_LOTS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--taille-chunk", type=int, default=TAILLE_CHUNK)
+    parser.add_argument("--compile", action="store_true", help="forêt compilée (arbres_compiles.py) au lieu du pickle")
+    args = parser.parse_args()
+
+    if args.entree:
+        n_lignes, duree = scorer_fichier(args.entree, args.sortie, args.workers, args.taille_chunk, args.compile)
+        print(f"✅ {n_lignes} lignes scorées en {duree:.1f} s ({n_lignes / max(duree, 1e-9):,.0f} lignes/s) : {args.sortie}")
+    else:
+        # === JEU DE TEST ===
+        # Table partagée (features.py) : même préparation et même split qu'à l'entraînement
+        df_test = jeu_modele(obtenir_features(), test=True)
+        model = charger_modele(args.compile)
+
+        for col in model.feature_names_in_:
+            if col not in df_test.columns:
+                df_test[col] = 0
+        X_test = df_test[list(model.feature_names_in_)]
+
+        df_test_coords = df_test[["measurement_id", "latitude", "longitude"]].reset_index(drop=True)
+        df_test_coords["ATT_estimee"] = model.predict(X_test)
+
+        df_test_coords.rename(columns={"latitude": "Latitude", "longitude": "Longitude"}, inplace=True)
+        df_test_coords.to_csv(CHEMIN_SORTIE_TEST, index=False)
+        print("Résultats exportés : attenuation_estimee_testset.csv")
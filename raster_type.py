@@ -0,0 +1,178 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Raster du type de milieu : la couche communes de detect_type.py est
+# rasterisée une fois en grille uint8 (pas d'environ RESOLUTION_M mètres) sur
+# l'emprise France, écrite en .npy et relue par memory-map. Le TYPE d'un point
+# quelconque (mesure, maille de prédiction) est alors une simple indexation
+# de tableau, sans jointure sur les polygones. Code 0 = hors commune.
+# Usage : python raster_type.py [--resolution 50]  (reconstruit le raster)
+
+import argparse
+import json
+import math
+import os
+import shutil
+from dataclasses import dataclass
+
+import numpy as np
+from tqdm import tqdm
+
+from cache_tables import DOSSIER_CACHE, empreinte_fichier, source_a_jour
+from geo import R_TERRE_KM
+from ingestion import LAT_MIN, LAT_MAX, LON_MIN, LON_MAX
+
+# === PARAMÈTRES ===
+VERSION_RASTER = 1
+DOSSIER_RASTER = os.path.join(DOSSIER_CACHE, "raster_type")
+RESOLUTION_M = 50
+LIGNES_PAR_BANDE = 1024  # lignes rasterisées à la fois (borne la mémoire)
+
+
+@dataclass
+class RasterType:
+    grille: np.ndarray  # (hauteur, largeur) uint8, ligne 0 au nord
+    lat_max: float
+    lon_min: float
+    pas_lat: float
+    pas_lon: float
+    categories: list    # categories[code - 1] = TYPE
+
+    def codes(self, lat, lon):
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        codes = np.zeros(len(lat), dtype=np.uint8)
+        valides = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+        lignes = np.floor((self.lat_max - lat[valides]) / self.pas_lat).astype(np.int64)
+        colonnes = np.floor((lon[valides] - self.lon_min) / self.pas_lon).astype(np.int64)
+        hauteur, largeur = self.grille.shape
+        dedans = (lignes >= 0) & (lignes < hauteur) & (colonnes >= 0) & (colonnes < largeur)
+        codes[valides[dedans]] = self.grille[lignes[dedans], colonnes[dedans]]
+        return codes
+
+    def types(self, lat, lon):
+        # TYPE de chaque point, None hors communes
+        return np.array([None] + list(self.categories), dtype=object)[self.codes(lat, lon)]
+
+
+# === CONSTRUCTION ===
+def construire_raster(resolution_m=RESOLUTION_M, dossier=DOSSIER_RASTER):
+    try:
+        from rasterio import features
+        from rasterio.transform import from_origin
+    except ImportError as e:
+        raise ImportError("rasterio est nécessaire pour construire le raster TYPE (pip install rasterio).") from e
+    import shapely
+    from detect_type import CHEMIN_COMMUNES, _fichiers_shapefile, charger_communes
+
+    sources = {fichier: empreinte_fichier(fichier) for fichier in _fichiers_shapefile(CHEMIN_COMMUNES)}
+    communes = charger_communes()
+    communes = communes[communes["TYPE"].notna()].reset_index(drop=True)
+    categories = sorted(communes["TYPE"].unique())
+    if len(categories) > 255:
+        raise ValueError(f"{len(categories)} types de milieu, uint8 limité à 255.")
+    codes = communes["TYPE"].map({t: i + 1 for i, t in enumerate(categories)}).to_numpy(np.uint8)
+    geometries = communes.geometry.values
+
+    # Pas en latitude fixe, pas en longitude ajusté au centre de l'emprise
+    pas_lat = math.degrees(resolution_m / 1000 / R_TERRE_KM)
+    pas_lon = pas_lat / math.cos(math.radians((LAT_MIN + LAT_MAX) / 2))
+    hauteur = math.ceil((LAT_MAX - LAT_MIN) / pas_lat)
+    largeur = math.ceil((LON_MAX - LON_MIN) / pas_lon)
+
+    tmp = dossier + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    grille = np.lib.format.open_memmap(
+        os.path.join(tmp, "grille.npy"), mode="w+", dtype=np.uint8, shape=(hauteur, largeur)
+    )
+    arbre = communes.sindex
+    for debut in tqdm(range(0, hauteur, LIGNES_PAR_BANDE), desc="Rasterisation"):
+        fin = min(debut + LIGNES_PAR_BANDE, hauteur)
+        haut, bas = LAT_MAX - debut * pas_lat, LAT_MAX - fin * pas_lat
+        # Ordre décroissant : la dernière forme écrite gagne, donc une zone
+        # couverte par deux communes garde la première, comme detect_type.py
+        idx = np.sort(arbre.query(shapely.box(LON_MIN, bas, LON_MIN + largeur * pas_lon, haut)))[::-1]
+        bande = np.zeros((fin - debut, largeur), dtype=np.uint8)
+        if len(idx):
+            features.rasterize(
+                zip(geometries[idx], codes[idx]), out=bande, transform=from_origin(LON_MIN, haut, pas_lon, pas_lat)
+            )
+        grille[debut:fin] = bande
+    grille.flush()
+    del grille
+
+    with open(os.path.join(tmp, "manifeste.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": VERSION_RASTER, "sources": sources, "resolution_m": resolution_m,
+            "lat_max": LAT_MAX, "lon_min": LON_MIN, "pas_lat": pas_lat, "pas_lon": pas_lon,
+            "categories": categories,
+        }, f, indent=2)
+
+    shutil.rmtree(dossier, ignore_errors=True)
+    os.replace(tmp, dossier)
+    return charger_raster(dossier)
+
+
+# === LECTURE ===
+def charger_raster(dossier=DOSSIER_RASTER):
+    chemin_manifeste = os.path.join(dossier, "manifeste.json")
+    if not os.path.exists(chemin_manifeste):
+        raise ValueError(f"Raster TYPE absent : {dossier}")
+    with open(chemin_manifeste, encoding="utf-8") as f:
+        manifeste = json.load(f)
+    if manifeste["version"] != VERSION_RASTER:
+        raise ValueError(f"Raster TYPE en version {manifeste['version']}, attendu {VERSION_RASTER}.")
+    mtimes = {chemin: empreinte["mtime_ns"] for chemin, empreinte in manifeste["sources"].items()}
+    for chemin, empreinte in manifeste["sources"].items():
+        if not os.path.exists(chemin) or not source_a_jour(chemin, empreinte):
+            raise ValueError(f"Raster TYPE périmé : {chemin} a changé depuis sa construction.")
+    if any(empreinte["mtime_ns"] != mtimes[chemin] for chemin, empreinte in manifeste["sources"].items()):
+        with open(chemin_manifeste, "w", encoding="utf-8") as f:
+            json.dump(manifeste, f, indent=2)
+
+    return RasterType(
+        grille=np.load(os.path.join(dossier, "grille.npy"), mmap_mode="r"),
+        lat_max=manifeste["lat_max"],
+        lon_min=manifeste["lon_min"],
+        pas_lat=manifeste["pas_lat"],
+        pas_lon=manifeste["pas_lon"],
+        categories=manifeste["categories"],
+    )
+
+
+def obtenir_raster(dossier=DOSSIER_RASTER):
+    # Raster sur disque s'il est à jour, sinon reconstruction
+    try:
+        return charger_raster(dossier)
+    except ValueError as e:
+        print(f"{e} Reconstruction du raster TYPE...")
+        return construire_raster(dossier=dossier)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construit le raster du type de milieu.")
+    parser.add_argument("--resolution", type=float, default=RESOLUTION_M, help="taille des cellules en mètres")
+    args = parser.parse_args()
+    raster = construire_raster(args.resolution)
+    print(f"✅ Raster TYPE écrit : {DOSSIER_RASTER} ({raster.grille.shape[0]} x {raster.grille.shape[1]})")
@@ -21,41 +21,29 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import pandas as pd
+import polars as pl
 
-# Charger les fichiers (avec le bon séparateur pour Gain.csv)
-gain_df = pd.read_csv("ressources\\Gain.csv", sep=";")
-att_df = pd.read_csv("resultats\\attenuation_estimee_testset.csv", sep=",")
-pci_df = pd.read_csv("resultats\\pci_associes_infos_corriges.csv", sep=",")
+from features import obtenir_features
+from plan_association import COLONNES_SORTIE
 
-# Nettoyage des noms de colonnes
-gain_df.columns = gain_df.columns.str.strip()
-att_df.columns = att_df.columns.str.strip()
-pci_df.columns = pci_df.columns.str.strip()
+# Charger les fichiers : fréquence et gain viennent de la table de features
+att_df = pl.read_csv("resultats\\attenuation_estimee_testset.csv").rename(lambda c: c.strip())
+df = obtenir_features().select(
+    COLONNES_SORTIE + ["frequence", "Gr"]
+).rename({"frequence": "Frequence", "Gr": "Gain"})
 
-# Vérification colonnes (debug)
-print("Colonnes Gain.csv :", gain_df.columns.tolist())
-
-# Fusion des coordonnées pour ajouter ATT_estimee
-df = pci_df.merge(att_df, left_on=["latitude", "longitude"], right_on=["Latitude", "Longitude"], how="left")
-
-# Extraction de la fréquence depuis band_table
-def extract_frequency(band_str):
-    if pd.isna(band_str):
-        return None
-    for freq in gain_df['Frequence']:
-        if str(freq) in band_str:
-            return freq
-    return None
-
-df['Frequence'] = df['band_table'].apply(extract_frequency)
-
-# Jointure avec les gains
-df = df.merge(gain_df, how='left', on='Frequence')
+# Rattachement des prédictions par measurement_id : au plus une prédiction
+# par mesure (validate lève une erreur sinon), le nombre de lignes ne change pas
+df = df.join(
+    att_df.select(["measurement_id", "Latitude", "Longitude", "ATT_estimee"]),
+    on="measurement_id", how="left", validate="1:1", maintain_order="left"
+).select(COLONNES_SORTIE + ["Latitude", "Longitude", "ATT_estimee", "Frequence", "Gain"])
 
 # Calcul de PL
-df['PL'] = df['tm_dbm'] - df['ATT_estimee'] + df['Gain'] - df['EMR_NB_PUISSANCE']
+df = df.with_columns(
+    (pl.col("tm_dbm") - pl.col("ATT_estimee") + pl.col("Gain") - pl.col("EMR_NB_PUISSANCE")).alias("PL")
+)
 
 # Export CSV
-df.to_csv("resultats\\resultat_PL.csv", index=False)
+df.write_csv("resultats\\resultat_PL.csv")
 print("Fichier 'resultat_PL.csv' généré avec succès.")
@@ -0,0 +1,367 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Service local de prédiction : le modèle, la table des gains et la table des
+# TYPE sont chargés une fois et restent en mémoire. Les requêtes concurrentes
+# sont regroupées en micro-lots : le premier arrivé attend au plus
+# --delai-ms que d'autres le rejoignent, puis un seul predict est appelé pour
+# tout le lot. /metriques donne les latences p50/p99 et la taille des lots.
+#   POST /predire    {"mesures": [{"band_table": "LTE 800", "EMR_NB_PUISSANCE": 30,
+#                     "distance_to_support_km": 1.2, "angle_vers_antenne": 40,
+#                     "STA_NM_ANFR": "..." ou "TYPE": "..."}, ...]}
+#                    -> {"ATT_estimee": [...]}  (null si une entrée manque)
+#   GET  /metriques
+# Usage : python service_prediction.py [--port 8765 | --socket /tmp/att.sock] [--compile]
+#         python service_prediction.py --client --requetes 2000 --concurrence 32
+
+import argparse
+import json
+import math
+import os
+import re
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import polars as pl
+
+from features import BASE_FEATURES, charger_gain, charger_types
+from predict import charger_modele, expressions_modele, masque_valides
+
+# === PARAMÈTRES ===
+PORT = 8765
+DELAI_MS = 5.0        # budget d'attente d'un micro-lot
+LIGNES_PAR_LOT = 4096  # un lot plein part sans attendre le délai
+FENETRE_METRIQUES = 10_000  # requêtes gardées pour les percentiles
+DELAI_REPONSE_S = 30.0  # au-delà, la requête est abandonnée (503)
+
+
+# === MODÈLE CHAUD ===
+class Predicteur:
+    def __init__(self, compile=False):
+        self.modele = charger_modele(compile)
+        self.expressions = expressions_modele(self.modele.feature_names_in_)
+        self.modalites = getattr(self.modele, "modalites_type_", None)
+        gain = charger_gain()
+        self.gains = dict(zip(gain["Frequence"].cast(pl.Int64).to_list(), gain["Gain"].cast(pl.Float64).to_list()))
+        types = charger_types()
+        self.types = dict(zip(types["STA_NM_ANFR"].to_list(), types["TYPE"].to_list()))
+
+    def _ligne(self, mesure):
+        # Même préparation que features.enrichir_mesures, sur un dict
+        frequence = mesure.get("frequence")
+        if frequence is None and mesure.get("band_table") is not None:
+            nombre = re.search(r"\d+", str(mesure["band_table"]))
+            frequence = int(nombre.group()) if nombre else None
+        ligne = {nom: mesure.get(nom) for nom in BASE_FEATURES}
+        ligne["frequence"] = frequence
+        ligne["Gr"] = mesure.get("Gr", self.gains.get(frequence))
+        ligne["TYPE"] = mesure.get("TYPE", self.types.get(str(mesure.get("STA_NM_ANFR"))))
+        return ligne
+
+    def predire(self, mesures):
+        schema = {**{nom: pl.Float64 for nom in BASE_FEATURES}, "TYPE": pl.Utf8}
+        lignes = pl.DataFrame([self._ligne(m) for m in mesures], schema=schema)
+        X = lignes.select(self.expressions)
+        valides = masque_valides(X, lignes["TYPE"], self.modalites)
+        att = np.full(X.height, np.nan)
+        if valides.any():
+            att[valides.to_numpy()] = self.modele.predict(X.filter(valides).to_pandas())
+        return [None if np.isnan(a) else float(a) for a in att]
+
+
+def erreur_mesures(mesures):
+    # Contrôle d'une requête avant sa mise en file : une ligne invalide ne
+    # doit pas faire échouer les autres requêtes de son micro-lot
+    if not isinstance(mesures, list):
+        return "\"mesures\" doit être une liste"
+    for i, mesure in enumerate(mesures):
+        if not isinstance(mesure, dict):
+            return f"mesures[{i}] : objet attendu"
+        for nom in BASE_FEATURES:
+            valeur = mesure.get(nom)
+            if valeur is not None and (isinstance(valeur, bool) or not isinstance(valeur, (int, float))):
+                return f"mesures[{i}].{nom} : nombre attendu"
+            if valeur is not None and not math.isfinite(valeur):
+                # json.loads accepte NaN, Infinity et 1e400 (inf)
+                return f"mesures[{i}].{nom} : nombre fini attendu"
+        if mesure.get("TYPE") is not None and not isinstance(mesure["TYPE"], str):
+            return f"mesures[{i}].TYPE : texte attendu"
+    return None
+
+
+# === MICRO-LOTS ===
+class Requete:
+    def __init__(self, mesures):
+        self.mesures = mesures
+        self.arrivee = time.perf_counter()
+        self.fin = threading.Event()
+        self.resultat = None
+        self.erreur = None
+
+
+class Regroupeur:
+    # Un thread unique appelle predict ; les threads HTTP déposent leurs
+    # requêtes dans la file et attendent leur résultat
+    def __init__(self, predicteur, delai_ms=DELAI_MS, lignes_par_lot=LIGNES_PAR_LOT):
+        self.predicteur = predicteur
+        self.delai = delai_ms / 1000
+        self.lignes_par_lot = lignes_par_lot
+        self.file = deque()
+        self.condition = threading.Condition()
+        self.latences = deque(maxlen=FENETRE_METRIQUES)
+        self.tailles_lots = deque(maxlen=FENETRE_METRIQUES)
+        self.n_requetes = 0
+        threading.Thread(target=self._boucle, daemon=True).start()
+
+    def soumettre(self, mesures):
+        requete = Requete(mesures)
+        with self.condition:
+            self.file.append(requete)
+            self.condition.notify()
+        if not requete.fin.wait(DELAI_REPONSE_S):
+            raise TimeoutError(f"pas de réponse en {DELAI_REPONSE_S:.0f} s")
+        if requete.erreur is not None:
+            raise requete.erreur
+        return requete.resultat
+
+    def _prendre_lot(self):
+        with self.condition:
+            while not self.file:
+                self.condition.wait()
+            # Le lot part quand le plus ancien a épuisé son budget ou qu'il est plein
+            echeance = self.file[0].arrivee + self.delai
+            while sum(len(r.mesures) for r in self.file) < self.lignes_par_lot:
+                reste = echeance - time.perf_counter()
+                if reste <= 0:
+                    break
+                self.condition.wait(reste)
+            lot, n = [], 0
+            while self.file and (not lot or n + len(self.file[0].mesures) <= self.lignes_par_lot):
+                n += len(self.file[0].mesures)
+                lot.append(self.file.popleft())
+            return lot
+
+    def _boucle(self):
+        # Aucune exception ne doit arrêter ce thread : sans lui, toutes les
+        # requêtes suivantes attendraient indéfiniment
+        while True:
+            lot = []
+            try:
+                lot = self._prendre_lot()
+                try:
+                    att = self.predicteur.predire([m for r in lot for m in r.mesures])
+                except Exception:
+                    if len(lot) == 1:
+                        raise
+                    # Lot en échec : repris requête par requête, une requête
+                    # invalide n'échoue pas pour ses voisines
+                    for r in lot:
+                        try:
+                            r.resultat = self.predicteur.predire(r.mesures)
+                        except Exception as e:
+                            r.erreur = e
+                else:
+                    debut = 0
+                    for r in lot:
+                        r.resultat = att[debut:debut + len(r.mesures)]
+                        debut += len(r.mesures)
+                fin = time.perf_counter()
+                with self.condition:
+                    self.n_requetes += len(lot)
+                    self.tailles_lots.append(len(lot))
+                    self.latences.extend(fin - r.arrivee for r in lot)
+            except Exception as e:
+                for r in lot:
+                    r.erreur = e
+            finally:
+                for r in lot:
+                    r.fin.set()
+
+    def metriques(self):
+        with self.condition:
+            latences = np.array(self.latences) * 1000
+            tailles = np.array(self.tailles_lots)
+            n_requetes = self.n_requetes
+        if not len(latences):
+            return {"requetes": 0}
+        return {
+            "requetes": n_requetes,
+            "latence_p50_ms": float(np.percentile(latences, 50)),
+            "latence_p99_ms": float(np.percentile(latences, 99)),
+            "lots": len(tailles),
+            "requetes_par_lot_moyen": float(tailles.mean()),
+            "requetes_par_lot_max": int(tailles.max()),
+        }
+
+
+# === HTTP ===
+class Gestionnaire(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # connexions gardées ouvertes par les clients
+    regroupeur = None
+
+    def _repondre(self, code, contenu):
+        corps = json.dumps(contenu).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def do_GET(self):
+        if self.path == "/metriques":
+            self._repondre(200, self.regroupeur.metriques())
+        else:
+            self._repondre(404, {"erreur": "chemin inconnu"})
+
+    def do_POST(self):
+        if self.path != "/predire":
+            self._repondre(404, {"erreur": "chemin inconnu"})
+            return
+        try:
+            mesures = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))["mesures"]
+        except (ValueError, KeyError, TypeError):
+            self._repondre(400, {"erreur": "corps attendu : {\"mesures\": [...]}"})
+            return
+        erreur = erreur_mesures(mesures)
+        if erreur is not None:
+            self._repondre(400, {"erreur": erreur})
+            return
+        if not mesures:
+            self._repondre(200, {"ATT_estimee": []})
+            return
+        try:
+            self._repondre(200, {"ATT_estimee": self.regroupeur.soumettre(mesures)})
+        except TimeoutError as e:
+            self._repondre(503, {"erreur": str(e)})
+        except Exception as e:
+            self._repondre(500, {"erreur": str(e)})
+
+    def address_string(self):
+        # client_address est vide sur un socket Unix
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ServeurTCP(ThreadingHTTPServer):
+    request_queue_size = 128
+
+
+class ServeurUnix(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = "localhost", 0
+
+
+def creer_serveur(regroupeur, port=PORT, chemin_socket=None):
+    Gestionnaire.regroupeur = regroupeur
+    if chemin_socket:
+        if os.path.exists(chemin_socket):
+            os.remove(chemin_socket)
+        return ServeurUnix(chemin_socket, Gestionnaire)
+    return ServeurTCP(("127.0.0.1", port), Gestionnaire)
+
+
+# === CLIENT LOCAL ===
+class ConnexionUnix(HTTPConnection):
+    def __init__(self, chemin_socket):
+        super().__init__("localhost")
+        self.chemin_socket = chemin_socket
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.chemin_socket)
+
+
+def connexion(port=PORT, chemin_socket=None):
+    return ConnexionUnix(chemin_socket) if chemin_socket else HTTPConnection("127.0.0.1", port)
+
+
+def appeler(conn, methode, chemin, contenu=None):
+    corps = json.dumps(contenu).encode() if contenu is not None else None
+    conn.request(methode, chemin, body=corps, headers={"Content-Type": "application/json"})
+    return json.loads(conn.getresponse().read())
+
+
+def client(n_requetes, concurrence, lignes_par_requete=1, port=PORT, chemin_socket=None):
+    # Rejoue des mesures de la table de features, en parallèle, comme le
+    # feraient les outils de planification
+    from features import obtenir_features
+    colonnes = BASE_FEATURES + ["band_table", "STA_NM_ANFR"]
+    mesures = obtenir_features().select(colonnes).head(n_requetes * lignes_par_requete).to_dicts()
+    paquets = [mesures[i:i + lignes_par_requete] for i in range(0, len(mesures), lignes_par_requete)]
+    locales = threading.local()
+
+    def envoyer(paquet):
+        if not hasattr(locales, "conn"):
+            locales.conn = connexion(port, chemin_socket)
+        t0 = time.perf_counter()
+        reponse = appeler(locales.conn, "POST", "/predire", {"mesures": paquet})
+        return time.perf_counter() - t0, reponse["ATT_estimee"]
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrence) as pool:
+        resultats = list(pool.map(envoyer, paquets))
+    duree = time.perf_counter() - t0
+    latences = np.array([r[0] for r in resultats]) * 1000
+    print(f"✅ {len(paquets)} requêtes en {duree:.2f} s ({len(paquets) / duree:,.0f} requêtes/s), "
+          f"client p50 {np.percentile(latences, 50):.1f} ms, p99 {np.percentile(latences, 99):.1f} ms")
+    print("Serveur :", appeler(connexion(port, chemin_socket), "GET", "/metriques"))
+    return [a for r in resultats for a in r[1]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Service local de prédiction de l'atténuation.")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--socket", help="socket Unix au lieu du port TCP local")
+    parser.add_argument("--delai-ms", type=float, default=DELAI_MS, help="budget de regroupement des requêtes")
+    parser.add_argument("--lignes-par-lot", type=int, default=LIGNES_PAR_LOT)
+    parser.add_argument("--compile", action="store_true", help="forêt compilée (arbres_compiles.py)")
+    parser.add_argument("--client", action="store_true", help="client de test contre un service lancé")
+    parser.add_argument("--requetes", type=int, default=1000)
+    parser.add_argument("--concurrence", type=int, default=16)
+    parser.add_argument("--lignes-par-requete", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.client:
+        client(args.requetes, args.concurrence, args.lignes_par_requete, args.port, args.socket)
+    else:
+        regroupeur = Regroupeur(Predicteur(args.compile), args.delai_ms, args.lignes_par_lot)
+        serveur = creer_serveur(regroupeur, args.port, args.socket)
+        print(f"✅ Service prêt sur {args.socket or f'http://127.0.0.1:{args.port}'} "
+              f"(micro-lots de {args.delai_ms} ms au plus)")
+        try:
+            serveur.serve_forever()
+        except KeyboardInterrupt:
+            serveur.server_close()
@@ -0,0 +1,83 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import polars as pl
+
+from cache_tables import charger_table
+from ingestion import LAT_MIN, LAT_MAX, LON_MIN, LON_MAX
+
+# === CHEMINS ===
+CHEMIN_SUPPORTS = "ressources\\SUPPORT_clean.csv"
+CHEMIN_ANTENNES = "ressources\\ANTENNE_clean.csv"
+CHEMIN_EMETTEURS = "ressources\\EMETTEUR_clean.csv"
+
+
+# === LECTEURS (CSV point-virgule, décimales à virgule) ===
+def lire_supports(chemin):
+    return pl.read_csv(
+        chemin,
+        separator=";",
+        columns=["STA_NM_ANFR", "LAT_DECIMAL", "LON_DECIMAL"],
+        schema_overrides={"STA_NM_ANFR": pl.Utf8}
+    ).with_columns([
+        pl.col("LAT_DECIMAL").str.replace(",", ".").cast(pl.Float64).alias("LAT"),
+        pl.col("LON_DECIMAL").str.replace(",", ".").cast(pl.Float64).alias("LON")
+    ]).filter(
+        (pl.col("LAT") >= LAT_MIN) & (pl.col("LAT") <= LAT_MAX) &
+        (pl.col("LON") >= LON_MIN) & (pl.col("LON") <= LON_MAX)
+    )
+
+
+def lire_antennes(chemin):
+    return pl.read_csv(
+        chemin,
+        separator=";",
+        columns=["STA_NM_ANFR", "AER_ID", "AER_NB_AZIMUT"],
+        schema_overrides={"STA_NM_ANFR": pl.Utf8, "AER_ID": pl.Utf8}
+    ).with_columns([
+        pl.col("AER_NB_AZIMUT").str.replace(",", ".").cast(pl.Float64)
+    ])
+
+
+def lire_emetteurs(chemin):
+    return pl.read_csv(
+        chemin,
+        separator=";",
+        columns=["STA_NM_ANFR", "AER_ID", "EMR_NB_PUISSANCE"],
+        schema_overrides={"STA_NM_ANFR": pl.Utf8, "AER_ID": pl.Utf8, "EMR_NB_PUISSANCE": pl.Utf8}
+    ).with_columns([
+        pl.col("EMR_NB_PUISSANCE").str.replace(",", ".").cast(pl.Float64)
+    ])
+
+
+# === ACCÈS EN CACHE ===
+def charger_supports(chemin=CHEMIN_SUPPORTS):
+    return charger_table(chemin, lire_supports)
+
+
+def charger_antennes(chemin=CHEMIN_ANTENNES):
+    return charger_table(chemin, lire_antennes)
+
+
+def charger_emetteurs(chemin=CHEMIN_EMETTEURS):
+    return charger_table(chemin, lire_emetteurs)
@@ -0,0 +1,84 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Options et fixtures partagées par les tests. Le banc du pipeline
+# (test_bench_pipeline.py) ne tourne que si --bench-tailles est donné.
+
+import json
+
+import pytest
+
+from bench_pipeline import (
+    DOSSIER_DONNEES, ETAPES, afficher_etape, comparer, ecrire_resultats, nouveaux_resultats, preparer_donnees
+)
+
+
+def pytest_addoption(parser):
+    groupe = parser.getgroup("bench", "banc d'essai du pipeline")
+    groupe.addoption("--bench-tailles", default="", help="nombres de mesures, ex. 10000,100000")
+    groupe.addoption("--bench-etapes", default=",".join(nom for nom, _ in ETAPES))
+    groupe.addoption("--bench-donnees", default=DOSSIER_DONNEES, help="dossier des données synthétiques")
+    groupe.addoption("--bench-comparer", default=None, help="JSON d'un banc précédent")
+
+
+def pytest_generate_tests(metafunc):
+    # Une série d'étapes par taille, dans l'ordre du pipeline
+    if "taille" in metafunc.fixturenames:
+        texte = metafunc.config.getoption("--bench-tailles")
+        tailles = [int(t) for t in texte.split(",") if t]
+        marques = [] if tailles else [pytest.mark.skip(reason="banc désactivé (--bench-tailles)")]
+        metafunc.parametrize("taille", [pytest.param(t, marks=marques) for t in tailles or [0]],
+                             ids=str, scope="session")
+    if "etape" in metafunc.fixturenames:
+        noms = metafunc.config.getoption("--bench-etapes").split(",")
+        etapes = [(nom, commande) for nom, commande in ETAPES if nom in noms]
+        metafunc.parametrize("etape", etapes, ids=[nom for nom, _ in etapes])
+
+
+@pytest.fixture(scope="session")
+def donnees_synthetiques(taille, pytestconfig):
+    # Dossier de données de la taille courante, généré une fois
+    print(f"\n=== {taille} mesures ===")
+    return preparer_donnees(taille, pytestconfig.getoption("--bench-donnees"))
+
+
+@pytest.fixture(scope="session")
+def resultats_bench(pytestconfig):
+    # Résultats de toutes les étapes, écrits en JSON en fin de session
+    resultats = nouveaux_resultats()
+    yield resultats
+    if not resultats["tailles"]:
+        return
+    print(f"\n✅ Résultats : {ecrire_resultats(resultats)}")
+    chemin_ancien = pytestconfig.getoption("--bench-comparer")
+    if chemin_ancien:
+        with open(chemin_ancien, encoding="utf-8") as f:
+            comparer(resultats, json.load(f))
+
+
+@pytest.fixture
+def mesurer_etape(resultats_bench):
+    def mesurer(taille, nom, r):
+        resultats_bench["tailles"].setdefault(str(taille), {})[nom] = r
+        afficher_etape(nom, r)
+    return mesurer
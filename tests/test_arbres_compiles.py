@@ -0,0 +1,143 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Parité de la forêt compilée (arbres_compiles.py) avec scikit-learn : seuils
+# float32 et float64, feuilles quantifiées (erreur <= pas / 2), routage des
+# valeurs manquantes, et relecture depuis le disque.
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+
+from arbres_compiles import compiler_foret, charger_foret, obtenir_foret, sauver_foret, DTYPE_NOEUD_64
+
+N_LIGNES = 3_000
+FEATURES = ["distance", "angle", "puissance", "altitude"]
+
+
+def jeu(rng, n, part_nan=0.0):
+    X = pd.DataFrame({
+        "distance": rng.uniform(0, 30, n),
+        "angle": rng.uniform(-180, 180, n),
+        "puissance": rng.normal(40, 5, n),
+        "altitude": rng.uniform(0, 1000, n),
+    })
+    y = -20 * np.log10(1 + X["distance"]) + 0.1 * X["puissance"] - 0.01 * np.abs(X["angle"]) + rng.normal(0, 1, n)
+    if part_nan:
+        X = X.mask(rng.random(X.shape) < part_nan)
+    return X, y.to_numpy()
+
+
+def avec_seuils(model, X):
+    # Lignes placées exactement sur les seuils : là où un arrondi float32 se voit
+    X = X.copy()
+    arbre = model.estimators_[0].tree_
+    internes = np.flatnonzero(arbre.children_left >= 0)[:len(X)]
+    for i, noeud in enumerate(internes):
+        X.iloc[i, arbre.feature[noeud]] = arbre.threshold[noeud]
+    return X
+
+
+@pytest.fixture(scope="module")
+def modeles():
+    rng = np.random.default_rng(0)
+    X, y = jeu(rng, N_LIGNES)
+    X_nan, y_nan = jeu(rng, N_LIGNES, part_nan=0.1)
+    return {
+        "rf": RandomForestRegressor(n_estimators=20, max_depth=12, random_state=0).fit(X, y),
+        "extratrees": ExtraTreesRegressor(n_estimators=20, max_depth=12, random_state=0).fit(X, y),
+        "rf_nan": RandomForestRegressor(n_estimators=20, max_depth=12, random_state=0).fit(X_nan, y_nan),
+    }
+
+
+@pytest.fixture(scope="module")
+def X_test():
+    return jeu(np.random.default_rng(1), 2_000)[0]
+
+
+# === PARITÉ ===
+@pytest.mark.parametrize("nom", ["rf", "extratrees"])
+@pytest.mark.parametrize("seuils_float32", [True, False])
+def test_feuilles_exactes(modeles, X_test, nom, seuils_float32):
+    model = modeles[nom]
+    X = avec_seuils(model, X_test)
+    foret = compiler_foret(model, seuils_float32=seuils_float32)
+    assert (foret.noeuds.dtype == DTYPE_NOEUD_64) != seuils_float32
+    assert np.abs(foret.predict(X) - model.predict(X)).max() < 1e-9
+
+
+@pytest.mark.parametrize("nom", ["rf", "extratrees"])
+def test_feuilles_quantifiees(modeles, X_test, nom):
+    model = modeles[nom]
+    X = avec_seuils(model, X_test)
+    foret = compiler_foret(model, quantifier_feuilles=True)
+    assert foret.valeurs.dtype == np.uint16
+    assert np.abs(foret.predict(X) - model.predict(X)).max() <= foret.pas / 2 + 1e-9
+
+
+def test_routage_nan(modeles, X_test):
+    model = modeles["rf_nan"]
+    foret = compiler_foret(model)
+    assert foret.nan_gauche.any() and not foret.nan_gauche.all()
+    rng = np.random.default_rng(2)
+    X = X_test.mask(rng.random(X_test.shape) < 0.2)
+    X.iloc[0] = np.nan
+    assert np.abs(foret.predict(X) - model.predict(X)).max() < 1e-9
+
+
+def test_blocs(modeles, X_test):
+    model = modeles["rf"]
+    foret = compiler_foret(model)
+    assert np.abs(foret.predict(X_test, taille_bloc=7) - model.predict(X_test)).max() < 1e-9
+    assert len(foret.predict(X_test.iloc[:0])) == 0
+
+
+# === DISQUE ===
+def test_sauver_charger(modeles, X_test, tmp_path):
+    model = modeles["rf"]
+    source, dossier = str(tmp_path / "modele.pkl"), str(tmp_path / "foret")
+    joblib.dump(model, source)
+    sauver_foret(compiler_foret(model, quantifier_feuilles=True), dossier, source)
+    foret = charger_foret(dossier, source)
+    assert isinstance(foret.noeuds, np.memmap)
+    assert np.abs(foret.predict(X_test) - model.predict(X_test)).max() <= foret.pas / 2 + 1e-9
+
+
+def test_obtenir_foret(modeles, X_test, tmp_path):
+    source, dossier = str(tmp_path / "modele.pkl"), str(tmp_path / "foret")
+    joblib.dump(modeles["rf"], source)
+    foret = obtenir_foret(dossier, source, seuils_float32=False)
+    assert foret.noeuds.dtype == DTYPE_NOEUD_64
+    # Options conservées d'une compilation à l'autre, sauf demande explicite
+    assert obtenir_foret(dossier, source).noeuds.dtype == DTYPE_NOEUD_64
+    assert obtenir_foret(dossier, source, seuils_float32=True).noeuds.dtype != DTYPE_NOEUD_64
+
+    # Un autre pickle à la même place : la forêt est recompilée
+    joblib.dump(modeles["extratrees"], source)
+    with pytest.raises(ValueError):
+        charger_foret(dossier, source)
+    foret = obtenir_foret(dossier, source)
+    assert np.abs(foret.predict(X_test) - modeles["extratrees"].predict(X_test)).max() < 1e-9
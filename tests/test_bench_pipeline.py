@@ -0,0 +1,36 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Banc du pipeline complet : une étape par test, pour chaque taille de
+# données synthétiques. Temps, pic mémoire et code retour sont ajoutés au JSON
+# du banc (tests/conftest.py) même quand l'étape échoue.
+# Usage : python -m pytest tests/test_bench_pipeline.py --bench-tailles 10000,100000 -s
+
+from bench_pipeline import lancer_etape
+
+
+def test_etape(taille, etape, donnees_synthetiques, mesurer_etape):
+    nom, commande = etape
+    r = lancer_etape(nom, commande, donnees_synthetiques)
+    mesurer_etape(taille, nom, r)
+    assert r["code_retour"] == 0, f"{nom} en échec : voir bench_{nom}.log dans {donnees_synthetiques}"
@@ -0,0 +1,145 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Précision des noyaux de geo.py contre les références scalaires (math), en
+# float64 et float32, et découpage par blocs (bords de bloc, entrées vides).
+
+import numpy as np
+import pytest
+
+from geo import (
+    haversine, cap_initial, ecart_angulaire, point_destination,
+    haversine_reference, cap_initial_reference, ecart_angulaire_reference, point_destination_reference
+)
+
+N_POINTS = 20_000
+# dtype -> tolérances (distance en km, angles en degrés, cap pour les points à plus de 1 km)
+TOLERANCES = {
+    np.float64: {"distance": 1e-9, "cap": 1e-9, "ecart": 1e-9, "destination": 1e-9},
+    np.float32: {"distance": 5e-2, "cap": 1e-1, "ecart": 1e-4, "destination": 1e-4},
+}
+
+
+def ecart_cap(a, b):
+    return np.abs((a - b + 180) % 360 - 180)
+
+
+@pytest.fixture(scope="module")
+def points():
+    # Mesures autour de supports situés en France métropolitaine (distances < 30 km)
+    rng = np.random.default_rng(0)
+    lat1 = rng.uniform(42, 52, N_POINTS)
+    lon1 = rng.uniform(-5, 9, N_POINTS)
+    caps = rng.uniform(0, 360, N_POINTS)
+    portees = rng.uniform(0.001, 30, N_POINTS)
+    lat2, lon2 = point_destination(lat1, lon1, caps, portees)
+    azimuts = rng.uniform(0, 360, N_POINTS)
+    return lat1, lon1, lat2, lon2, caps, portees, azimuts
+
+
+# === PRÉCISION ===
+@pytest.mark.parametrize("dtype", [np.float64, np.float32], ids=["float64", "float32"])
+def test_haversine(points, dtype):
+    lat1, lon1, lat2, lon2, *_ = points
+    reference = np.array([haversine_reference(*p) for p in zip(lat1, lon1, lat2, lon2)])
+    resultat = haversine(lat1, lon1, lat2, lon2, dtype=dtype)
+    assert resultat.dtype == dtype
+    assert np.abs(resultat - reference).max() <= TOLERANCES[dtype]["distance"]
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32], ids=["float64", "float32"])
+def test_cap_initial(points, dtype):
+    lat1, lon1, lat2, lon2, _, portees, _ = points
+    reference = np.array([cap_initial_reference(*p) for p in zip(lat1, lon1, lat2, lon2)])
+    ecarts = ecart_cap(cap_initial(lat1, lon1, lat2, lon2, dtype=dtype), reference)
+    if dtype == np.float32:
+        # En float32 le cap d'un point à quelques mètres n'est pas significatif
+        ecarts = ecarts[portees > 1]
+    assert ecarts.max() <= TOLERANCES[dtype]["cap"]
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32], ids=["float64", "float32"])
+def test_ecart_angulaire(points, dtype):
+    *_, caps, _, azimuts = points
+    reference = np.array([ecart_angulaire_reference(*p) for p in zip(azimuts, caps)])
+    assert np.abs(ecart_angulaire(azimuts, caps, dtype=dtype) - reference).max() <= TOLERANCES[dtype]["ecart"]
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32], ids=["float64", "float32"])
+def test_point_destination(points, dtype):
+    lat1, lon1, _, _, caps, portees, _ = points
+    reference = np.array([point_destination_reference(*p) for p in zip(lat1, lon1, caps, portees)])
+    lat, lon = point_destination(lat1, lon1, caps, portees, dtype=dtype)
+    assert max(np.abs(lat - reference[:, 0]).max(), np.abs(lon - reference[:, 1]).max()) <= TOLERANCES[dtype]["destination"]
+
+
+def test_aller_retour(points):
+    # La distance et le cap reconstruisent la portée et le cap tirés
+    lat1, lon1, lat2, lon2, caps, portees, _ = points
+    np.testing.assert_allclose(haversine(lat1, lon1, lat2, lon2), portees, rtol=1e-9, atol=1e-9)
+    assert ecart_cap(cap_initial(lat1, lon1, lat2, lon2), caps).max() < 1e-6
+
+
+def test_cas_limites():
+    assert haversine(48.0, 2.0, 48.0, 2.0)[0] == 0
+    np.testing.assert_allclose(ecart_angulaire([359.0, 0.0, 90.0], [1.0, 180.0, 270.0]), [2.0, 180.0, 180.0])
+    np.testing.assert_allclose(cap_initial([0.0, 0.0], [0.0, 0.0], [1.0, 0.0], [0.0, 1.0]), [0.0, 90.0], atol=1e-12)
+    # Passage de l'antiméridien : longitude ramenée dans [-180, 180)
+    _, lon = point_destination(0.0, 179.9, 90.0, 50.0)
+    assert -180 <= lon[0] < -179
+
+
+# === DÉCOUPAGE PAR BLOCS ===
+TAILLE_BLOC_TEST = 7
+
+
+@pytest.mark.parametrize("n", [0, 1, TAILLE_BLOC_TEST - 1, TAILLE_BLOC_TEST, TAILLE_BLOC_TEST + 1,
+                               3 * TAILLE_BLOC_TEST, 3 * TAILLE_BLOC_TEST + 2])
+@pytest.mark.parametrize("dtype", [np.float64, np.float32], ids=["float64", "float32"])
+def test_bords_de_bloc(points, n, dtype):
+    # Découpé en blocs ou non, chaque noyau donne exactement le même résultat
+    lat1, lon1, lat2, lon2, caps, portees, azimuts = (a[:n] for a in points)
+    for fonction, entrees in [
+        (haversine, (lat1, lon1, lat2, lon2)),
+        (cap_initial, (lat1, lon1, lat2, lon2)),
+        (ecart_angulaire, (azimuts, caps)),
+        (point_destination, (lat1, lon1, caps, portees)),
+    ]:
+        par_blocs = fonction(*entrees, dtype=dtype, taille_bloc=TAILLE_BLOC_TEST)
+        d_un_bloc = fonction(*entrees, dtype=dtype, taille_bloc=max(n, 1))
+        sorties = par_blocs if isinstance(par_blocs, tuple) else (par_blocs,)
+        attendues = d_un_bloc if isinstance(d_un_bloc, tuple) else (d_un_bloc,)
+        assert len(sorties) == (2 if fonction is point_destination else 1)
+        for sortie, attendue in zip(sorties, attendues):
+            assert sortie.shape == (n,) and sortie.dtype == dtype
+            np.testing.assert_array_equal(sortie, attendue)
+
+
+def test_scalaires_diffuses():
+    lat, lon = point_destination(48.0, 2.0, [0.0, 90.0, 180.0], 10.0)
+    assert lat.shape == lon.shape == (3,)
+
+
+def test_tableau_2d_refuse():
+    with pytest.raises(ValueError):
+        haversine(np.zeros((2, 2)), 0.0, 0.0, 0.0)
@@ -21,96 +21,263 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import pandas as pd
+# Entraînement du modèle d'atténuation. Le backend est au choix (forêt
+# aléatoire parallèle, ExtraTrees, gradient boosting par histogrammes) ;
+# --benchmark les compare sur le même split sans écraser le modèle.
+# --hors-memoire lit la table de features par chunks et fait grandir
+# l'ensemble chunk après chunk (warm_start), avec un hold-out tiré par
+# échantillonnage réservoir dans la partie entraînement du split : la mémoire
+# est bornée par la taille des chunks. Forêts seulement (rf, extratrees) :
+# hgb recalcule ses classes d'histogramme à chaque fit.
+# Usage : python trainRandomForest.py [--backend rf|extratrees|hgb] [--n-jobs -1]
+#         python trainRandomForest.py --benchmark [--backends rf,extratrees,hgb]
+#         python trainRandomForest.py --hors-memoire [--backend rf|extratrees] [--taille-chunk 1000000] [--taille-holdout 200000]
+#         python trainRandomForest.py --recherche "n_estimators=100,300;max_depth=None,20" [--blocs tuile|station]
+# --recherche évalue la grille par validation croisée sur blocs spatiaux
+# (validation_spatiale.py) au lieu du split aléatoire.
+
+import argparse
+import math
+import pickle
+import time
+import warnings
+
 import numpy as np
+import pandas as pd
+import polars as pl
 import joblib
-from sklearn.ensemble import RandomForestRegressor
+from features import obtenir_features, scanner_features, jeu_modele, features_modele, modalites_type
+from ingestion import iterer_chunks
+from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor, HistGradientBoostingRegressor
 from sklearn.metrics import r2_score, mean_squared_error
 
-# === CHARGEMENT DES DONNÉES ===
+# === PARAMÈTRES ===
+
+BACKENDS = ["rf", "extratrees", "hgb"]
+TAILLE_CHUNK = 1_000_000   # lignes par chunk en mode hors mémoire
+TAILLE_HOLDOUT = 200_000   # lignes du hold-out réservoir
+
+# === BACKENDS ===
+
+
+def creer_modele(backend, n_estimators=100, max_depth=None, max_samples=None, n_jobs=-1, random_state=42):
+    if backend == "rf":
+        return RandomForestRegressor(
+            n_estimators=n_estimators, max_depth=max_depth, max_samples=max_samples,
+            n_jobs=n_jobs, random_state=random_state
+        )
+    if backend == "extratrees":
+        # max_samples n'a d'effet qu'avec bootstrap
+        return ExtraTreesRegressor(
+            n_estimators=n_estimators, max_depth=max_depth, bootstrap=max_samples is not None,
+            max_samples=max_samples, n_jobs=n_jobs, random_state=random_state
+        )
+    if backend == "hgb":
+        # Multi-thread via OpenMP ; n_estimators = nombre d'itérations de boosting
+        if max_samples is not None:
+            raise ValueError("max_samples n'existe pas pour hgb (pas de bootstrap).")
+        if n_jobs not in (-1, None):
+            warnings.warn("n_jobs ignoré par hgb : le nombre de threads se règle par OMP_NUM_THREADS.")
+        return HistGradientBoostingRegressor(max_iter=n_estimators, max_depth=max_depth, random_state=random_state)
+    raise ValueError(f"Backend inconnu : {backend} (attendu : {', '.join(BACKENDS)})")
+
+
+def charger_split():
+    # Fréquence, gain, TYPE, ATT_estimee, indicatrices et split 80/20 viennent
+    # de la table partagée (features.py), construite une seule fois
+    df_features = obtenir_features()
+    return features_modele(df_features.columns), jeu_modele(df_features, test=False), jeu_modele(df_features, test=True)
+
+
+def evaluer(model, X_train, y_train, X_test, y_test, mesurer_taille=False):
+    t0 = time.perf_counter()
+    model.fit(X_train, y_train)
+    t_fit = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    y_pred = model.predict(X_test)
+    t_predict = time.perf_counter() - t0
+    # Taille sérialisée : une copie complète du modèle, mesurée pour --benchmark seulement
+    taille = len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)) / 1e6 if mesurer_taille else None
+    return {
+        "fit_s": t_fit,
+        "predict_s": t_predict,
+        "taille_mo": taille,
+        "r2": r2_score(y_test, y_pred),
+        "rmse": np.sqrt(mean_squared_error(y_test, y_pred)),
+    }
+
+
+def sauver_modele(model):
+    # Modalités de TYPE vues à l'entraînement, gardées avec le modèle :
+    # predict.py n'estime pas les lignes d'un autre TYPE
+    model.modalites_type_ = np.asarray(modalites_type(scanner_features()), dtype=object)
+    joblib.dump(model, "resultats\\random_forest_att_model.pkl")
 
-df = pd.read_csv("resultats\\pci_associes_infos_corriges.csv", sep=",", low_memory=False)
-df_gain = pd.read_csv("ressources\\Gain.csv", sep=";")
-df_milieu = pd.read_csv("resultats\\type_de_milieu_par_point.csv", sep=";")
 
-# === DÉTECTION DES COLONNES COORDONNÉES ===
+# === ENTRAÎNEMENT HORS MÉMOIRE ===
 
-lat_col = [c for c in df.columns if "lat" in c.lower()][0]
-lon_col = [c for c in df.columns if "lon" in c.lower() or "lng" in c.lower()][0]
+def _reservoir(indices, taille, rng):
+    # Algorithme R vectorisé : la ligne d'indice global i (0-based) prend une
+    # case au hasard avec probabilité taille / (i + 1). Renvoie la case de
+    # chaque ligne du chunk, -1 si elle part à l'entraînement.
+    cases = np.full(len(indices), -1, dtype=np.int64)
+    remplissage = indices < taille
+    cases[remplissage] = indices[remplissage]
+    tirages = rng.integers(0, indices[~remplissage] + 1)
+    cases[np.flatnonzero(~remplissage)[tirages < taille]] = tirages[tirages < taille]
+    return cases
 
-# === AJOUT FREQUENCE + GAIN ===
 
-df["frequence"] = df["band_table"].astype(str).str.extract(r"(\d+)")[0]
-df = df[df["frequence"].notna()]
-df["frequence"] = df["frequence"].astype(int)
-gain_dict = dict(zip(df_gain["Frequence"], df_gain["Gain"]))
-df["Gr"] = df["frequence"].map(gain_dict)
+def entrainer_par_chunks(backend, options, taille_chunk=TAILLE_CHUNK, taille_holdout=TAILLE_HOLDOUT, graine=42):
+    if backend == "hgb":
+        # fit (même en warm_start) réajuste les classes d'histogramme sur le
+        # chunk courant : les itérations précédentes seraient évaluées sur
+        # d'autres classes que celles de leur entraînement
+        raise ValueError("--hors-memoire n'accepte que les forêts (rf, extratrees), pas hgb.")
+    # Côté entraînement du split seulement : le jeu de test (predict.py) reste
+    # inédit, le hold-out réservoir est tiré parmi les lignes d'entraînement
+    lf = scanner_features().filter(pl.col("exploitable") & ~pl.col("test"))
+    features = features_modele(lf.collect_schema().names())
+    n_lignes = lf.select(pl.len()).collect().item()
+    if n_lignes <= taille_holdout:
+        raise ValueError(f"{n_lignes} lignes d'entraînement, pas assez pour un hold-out de {taille_holdout}.")
 
-# === AJOUT TYPE DE MILIEU ===
+    # Arbres (ou itérations de boosting) ajoutés à chaque chunk pour
+    # atteindre à peu près n_estimators au total
+    par_chunk = max(1, math.ceil(options["n_estimators"] * taille_chunk / n_lignes))
+    model = creer_modele(backend, **options)
+    model.set_params(warm_start=True, n_estimators=0)
 
-df = df.merge(df_milieu[["STA_NM_ANFR", "TYPE"]], on="STA_NM_ANFR", how="left")
+    rng = np.random.default_rng(graine)
+    holdout_X = np.empty((taille_holdout, len(features)))
+    holdout_y = np.empty(taille_holdout)
+    vus, t_fit = 0, 0.0
+    for chunk in iterer_chunks(lf.select(features + ["ATT_estimee"]), taille_chunk):
+        X = chunk.select(features).to_numpy().astype(np.float64)
+        y = chunk["ATT_estimee"].to_numpy()
+        cases = _reservoir(vus + np.arange(chunk.height), taille_holdout, rng)
+        occupees = min(vus, taille_holdout)  # cases remplies avant ce chunk
+        vus += chunk.height
 
-# === NETTOYAGE ===
+        # Plusieurs lignes du chunk sur la même case : la dernière l'emporte.
+        # Les lignes évincées du hold-out (anciennes occupantes ou lignes du
+        # chunk écrasées) retournent à l'entraînement : aucune n'est perdue.
+        retenues = np.flatnonzero(cases >= 0)[::-1]
+        cases_uniques, premieres = np.unique(cases[retenues], return_index=True)
+        evincees = cases_uniques[cases_uniques < occupees]
+        X_evincees, y_evincees = holdout_X[evincees], holdout_y[evincees]
+        holdout_X[cases_uniques] = X[retenues[premieres]]
+        holdout_y[cases_uniques] = y[retenues[premieres]]
 
-df = df.dropna(subset=[
-    "tm_dbm", "EMR_NB_PUISSANCE", "Gr", "TYPE",
-    "distance_to_support_km", "angle_vers_antenne", lat_col, lon_col
-])
+        entrainement = np.ones(chunk.height, dtype=bool)
+        entrainement[retenues[premieres]] = False
+        X_fit = np.concatenate([X[entrainement], X_evincees])
+        y_fit = np.concatenate([y[entrainement], y_evincees])
+        if len(y_fit) == 0:
+            continue
+        model.set_params(n_estimators=model.n_estimators + par_chunk)
+        t0 = time.perf_counter()
+        model.fit(pd.DataFrame(X_fit, columns=features), y_fit)
+        t_fit += time.perf_counter() - t0
+        print(f"  {vus:>12,} lignes lues, {model.n_estimators} n_estimators")
 
-# === ATTENUATION ===
+    X_holdout = pd.DataFrame(holdout_X, columns=features)
+    t0 = time.perf_counter()
+    y_pred = model.predict(X_holdout)
+    t_predict = time.perf_counter() - t0
+    return model, {
+        "fit_s": t_fit,
+        "predict_s": t_predict,
+        "r2": r2_score(holdout_y, y_pred),
+        "rmse": np.sqrt(mean_squared_error(holdout_y, y_pred)),
+    }
 
-df["ATT_estimee"] = df["EMR_NB_PUISSANCE"] + df["Gr"] - df["tm_dbm"]
 
-# === ENCODAGE TYPE ===
+def _max_samples(valeur):
+    # Fraction (0.5, 1.0) ou nombre de lignes (200000, 2e5)
+    try:
+        return int(valeur)
+    except ValueError:
+        nombre = float(valeur)
+    return int(nombre) if nombre > 1 and nombre.is_integer() else nombre
 
-df_encoded = pd.get_dummies(df, columns=["TYPE"], drop_first=True)
 
-# === SPLIT 80/20 (RÉINITIALISÉ) ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entraînement du modèle d'atténuation.")
+    parser.add_argument("--backend", choices=BACKENDS, default="rf")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--max-samples", type=_max_samples, default=None,
+                        help="échantillon bootstrap par arbre : fraction (0.5) ou nombre de lignes")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--benchmark", action="store_true", help="compare les backends sans sauver de modèle")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="backends comparés par --benchmark")
+    parser.add_argument("--hors-memoire", action="store_true", help="lecture par chunks, hold-out réservoir")
+    parser.add_argument("--taille-chunk", type=int, default=TAILLE_CHUNK)
+    parser.add_argument("--taille-holdout", type=int, default=TAILLE_HOLDOUT)
+    parser.add_argument("--recherche", metavar="GRILLE", help='grille évaluée par blocs spatiaux, ex. "max_depth=None,20"')
+    parser.add_argument("--blocs", choices=["tuile", "station"], default="tuile", help="blocs de --recherche")
+    parser.add_argument("--plis", type=int, default=5)
+    args = parser.parse_args()
+    options = dict(n_estimators=args.n_estimators, max_depth=args.max_depth,
+                   max_samples=args.max_samples, n_jobs=args.n_jobs)
 
-df_encoded = df_encoded.sample(frac=1, random_state=42).reset_index(drop=True)
-split_index = int(0.8 * len(df_encoded))
-df_train = df_encoded.iloc[:split_index]
-df_test = df_encoded.iloc[split_index:]
+    if args.recherche:
+        # === RECHERCHE PAR BLOCS SPATIAUX ===
 
-# === FEATURES ===
+        from validation_spatiale import CHEMIN_RAPPORT, TAILLE_TUILE_DEG, lire_grille, recherche
+        # --n-estimators, --max-depth et --max-samples valent pour les paramètres absents de la grille
+        df_plis, resume = recherche(lire_grille(args.recherche), args.backend, args.blocs, TAILLE_TUILE_DEG,
+                                    args.plis, args.n_jobs,
+                                    defauts={nom: v for nom, v in options.items() if nom != "n_jobs"})
+        with pl.Config(tbl_rows=-1, tbl_cols=-1):
+            print(resume)
+        print(f"Résultats par pli : {CHEMIN_RAPPORT}")
 
-base_features = [
-    "distance_to_support_km",
-    "frequence",
-    "EMR_NB_PUISSANCE",
-    "Gr",
-    "angle_vers_antenne",
-]
-type_features = [col for col in df_encoded.columns if col.startswith("TYPE_")]
-features = base_features + type_features
+    elif args.hors_memoire:
+        # === ENTRAÎNEMENT PAR CHUNKS ===
 
-X_train = df_train[features]
-y_train = df_train["ATT_estimee"]
+        print("Entraînement hors mémoire...")
+        model, r = entrainer_par_chunks(args.backend, options, args.taille_chunk, args.taille_holdout)
+        print("R² (hold-out) :", round(r["r2"], 3))
+        print("RMSE (hold-out) :", round(r["rmse"], 2))
+        print(f"Entraînement : {r['fit_s']:.1f} s, prédiction : {r['predict_s']:.1f} s")
+        sauver_modele(model)
+        print("Modèle sauvegardé : random_forest_att_model.pkl")
 
-# === ENTRAÎNEMENT ===
+    elif args.benchmark:
+        # === BENCHMARK ===
 
-model = RandomForestRegressor(n_estimators=100, random_state=42)
-model.fit(X_train, y_train)
+        features, df_train, df_test = charger_split()
+        X_train, y_train = df_train[features], df_train["ATT_estimee"]
+        X_test_eval, y_test_eval = df_test[features], df_test["ATT_estimee"]
+        print(f"{len(X_train)} lignes d'entraînement, {len(X_test_eval)} de test")
+        print(f"{'backend':<11s} {'fit (s)':>9s} {'predict (s)':>12s} {'taille (Mo)':>12s} {'R²':>7s} {'RMSE':>7s}")
+        for backend in args.backends.split(","):
+            r = evaluer(creer_modele(backend, **options), X_train, y_train, X_test_eval, y_test_eval, mesurer_taille=True)
+            print(f"{backend:<11s} {r['fit_s']:9.2f} {r['predict_s']:12.2f} {r['taille_mo']:12.1f} "
+                  f"{r['r2']:7.3f} {r['rmse']:7.2f}")
 
-# === ÉVALUATION ===
+    else:
+        # === ENTRAÎNEMENT ET ÉVALUATION ===
 
-X_test_eval = df_test[features]
-y_test_eval = df_test["ATT_estimee"]
-y_pred = model.predict(X_test_eval)
+        features, df_train, df_test = charger_split()
+        X_train, y_train = df_train[features], df_train["ATT_estimee"]
+        X_test_eval, y_test_eval = df_test[features], df_test["ATT_estimee"]
+        model = creer_modele(args.backend, **options)
+        r = evaluer(model, X_train, y_train, X_test_eval, y_test_eval)
 
-print("R² :", round(r2_score(y_test_eval, y_pred), 3))
-print("RMSE :", round(np.sqrt(mean_squared_error(y_test_eval, y_pred)), 2))
+        print("R² :", round(r["r2"], 3))
+        print("RMSE :", round(r["rmse"], 2))
+        print(f"Entraînement : {r['fit_s']:.1f} s, prédiction : {r['predict_s']:.1f} s")
 
-# === EXPORT DU MODÈLE ===
+        # === EXPORT DU MODÈLE ===
 
-joblib.dump(model, "resultats\\random_forest_att_model.pkl")
-print("Modèle sauvegardé : random_forest_att_model.pkl")
+        sauver_modele(model)
+        print("Modèle sauvegardé : random_forest_att_model.pkl")
 
-# === EXPORT DU TEST SET AVEC COORDONNÉES ===
+        # === EXPORT DU TEST SET AVEC COORDONNÉES ===
 
-coords = df[[lat_col, lon_col]].reset_index(drop=True)
-df_test_export = df_test.copy()
-df_test_export["Latitude"] = coords.iloc[df_test.index][lat_col].values
-df_test_export["Longitude"] = coords.iloc[df_test.index][lon_col].values
-df_test_export[features + ["Latitude", "Longitude"]].to_csv("resultats\\data_testset_for_heatmap.csv", index=False)
-print("Test set sauvegardé : data_testset_for_heatmap.csv")
+        df_test_export = df_test.rename(columns={"latitude": "Latitude", "longitude": "Longitude"})
+        df_test_export[["measurement_id"] + features + ["Latitude", "Longitude"]].to_csv("resultats\\data_testset_for_heatmap.csv", index=False)
+        print("Test set sauvegardé : data_testset_for_heatmap.csv")
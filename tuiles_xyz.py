@@ -0,0 +1,320 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Pyramide de tuiles XYZ (z/x/y.png, Web Mercator, 256 px) pour tm_dbm,
+# ATT_estimee (prédite par predict.py) et PL, lisible par n'importe quel
+# visualiseur de tuiles local (Leaflet, OpenLayers, QGIS « XYZ Tiles » sur
+# file:///.../tuiles/{couche}/{z}/{x}/{y}.png). Chaque tuile est la même
+# agrégation datashader que graph5_heatmap.py (moyenne par pixel), avec une
+# échelle de couleur fixe par couche pour que les tuiles voisines se raccordent.
+# Les mesures sont triées une fois selon la clé de Morton de leur tuile au zoom
+# maximal : chaque tuile, à tous les zooms, est alors une tranche contiguë du
+# tableau. Une empreinte de chaque tranche (somme de hash de lignes) est gardée
+# dans le manifeste, par couche et par zoom ; seules les tuiles dont
+# l'empreinte a changé sont redessinées, en parallèle. Un rendu limité à
+# quelques zooms (--zoom 8-8) ne touche pas aux tuiles des autres zooms. Les
+# échelles sont fixées au premier rendu (quantiles 2-98 %) et conservées ensuite.
+# Usage : python tuiles_xyz.py --zoom 5-12 --workers 8
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import polars as pl
+
+from features import scanner_features
+from predict import CHEMIN_SORTIE_LOTS
+
+# === PARAMÈTRES ===
+VERSION_TUILES = 2
+DOSSIER_TUILES = os.path.join("visualisations", "tuiles")
+ZOOM_MIN, ZOOM_MAX = 5, 12
+TAILLE_TUILE = 256
+COUCHES = ["tm_dbm", "ATT_estimee", "PL"]
+QUANTILES_ECHELLE = (0.02, 0.98)
+POINTS_PAR_TACHE = 1_000_000  # tuiles consécutives regroupées jusqu'à cette taille
+TUILES_PAR_TACHE = 256
+TACHES_EN_VOL = 2  # tâches soumises d'avance par worker
+
+R_MERCATOR = 6378137.0
+DEMI_MONDE = math.pi * R_MERCATOR
+LAT_MERCATOR = 85.05112878
+
+
+# === PROJECTION ET TUILES ===
+def mercator(lat, lon):
+    lat = np.clip(lat, -LAT_MERCATOR, LAT_MERCATOR)
+    x = R_MERCATOR * np.radians(lon)
+    y = R_MERCATOR * np.log(np.tan(math.pi / 4 + np.radians(lat) / 2))
+    return x, y
+
+
+def indices_tuiles(x, y, zoom):
+    # Colonne / ligne de tuile (ligne 0 au nord), comme le schéma XYZ
+    n = 2 ** zoom
+    tx = np.floor((x + DEMI_MONDE) / (2 * DEMI_MONDE) * n)
+    ty = np.floor((DEMI_MONDE - y) / (2 * DEMI_MONDE) * n)
+    return np.clip(tx, 0, n - 1).astype(np.uint64), np.clip(ty, 0, n - 1).astype(np.uint64)
+
+
+def bornes_tuile(zoom, tx, ty):
+    taille = 2 * DEMI_MONDE / 2 ** zoom
+    x0 = -DEMI_MONDE + tx * taille
+    y1 = DEMI_MONDE - ty * taille
+    return x0, y1 - taille, x0 + taille, y1
+
+
+def _entrelacer(v):
+    # Bits de v (< 2^32) écartés d'un rang : ...b2 0 b1 0 b0
+    v = v & 0xFFFFFFFF
+    v = (v | (v << 16)) & 0x0000FFFF0000FFFF
+    v = (v | (v << 8)) & 0x00FF00FF00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F0F0F0F0F
+    v = (v | (v << 2)) & 0x3333333333333333
+    return (v | (v << 1)) & 0x5555555555555555
+
+
+def cle_morton(tx, ty):
+    # Les 4 sous-tuiles d'une tuile ont la clé du parent suivie de 2 bits :
+    # cle >> 2 * k donne la tuile k zooms plus haut
+    return _entrelacer(tx) | (_entrelacer(ty) << 1)
+
+
+def chemin_tuile(dossier, couche, zoom, tx, ty):
+    return os.path.join(dossier, couche, str(zoom), str(tx), f"{ty}.png")
+
+
+# === EMPREINTES ===
+def _melanger(v):
+    # splitmix64, vectorisé (les dépassements uint64 bouclent)
+    v = v + 0x9E3779B97F4A7C15
+    v = (v ^ (v >> 30)) * 0xBF58476D1CE4E5B9
+    v = (v ^ (v >> 27)) * 0x94D049BB133111EB
+    return v ^ (v >> 31)
+
+
+def hash_lignes(*colonnes):
+    h = np.zeros(len(colonnes[0]), dtype=np.uint64)
+    for colonne in colonnes:
+        h = _melanger(h ^ np.ascontiguousarray(colonne, dtype=np.float64).view(np.uint64))
+    return h
+
+
+# === DONNÉES ===
+def charger_points(chemin_predictions=CHEMIN_SORTIE_LOTS):
+    # tm_dbm de la table de features ; ATT_estimee des prédictions par lots
+    # (rattachées par measurement_id) et PL calculé comme resultatsPL.py
+    lf = scanner_features().select(["measurement_id", "latitude", "longitude", "tm_dbm", "Gr", "EMR_NB_PUISSANCE"])
+    if os.path.exists(chemin_predictions):
+        lf = lf.join(
+            pl.scan_csv(chemin_predictions).select(["measurement_id", "ATT_estimee"]),
+            on="measurement_id", how="left"
+        )
+    else:
+        print(f"{chemin_predictions} absent : couches ATT_estimee et PL vides (lancer predict.py --entree).")
+        lf = lf.with_columns(pl.lit(None, dtype=pl.Float64).alias("ATT_estimee"))
+    return lf.with_columns(
+        (pl.col("tm_dbm") - pl.col("ATT_estimee") + pl.col("Gr") - pl.col("EMR_NB_PUISSANCE")).alias("PL")
+    ).filter(
+        pl.col("latitude").is_not_null() & pl.col("longitude").is_not_null()
+    ).select(["latitude", "longitude"] + COUCHES).collect()
+
+
+# === WORKER ===
+def _rendre_tache(x, y, valeurs, tuiles, echelles, dossier):
+    # tuiles : (zoom, tx, ty, debut, fin, couches), debut/fin relatifs à la tâche
+    import colorcet
+    import datashader as ds
+    import datashader.transfer_functions as tf
+    import pandas as pd
+
+    df = pd.DataFrame({"x": x, "y": y, **valeurs})
+    n_images = 0
+    for zoom, tx, ty, debut, fin, couches in tuiles:
+        x0, y0, x1, y1 = bornes_tuile(zoom, tx, ty)
+        cvs = ds.Canvas(plot_width=TAILLE_TUILE, plot_height=TAILLE_TUILE, x_range=(x0, x1), y_range=(y0, y1))
+        partition = df.iloc[debut:fin]
+        for couche in couches:
+            agg = cvs.points(partition, "x", "y", ds.mean(couche))
+            img = tf.shade(agg, cmap=colorcet.fire, span=echelles[couche], how="linear")
+            chemin = chemin_tuile(dossier, couche, zoom, tx, ty)
+            os.makedirs(os.path.dirname(chemin), exist_ok=True)
+            img.to_pil().save(chemin + ".tmp", format="PNG")
+            os.replace(chemin + ".tmp", chemin)
+            n_images += 1
+    return n_images
+
+
+def _taches(tuiles, taille_max=POINTS_PAR_TACHE):
+    # Tuiles consécutives d'un même zoom (tranches contiguës) regroupées
+    tache = []
+    for tuile in tuiles:
+        if tache and (tuile[0] != tache[0][0] or tuile[4] - tache[0][3] > taille_max
+                      or len(tache) >= TUILES_PAR_TACHE):
+            yield tache
+            tache = []
+        tache.append(tuile)
+    if tache:
+        yield tache
+
+
+# === PYRAMIDE ===
+def _lire_manifeste(dossier):
+    chemin = os.path.join(dossier, "manifeste.json")
+    if os.path.exists(chemin):
+        with open(chemin, encoding="utf-8") as f:
+            manifeste = json.load(f)
+        if manifeste["version"] == VERSION_TUILES and manifeste["taille"] == TAILLE_TUILE:
+            return manifeste
+    # couches : {couche: {zoom: {"echelle": [min, max], "tuiles": {"x/y": empreinte}}}}
+    return {"version": VERSION_TUILES, "taille": TAILLE_TUILE, "echelles": {}, "couches": {}}
+
+
+def construire_pyramide(df, dossier=DOSSIER_TUILES, zoom_min=ZOOM_MIN, zoom_max=ZOOM_MAX,
+                        workers=os.cpu_count(), recalculer_echelles=False):
+    if df.height == 0:
+        raise ValueError("Aucune mesure à placer sur les tuiles.")
+    t0 = time.perf_counter()
+    manifeste = _lire_manifeste(dossier)
+
+    # Échelles de couleur : celles du manifeste, sinon quantiles des données
+    # (un zoom dessiné avec une autre échelle est entièrement redessiné)
+    echelles = {}
+    for couche in COUCHES:
+        ancienne = manifeste["echelles"].get(couche)
+        serie = df[couche].drop_nans().drop_nulls()
+        if ancienne is not None and not recalculer_echelles:
+            echelles[couche] = tuple(ancienne)
+        elif len(serie):
+            echelles[couche] = tuple(float(serie.quantile(q)) for q in QUANTILES_ECHELLE)
+    zooms = [str(zoom) for zoom in range(zoom_min, zoom_max + 1)]
+
+    # Tri des mesures par clé de Morton au zoom maximal
+    x, y = mercator(df["latitude"].to_numpy(), df["longitude"].to_numpy())
+    tx, ty = indices_tuiles(x, y, zoom_max)
+    cles = cle_morton(tx, ty)
+    ordre = np.argsort(cles, kind="stable")
+    x, y, tx, ty, cles = x[ordre], y[ordre], tx[ordre], ty[ordre], cles[ordre]
+    valeurs = {c: df[c].to_numpy()[ordre].astype(np.float64) for c in COUCHES if c in echelles}
+    lat = df["latitude"].to_numpy()[ordre]
+    lon = df["longitude"].to_numpy()[ordre]
+    hashes = {c: hash_lignes(lat, lon, v) for c, v in valeurs.items()}
+    presentes = {c: (~np.isnan(v)).astype(np.int64) for c, v in valeurs.items()}
+
+    # Empreinte de chaque tuile (somme des hash de ses lignes, nombre de
+    # valeurs) et liste des tuiles à redessiner
+    a_rendre = []
+    empreintes = {c: {z: {"echelle": list(echelles[c]), "tuiles": {}} for z in zooms} for c in valeurs}
+    for zoom in range(zoom_min, zoom_max + 1):
+        decalage = 2 * (zoom_max - zoom)
+        cles_zoom = cles >> decalage
+        debuts = np.flatnonzero(np.r_[True, cles_zoom[1:] != cles_zoom[:-1]])
+        fins = np.r_[debuts[1:], len(cles)]
+        txz, tyz = tx[debuts] >> (decalage // 2), ty[debuts] >> (decalage // 2)
+        sommes = {c: np.add.reduceat(h, debuts) for c, h in hashes.items()}
+        comptes = {c: np.add.reduceat(p, debuts) for c, p in presentes.items()}
+        precedents = {c: manifeste["couches"].get(c, {}).get(str(zoom), {}) for c in valeurs}
+        anciennes = {c: precedents[c].get("tuiles", {}) if precedents[c].get("echelle") == list(echelles[c]) else {}
+                     for c in valeurs}
+        for i in range(len(debuts)):
+            couches = []
+            for c in valeurs:
+                if comptes[c][i] == 0:
+                    continue
+                nom = f"{txz[i]}/{tyz[i]}"
+                empreinte = f"{sommes[c][i]:016x}-{comptes[c][i]}"
+                empreintes[c][str(zoom)]["tuiles"][nom] = empreinte
+                if (anciennes[c].get(nom) != empreinte
+                        or not os.path.exists(chemin_tuile(dossier, c, zoom, txz[i], tyz[i]))):
+                    couches.append(c)
+            if couches:
+                a_rendre.append((zoom, int(txz[i]), int(tyz[i]), int(debuts[i]), int(fins[i]), couches))
+
+    # Rendu parallèle (spawn : le lecteur Polars tourne déjà sur des threads)
+    n_images = 0
+    contexte = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=contexte) as pool:
+        en_vol = []
+        for tache in _taches(a_rendre):
+            debut, fin = tache[0][3], tache[-1][4]
+            locales = [(z, i, j, d - debut, f - debut, c) for z, i, j, d, f, c in tache]
+            couches = sorted({c for *_, cs in tache for c in cs})
+            en_vol.append(pool.submit(
+                _rendre_tache, x[debut:fin], y[debut:fin], {c: valeurs[c][debut:fin] for c in couches},
+                locales, echelles, dossier
+            ))
+            if len(en_vol) >= TACHES_EN_VOL * workers:
+                n_images += en_vol.pop(0).result()
+        for future in en_vol:
+            n_images += future.result()
+
+    # Tuiles devenues vides aux zooms rendus : retirées. Les autres zooms
+    # gardent leurs tuiles et leurs entrées du manifeste.
+    n_retirees = 0
+    couches = {}
+    for c, par_zoom in manifeste["couches"].items():
+        for zoom, precedent in par_zoom.items():
+            if zoom not in zooms:
+                couches.setdefault(c, {})[zoom] = precedent
+                continue
+            for nom in set(precedent["tuiles"]) - set(empreintes.get(c, {}).get(zoom, {}).get("tuiles", {})):
+                i, j = nom.split("/")
+                chemin = chemin_tuile(dossier, c, zoom, i, j)
+                if os.path.exists(chemin):
+                    os.remove(chemin)
+                    n_retirees += 1
+    for c, par_zoom in empreintes.items():
+        couches.setdefault(c, {}).update(par_zoom)
+
+    os.makedirs(dossier, exist_ok=True)
+    manifeste["echelles"] = {c: list(e) for c, e in echelles.items()}
+    manifeste["couches"] = couches
+    with open(os.path.join(dossier, "manifeste.json.tmp"), "w", encoding="utf-8") as f:
+        json.dump(manifeste, f)
+    os.replace(os.path.join(dossier, "manifeste.json.tmp"), os.path.join(dossier, "manifeste.json"))
+
+    n_total = sum(len(e["tuiles"]) for par_zoom in empreintes.values() for e in par_zoom.values())
+    return n_images, n_total - n_images, n_retirees, time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pyramide de tuiles XYZ (tm_dbm, ATT_estimee, PL).")
+    parser.add_argument("--zoom", default=f"{ZOOM_MIN}-{ZOOM_MAX}", help="ex. 5-12")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--predictions", default=CHEMIN_SORTIE_LOTS, help="sortie de predict.py --entree")
+    parser.add_argument("--dossier", default=DOSSIER_TUILES)
+    parser.add_argument("--recalculer-echelles", action="store_true", help="échelles de couleur tirées des données actuelles")
+    args = parser.parse_args()
+
+    zoom_min, zoom_max = (int(z) for z in args.zoom.split("-"))
+    df = charger_points(args.predictions)
+    n_images, n_inchangees, n_retirees, duree = construire_pyramide(
+        df, args.dossier, zoom_min, zoom_max, args.workers, args.recalculer_echelles
+    )
+    print(f"✅ Tuiles : {n_images} image(s) rendue(s), {n_inchangees} inchangée(s), {n_retirees} retirée(s) "
+          f"en {duree:.1f} s : {args.dossier}")
@@ -0,0 +1,238 @@
+
+# MIT License
+#
+# Copyright (c) 2025 Mathieu Witkowski, Clément Poucet, Hans Pohlmann
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Validation croisée par blocs spatiaux et recherche d'hyperparamètres. Les
+# mesures voisines sont très corrélées : un split aléatoire met des points
+# quasi identiques des deux côtés et gonfle le R². Ici chaque pli retient des
+# blocs entiers, tuiles lat/lon ou stations (STA_NM_ANFR). Les matrices de
+# chaque pli sont écrites une fois en .npy (float32, le type interne des
+# arbres sklearn : fit les lit par memory-map sans copie) et la grille est
+# évaluée en parallèle avec joblib, une tâche par (combinaison, pli).
+# Usage : python validation_spatiale.py --blocs tuile --taille-tuile 0.1 --plis 5
+#                 --grille "n_estimators=100,300;max_depth=None,20;max_samples=None,0.5"
+
+import argparse
+import inspect
+import itertools
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import polars as pl
+from joblib import Parallel, delayed
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import GroupKFold
+from threadpoolctl import threadpool_limits
+
+from cache_tables import empreinte_fichier, source_a_jour
+from features import CHEMIN_FEATURES, features_modele, obtenir_features
+
+# === PARAMÈTRES ===
+VERSION_PLIS = 1
+DOSSIER_PLIS = os.path.join("cache", "plis_spatiaux")
+N_PLIS = 5
+TAILLE_TUILE_DEG = 0.1  # ~11 km en latitude
+CHEMIN_RAPPORT = "resultats\\recherche_spatiale.csv"
+
+
+# === BLOCS ET PLIS ===
+def blocs_spatiaux(df, mode="tuile", taille_tuile=TAILLE_TUILE_DEG):
+    # Identifiant de bloc de chaque ligne : tuile lat/lon ou station
+    if mode == "tuile":
+        return df.select(
+            pl.concat_str([
+                (pl.col("latitude") / taille_tuile).floor().cast(pl.Int64),
+                (pl.col("longitude") / taille_tuile).floor().cast(pl.Int64),
+            ], separator="_")
+        ).to_series().to_numpy()
+    if mode == "station":
+        return df["STA_NM_ANFR"].fill_null("").to_numpy()
+    raise ValueError(f"Blocs inconnus : {mode} (attendu : tuile, station)")
+
+
+def _dossier_plis(mode, taille_tuile, n_plis, dossier=DOSSIER_PLIS):
+    nom = f"{mode}_{taille_tuile:g}_{n_plis}" if mode == "tuile" else f"{mode}_{n_plis}"
+    return os.path.join(dossier, nom)
+
+
+def construire_plis(mode="tuile", taille_tuile=TAILLE_TUILE_DEG, n_plis=N_PLIS, dossier=DOSSIER_PLIS):
+    source = empreinte_fichier(CHEMIN_FEATURES)
+    df = obtenir_features().filter(pl.col("exploitable"))
+    features = features_modele(df.columns)
+    X = df.select(features).to_numpy().astype(np.float32)
+    y = df["ATT_estimee"].to_numpy().astype(np.float64)
+    groupes = blocs_spatiaux(df, mode, taille_tuile)
+    if len(np.unique(groupes)) < n_plis:
+        raise ValueError(f"{len(np.unique(groupes))} blocs pour {n_plis} plis : réduire la taille des tuiles.")
+
+    dossier = _dossier_plis(mode, taille_tuile, n_plis, dossier)
+    tmp = dossier + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    tailles = []
+    for pli, (entrainement, test) in enumerate(GroupKFold(n_splits=n_plis).split(X, y, groupes)):
+        for nom, tableau in [("X_train", X[entrainement]), ("y_train", y[entrainement]),
+                             ("X_test", X[test]), ("y_test", y[test])]:
+            np.save(os.path.join(tmp, f"pli{pli}_{nom}.npy"), np.ascontiguousarray(tableau))
+        tailles.append([len(entrainement), len(test)])
+    with open(os.path.join(tmp, "manifeste.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": VERSION_PLIS, "source": source, "features": features,
+            "mode": mode, "taille_tuile": taille_tuile, "n_plis": n_plis,
+            "n_blocs": int(len(np.unique(groupes))), "tailles": tailles,
+        }, f, indent=2)
+
+    shutil.rmtree(dossier, ignore_errors=True)
+    os.replace(tmp, dossier)
+    return dossier
+
+
+def charger_plis(mode="tuile", taille_tuile=TAILLE_TUILE_DEG, n_plis=N_PLIS, dossier=DOSSIER_PLIS):
+    # Renvoie (dossier, manifeste) si les plis sont à jour de la table de features
+    dossier = _dossier_plis(mode, taille_tuile, n_plis, dossier)
+    chemin_manifeste = os.path.join(dossier, "manifeste.json")
+    if not os.path.exists(chemin_manifeste):
+        raise ValueError(f"Plis absents : {dossier}")
+    with open(chemin_manifeste, encoding="utf-8") as f:
+        manifeste = json.load(f)
+    if manifeste["version"] != VERSION_PLIS:
+        raise ValueError(f"Plis en version {manifeste['version']}, attendu {VERSION_PLIS}.")
+    mtime_ns = manifeste["source"]["mtime_ns"]
+    if not os.path.exists(CHEMIN_FEATURES) or not source_a_jour(CHEMIN_FEATURES, manifeste["source"]):
+        raise ValueError("Plis périmés : la table de features a changé depuis leur construction.")
+    if manifeste["source"]["mtime_ns"] != mtime_ns:
+        with open(chemin_manifeste, "w", encoding="utf-8") as f:
+            json.dump(manifeste, f, indent=2)
+    return dossier, manifeste
+
+
+def obtenir_plis(mode="tuile", taille_tuile=TAILLE_TUILE_DEG, n_plis=N_PLIS, dossier=DOSSIER_PLIS):
+    try:
+        return charger_plis(mode, taille_tuile, n_plis, dossier)
+    except ValueError as e:
+        print(f"{e} Construction des plis...")
+        construire_plis(mode, taille_tuile, n_plis, dossier)
+        return charger_plis(mode, taille_tuile, n_plis, dossier)
+
+
+# === RECHERCHE ===
+def lire_grille(texte):
+    # "n_estimators=100,300;max_depth=None,20" -> liste de dicts
+    def valeur(v):
+        if v == "None":
+            return None
+        for type_ in (int, float):
+            try:
+                return type_(v)
+            except ValueError:
+                pass
+        return v  # ex. max_features=sqrt
+
+    axes = {}
+    for bloc in filter(None, texte.split(";")):
+        nom, valeurs = bloc.split("=")
+        axes[nom.strip()] = [valeur(v.strip()) for v in valeurs.split(",")]
+    return [dict(zip(axes, combinaison)) for combinaison in itertools.product(*axes.values())]
+
+
+def _options_creer_modele():
+    from trainRandomForest import creer_modele
+    return [nom for nom in inspect.signature(creer_modele).parameters if nom not in ("backend", "n_jobs")]
+
+
+def verifier_grille(grille, backend):
+    # Clés acceptées : options de creer_modele (n_estimators, max_depth...) ou
+    # paramètres de l'estimateur (get_params), sauf n_jobs fixé par la recherche
+    from trainRandomForest import creer_modele
+    connues = (set(_options_creer_modele()) | set(creer_modele(backend).get_params())) - {"n_jobs"}
+    inconnues = sorted({nom for params in grille for nom in params} - connues)
+    if inconnues:
+        raise ValueError(f"Paramètre(s) inconnu(s) pour {backend} : {', '.join(inconnues)} "
+                         f"(attendu : {', '.join(sorted(connues))})")
+
+
+def _evaluer_pli(dossier, pli, backend, params):
+    from trainRandomForest import creer_modele
+
+    def lire(nom):
+        return np.load(os.path.join(dossier, f"pli{pli}_{nom}.npy"), mmap_mode="r")
+
+    # Un seul cœur par modèle : le parallélisme est porté par la grille (hgb
+    # n'a pas de n_jobs, ses threads OpenMP sont bornés par threadpool_limits).
+    # Les autres paramètres de l'estimateur sont appliqués par set_params.
+    options = {nom: v for nom, v in params.items() if nom in _options_creer_modele()}
+    model = creer_modele(backend, n_jobs=None if backend == "hgb" else 1, **options)
+    model.set_params(**{nom: v for nom, v in params.items() if nom not in options})
+    with threadpool_limits(limits=1):
+        t0 = time.perf_counter()
+        model.fit(lire("X_train"), lire("y_train"))
+        t_fit = time.perf_counter() - t0
+        y_test = lire("y_test")
+        y_pred = model.predict(lire("X_test"))
+    return {
+        "backend": backend, **{k: str(v) for k, v in params.items()}, "pli": pli,
+        "n_test": len(y_test), "fit_s": t_fit,
+        "r2": r2_score(y_test, y_pred), "rmse": float(np.sqrt(mean_squared_error(y_test, y_pred))),
+    }
+
+
+def recherche(grille, backend="rf", mode="tuile", taille_tuile=TAILLE_TUILE_DEG, n_plis=N_PLIS, n_jobs=-1,
+              chemin_rapport=CHEMIN_RAPPORT, defauts=None):
+    # defauts : valeurs des paramètres absents de la grille (options de la ligne de commande)
+    grille = [{**(defauts or {}), **params} for params in grille]
+    verifier_grille(grille, backend)
+    dossier, manifeste = obtenir_plis(mode, taille_tuile, n_plis)
+    print(f"{manifeste['n_blocs']} blocs ({mode}), {n_plis} plis, {len(grille)} combinaison(s) : "
+          f"{len(grille) * n_plis} entraînements")
+    taches = [delayed(_evaluer_pli)(dossier, pli, backend, params) for params in grille for pli in range(n_plis)]
+    resultats = Parallel(n_jobs=n_jobs, verbose=5)(taches)
+
+    # Une ligne par (combinaison, pli), puis la moyenne par combinaison
+    df = pl.DataFrame(resultats)
+    df.write_csv(chemin_rapport)
+    parametres = ["backend"] + list(grille[0])
+    resume = df.group_by(parametres, maintain_order=True).agg(
+        pl.col("r2").mean().alias("r2_moyen"), pl.col("r2").std().alias("r2_ecart_type"),
+        pl.col("rmse").mean().alias("rmse_moyen"), pl.col("rmse").std().alias("rmse_ecart_type"),
+        pl.col("fit_s").sum().alias("fit_s_total"),
+    ).sort("rmse_moyen")
+    return df, resume
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validation croisée par blocs spatiaux et recherche d'hyperparamètres.")
+    parser.add_argument("--backend", default="rf")
+    parser.add_argument("--blocs", choices=["tuile", "station"], default="tuile")
+    parser.add_argument("--taille-tuile", type=float, default=TAILLE_TUILE_DEG, help="côté des tuiles en degrés")
+    parser.add_argument("--plis", type=int, default=N_PLIS)
+    parser.add_argument("--grille", default="n_estimators=100", help='ex. "n_estimators=100,300;max_depth=None,20"')
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    df, resume = recherche(lire_grille(args.grille), args.backend, args.blocs, args.taille_tuile, args.plis, args.n_jobs)
+    with pl.Config(tbl_rows=-1, tbl_cols=-1):
+        print(df.sort(["pli"]))
+        print(resume)
+    print(f"✅ Résultats par pli : {CHEMIN_RAPPORT}")